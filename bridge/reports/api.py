@@ -15,8 +15,10 @@
 # limitations under the License.
 #
 
+import gzip
 import json
 
+from django.conf import settings
 from django.http import HttpResponse
 from django.template import loader
 from django.urls import reverse
@@ -109,14 +111,25 @@ class UploadReportView(LoggedCallMixin, APIView):
         if decision.status != DECISION_STATUS[2][0]:
             raise exceptions.APIException('Reports can be uploaded only for processing decisions')
 
+        archives = request.FILES
         if 'report' in request.POST:
             data = [json.loads(request.POST['report'])]
         elif 'reports' in request.POST:
             data = json.loads(request.POST['reports'])
+        elif 'compressed reports' in request.FILES:
+            # Klever Core sends batches of reports compressed with gzip. They are limited in the same way as reports
+            # sent as is, otherwise a small file could be decompressed into arbitrary amount of memory.
+            archives = {name: fp for name, fp in request.FILES.items() if name != 'compressed reports'}
+            max_size = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+            with gzip.open(request.FILES['compressed reports']) as fp:
+                content = fp.read(max_size + 1 if max_size is not None else -1)
+            if max_size is not None and len(content) > max_size:
+                raise exceptions.APIException('Reports exceed {} bytes'.format(max_size))
+            data = json.loads(content.decode('utf8'))
         else:
             raise exceptions.APIException('Report json data is required')
         try:
-            UploadReport(decision, request.FILES).upload_all(data)
+            UploadReport(decision, archives).upload_all(data)
         except CheckArchiveError as e:
             return Response({'ZIP error': str(e)}, status=HTTP_403_FORBIDDEN)
         return Response({})
@@ -15,7 +15,13 @@
 # limitations under the License.
 #
 
+from datetime import timedelta
+
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import now
+
 from rest_framework import exceptions
+from rest_framework.decorators import action
 from rest_framework.generics import (
     get_object_or_404, RetrieveAPIView, CreateAPIView, RetrieveDestroyAPIView, RetrieveUpdateAPIView
 )
@@ -40,6 +46,9 @@ from service.serializers import (
 )
 from service.utils import FinishDecision, TaskArchiveGenerator, SolutionArchiveGenerator, ReadDecisionConfiguration
 
+# Cursors of requests for changes of tasks statuses lag behind the current time (in seconds)
+TASK_CHANGES_LAG = 2
+
 
 class TaskAPIViewset(LoggedCallMixin, ModelViewSet):
     queryset = Task.objects.select_related('decision').all()
@@ -63,9 +72,35 @@ class TaskAPIViewset(LoggedCallMixin, ModelViewSet):
 
     def filter_queryset(self, queryset):
         if 'job' in self.request.query_params:
-            return queryset.filter(decision__identifier=self.request.query_params['job'])
+            queryset = queryset.filter(decision__identifier=self.request.query_params['job'])
+        if 'status' in self.request.query_params:
+            queryset = queryset.filter(status__in=self.request.query_params.getlist('status'))
         return super().filter_queryset(queryset)
 
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Get identifiers and statuses of tasks which statuses were changed since the cursor returned by the previous
+        request. The request does not wait for changes, so clients should repeat it periodically.
+        """
+        if 'job' not in request.query_params:
+            raise exceptions.ValidationError({'job': 'The job identifier is required'})
+
+        cursor = None
+        if request.query_params.get('cursor'):
+            cursor = parse_datetime(request.query_params['cursor'])
+            if not cursor:
+                raise exceptions.ValidationError({'cursor': 'Wrong cursor format'})
+
+        # Transactions can be committed later than tasks statuses are changed, so cursors overlap a bit
+        new_cursor = now() - timedelta(seconds=TASK_CHANGES_LAG)
+        queryset = self.filter_queryset(Task.objects.all())
+        if cursor:
+            queryset = queryset.filter(status_changed__gt=cursor)
+            if new_cursor < cursor:
+                new_cursor = cursor
+        return Response({'cursor': new_cursor.isoformat(), 'tasks': list(queryset.values('id', 'status'))})
+
     def perform_destroy(self, instance):
         if instance.status not in {TASK_STATUS[2][0], TASK_STATUS[3][0], TASK_STATUS[4][0]}:
             raise exceptions.ValidationError({'status': 'The task is not finished'})
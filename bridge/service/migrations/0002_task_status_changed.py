@@ -0,0 +1,30 @@
+#
+# Copyright (c) 2019 ISP RAS (http://www.ispras.ru)
+# Ivannikov Institute for System Programming of the Russian Academy of Sciences
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from django.db import migrations, models
+from django.utils.timezone import now
+
+
+class Migration(migrations.Migration):
+    dependencies = [('service', '0001_initial')]
+
+    operations = [
+        migrations.AddField(
+            model_name='task', name='status_changed',
+            field=models.DateTimeField(db_index=True, default=now)
+        ),
+    ]
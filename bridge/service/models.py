@@ -18,6 +18,7 @@
 from django.contrib.postgres.fields import JSONField
 from django.db import models
 from django.db.models.signals import post_delete
+from django.utils.timezone import now
 
 from bridge.vars import NODE_STATUS, TASK_STATUS
 from bridge.utils import WithFilesMixin, remove_instance_files
@@ -77,6 +78,7 @@ class Task(WithFilesMixin, models.Model):
     filename = models.CharField(max_length=256)
     archive = models.FileField(upload_to=SERVICE_DIR)
     description = JSONField()
+    status_changed = models.DateTimeField(default=now, db_index=True)
 
     class Meta:
         db_table = 'task'
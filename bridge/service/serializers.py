@@ -205,6 +205,8 @@ class TaskSerializer(DynamicFieldsModelSerializer):
             raise serializers.ValidationError({'job': 'Is not processing'})
 
         old_status = instance.status
+        # Klever Core polls changes of tasks statuses by this time, so it is not updated on other changes of tasks
+        validated_data['status_changed'] = now()
         instance = super().update(instance, validated_data)
         self.update_decision(instance.decision, instance.status, old_status=old_status)
         on_task_change(instance.id, instance.status, instance.decision.scheduler.type)
@@ -17,18 +17,24 @@
 
 import os
 import json
+from datetime import timedelta
+from unittest import mock
 
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 from django.db.models import Q
 from django.test import Client
 from django.urls import reverse
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import now
 
-from bridge.vars import SCHEDULER_TYPE, SCHEDULER_STATUS, PRIORITY, NODE_STATUS
+from bridge.vars import (
+    SCHEDULER_TYPE, SCHEDULER_STATUS, PRIORITY, NODE_STATUS, USER_ROLES, PRESET_JOB_TYPE, DECISION_STATUS, TASK_STATUS
+)
 from bridge.utils import KleverTestCase
 
 from users.models import User, SchedulerUser
-from jobs.models import Job, Scheduler
+from jobs.models import Job, Scheduler, PresetJob, Decision, JobFile
 from service.models import Task, Solution, VerificationTool, Node, NodesConfiguration, Workload
 
 from reports.test import COMPUTER
@@ -903,3 +909,60 @@ class TestService(KleverTestCase):
             SchedulerUser.objects.get(user__username='manager', login='sch_user', password='sch_passwd')
         except ObjectDoesNotExist:
             self.fail()
+
+
+class TestTasksChanges(KleverTestCase):
+    def setUp(self):
+        super(TestTasksChanges, self).setUp()
+        User.objects.create_user('service', '', 'service', role=USER_ROLES[4][0])
+        self.client.login(username='service', password='service')
+        preset = PresetJob.objects.create(name='Preset', type=PRESET_JOB_TYPE[1][0], check_date=now())
+        job = Job.objects.create(preset=preset, name='Job')
+        self.decision = Decision.objects.create(
+            job=job, status=DECISION_STATUS[2][0], priority=PRIORITY[3][0], tasks_total=2, tasks_pending=2,
+            scheduler=Scheduler.objects.get_or_create(type=SCHEDULER_TYPE[0][0])[0],
+            configuration=JobFile.objects.create(hash_sum='conf', file='conf.json')
+        )
+        self.tasks = [Task.objects.create(
+            decision=self.decision, filename='task.zip', archive='task.zip', description={'priority': PRIORITY[3][0]}
+        ) for _ in range(2)]
+
+    def get_changes(self, cursor=None):
+        params = {'job': str(self.decision.identifier), 'status': [TASK_STATUS[1][0]]}
+        if cursor:
+            params['cursor'] = cursor
+        response = self.client.get('/service/tasks/changes/', params)
+        self.assertEqual(response.status_code, 200)
+        res = json.loads(str(response.content, encoding='utf8'))
+        return res['cursor'], [task['id'] for task in res['tasks']]
+
+    @mock.patch('service.serializers.on_task_change')
+    def test_changes(self, on_task_change):
+        cursor, tasks = self.get_changes()
+        self.assertEqual(tasks, [])
+
+        # Only tasks which statuses were changed after the cursor are returned
+        Task.objects.filter(id=self.tasks[0].id).update(status_changed=now() - timedelta(hours=1))
+        Task.objects.filter(id=self.tasks[1].id).update(status_changed=now() - timedelta(hours=1))
+        cursor = (now() - timedelta(minutes=1)).isoformat()
+        response = self.client.patch('/service/tasks/{}/'.format(self.tasks[0].id), json.dumps({
+            'status': TASK_STATUS[1][0]
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        on_task_change.assert_called_once_with(self.tasks[0].id, TASK_STATUS[1][0], SCHEDULER_TYPE[0][0])
+        new_cursor, tasks = self.get_changes(cursor)
+        self.assertEqual(tasks, [self.tasks[0].id])
+        self.assertGreaterEqual(parse_datetime(new_cursor), parse_datetime(cursor))
+
+        # Saving tasks without changing statuses does not affect the time of the last status change
+        status_changed = Task.objects.get(id=self.tasks[1].id).status_changed
+        task = Task.objects.get(id=self.tasks[1].id)
+        task.error = 'Error'
+        task.save()
+        self.assertEqual(Task.objects.get(id=self.tasks[1].id).status_changed, status_changed)
+
+        # Wrong requests
+        response = self.client.get('/service/tasks/changes/')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/service/tasks/changes/', {'job': str(self.decision.identifier), 'cursor': 'now'})
+        self.assertEqual(response.status_code, 400)
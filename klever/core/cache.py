@@ -0,0 +1,252 @@
+#
+# Copyright (c) 2020 ISP RAS (http://www.ispras.ru)
+# Ivannikov Institute for System Programming of the Russian Academy of Sciences
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+
+import pkg_resources
+
+import klever.core.utils
+
+
+def get_persistent_cache(logger, conf, kind):
+    """
+    Get persistent cache of a given kind if it is enabled by configuration option "persistent cache directory".
+
+    :param logger: Logger object.
+    :param conf: Component configuration.
+    :param kind: Cache kind, e.g. "weaver". Each kind is stored in a separate subdirectory and is bounded separately.
+    :return: PersistentCache object or None.
+    """
+    if not conf.get('persistent cache directory'):
+        return None
+
+    return PersistentCache(logger, os.path.join(conf['persistent cache directory'], kind),
+                           int(conf.get('persistent cache size', 10) * 1024 ** 3))
+
+
+def get_tools_fingerprint(tools):
+    """
+    Distinguish tool versions by their executables without running them.
+
+    :param tools: Names of tool executables.
+    :return: List of tool names, paths to their executables, their sizes and modification times.
+    """
+    fingerprint = []
+    for tool in tools:
+        path = shutil.which(tool)
+        if path:
+            path = os.path.realpath(path)
+            stat = os.stat(path)
+            fingerprint.append([tool, path, stat.st_size, stat.st_mtime])
+        else:
+            fingerprint.append([tool, None])
+    return fingerprint
+
+
+def get_klever_version():
+    """
+    Get version of installed Klever to avoid reusing results of its other versions.
+
+    :return: Version string or None if Klever is not installed.
+    """
+    try:
+        return pkg_resources.get_distribution('klever').version
+    except pkg_resources.DistributionNotFound:
+        return None
+
+
+def get_directory_checksum(directory):
+    """
+    Get checksum of a directory on the basis of relative paths and checksums of all its files.
+
+    :param directory: Path to directory.
+    :return: Checksum string.
+    """
+    hash_sha256 = hashlib.sha256()
+    for root, dirs, files in os.walk(directory):
+        # Make the order independent on file system.
+        dirs.sort()
+        for file in sorted(files):
+            path = os.path.join(root, file)
+            hash_sha256.update(os.path.relpath(path, directory).encode('utf8'))
+            hash_sha256.update(klever.core.utils.get_file_checksum(path).encode('utf8'))
+    return hash_sha256.hexdigest()
+
+
+class PersistentCache:
+    """
+    Content-addressed cache that is shared between jobs and Klever Core processes.
+
+    Each entry is a directory named after a key and containing a set of named files or directories. Entries are
+    produced under the same lock protocol as klever.core.utils.LockedOpen, so concurrent processes wait for each other
+    rather than produce the same entry twice. When the total size exceeds the limit the least recently used entries
+    are evicted.
+    """
+    EVICTION_FACTOR = 0.8
+
+    def __init__(self, logger, directory, max_size):
+        self.logger = logger
+        self.directory = os.path.realpath(directory)
+        self.max_size = max_size
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def get_key(*items):
+        """
+        Get cache key for given JSON serializable items, e.g. file checksums, options and tool versions.
+        """
+        return hashlib.sha256(json.dumps(items, sort_keys=True).encode('utf8')).hexdigest()
+
+    def lock(self, key):
+        """
+        Lock cache entry. It is intended to protect a sequence of get() and put() calls.
+        """
+        entry = self.__get_entry(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        return klever.core.utils.LockedOpen(entry + '.tmp', 'w')
+
+    def get(self, key, dest_files, link=False):
+        """
+        Get files from cache entry.
+
+        :param key: Cache key.
+        :param dest_files: Dictionary from names of files within entry to their destinations. Files that are absent
+                           within entry are skipped, so optional outcomes can be stored.
+        :param link: Try to create hard links instead of copies.
+        :return: True if there is cache entry for a given key and False otherwise.
+        """
+        entry = self.__get_entry(key)
+        if not os.path.isdir(entry):
+            return False
+
+        for name, dest in dest_files.items():
+            if os.path.exists(os.path.join(entry, name)):
+                self.__copy(os.path.join(entry, name), dest, link)
+
+        # Remember access time for LRU eviction.
+        os.utime(entry)
+
+        return True
+
+    def put(self, key, src_files, ignore=None):
+        """
+        Store files to cache entry.
+
+        :param key: Cache key.
+        :param src_files: Dictionary from names of files within entry to their sources.
+        :param ignore: Function to skip files within source directories like shutil.ignore_patterns() does.
+        """
+        entry = self.__get_entry(key)
+        partial_entry = entry + '.partial'
+
+        if os.path.isdir(partial_entry):
+            shutil.rmtree(partial_entry)
+        os.makedirs(partial_entry)
+
+        for name, src in src_files.items():
+            self.__copy(src, os.path.join(partial_entry, name), False, ignore)
+
+        # Entry could be already produced by a process that did not lock it.
+        if os.path.isdir(entry):
+            shutil.rmtree(partial_entry)
+            return
+
+        # Make entry visible to other processes atomically.
+        os.rename(partial_entry, entry)
+
+        self.__account(self.__get_size(entry))
+
+    def __get_entry(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    @staticmethod
+    def __copy(src, dest, link, ignore=None):
+        def copy_file(src_file, dest_file):
+            if link:
+                try:
+                    os.link(src_file, dest_file)
+                    return
+                # For instance, cache is placed on another file system.
+                except OSError:
+                    pass
+
+            shutil.copy2(src_file, dest_file)
+
+        if os.path.isdir(src):
+            shutil.copytree(src, dest, copy_function=copy_file, ignore=ignore)
+        else:
+            copy_file(src, dest)
+
+    @staticmethod
+    def __get_size(path):
+        size = 0
+        for root, _, files in os.walk(path):
+            for file in files:
+                size += os.path.getsize(os.path.join(root, file))
+        return size
+
+    def __account(self, size):
+        with klever.core.utils.LockedOpen(os.path.join(self.directory, 'size'), 'a+') as fp:
+            fp.seek(0)
+            content = fp.read()
+            total_size = int(content) if content else 0
+            total_size += size
+
+            if total_size > self.max_size:
+                total_size = self.__evict(total_size)
+
+            fp.seek(0)
+            fp.truncate()
+            fp.write(str(total_size))
+
+    def __evict(self, total_size):
+        entries = []
+        for bucket in os.scandir(self.directory):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.is_dir() and not entry.name.endswith('.partial'):
+                    entries.append((entry.stat().st_mtime, entry.path))
+
+        self.logger.debug('Evict least recently used entries from cache "{0}"'.format(self.directory))
+        for _, entry in sorted(entries):
+            if total_size <= self.max_size * self.EVICTION_FACTOR:
+                break
+
+            # Skip entries that are used at the moment.
+            lock_fd = os.open(entry + '.tmp.lock', os.O_RDWR | os.O_CREAT)
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except (IOError, OSError):
+                os.close(lock_fd)
+                continue
+
+            try:
+                total_size -= self.__get_size(entry)
+                shutil.rmtree(entry)
+                for aux_file in (entry + '.tmp', entry + '.tmp.lock'):
+                    if os.path.exists(aux_file):
+                        os.remove(aux_file)
+            finally:
+                fcntl.flock(lock_fd, fcntl.LOCK_UN)
+                os.close(lock_fd)
+
+        return max(total_size, 0)
@@ -18,6 +18,7 @@
 import glob
 import json
 import multiprocessing
+import multiprocessing.connection
 import os
 import shutil
 import signal
@@ -28,6 +29,7 @@ import types
 import resource
 import re
 
+import klever.core.profiling
 import klever.core.utils
 
 
@@ -108,10 +110,13 @@ def all_child_resources():
     return total_child_resources
 
 
-def count_consumed_resources(logger, start_time, include_child_resources=False, child_resources=None):
+def count_consumed_resources(logger, start_time, include_child_resources=False, child_resources=None,
+                             start_usage=None):
     """
     Count resources (wall time, CPU time and maximum memory size) consumed by the process without its children.
     Note that launching under PyCharm gives its maximum memory size rather than the process one.
+    If start usage (see get_resource_usage()) is given CPU time is counted since that moment. So is maximum memory size
+    if it was reset at that moment, otherwise it is the maximum memory size of the process during its lifetime.
     :return: resources.
     """
     logger.debug('Count consumed resources')
@@ -120,6 +125,11 @@ def count_consumed_resources(logger, start_time, include_child_resources=False,
         'Do not calculate resources of process with children and simultaneosly provide resources of children'
 
     utime, stime, maxrss = resource.getrusage(resource.RUSAGE_SELF)[0:3]
+    if start_usage:
+        if start_usage['memory reset']:
+            maxrss = get_peak_memory() or maxrss
+        else:
+            logger.debug('Maximum memory size is the one of the process during its lifetime')
 
     # Take into account children resources if necessary.
     if include_child_resources:
@@ -127,6 +137,9 @@ def count_consumed_resources(logger, start_time, include_child_resources=False,
         utime += utime_children
         stime += stime_children
         maxrss = max(maxrss, maxrss_children)
+        if start_usage:
+            utime -= start_usage['children'][0]
+            stime -= start_usage['children'][1]
     elif child_resources:
         for child in child_resources:
             # CPU time is sum of utime and stime, so add it just one time.
@@ -134,6 +147,10 @@ def count_consumed_resources(logger, start_time, include_child_resources=False,
             maxrss = max(maxrss, child_resources[child]['memory'] / 1000)
             # Wall time of children is included in wall time of their parent.
 
+    if start_usage:
+        utime -= start_usage['self'][0]
+        stime -= start_usage['self'][1]
+
     resources = {
         'wall_time': round(1000 * (time.time() - start_time)),
         'cpu_time': round(1000 * (utime + stime)),
@@ -146,6 +163,52 @@ def count_consumed_resources(logger, start_time, include_child_resources=False,
     return resources
 
 
+def get_resource_usage():
+    """
+    Get CPU time consumed so far by the process and its children to count resources of components running within it.
+    Besides, reset maximum memory size of the process, so it will be measured just for such components.
+
+    :return: Dictionary with pairs of user and system time and whether maximum memory size was reset.
+    """
+    return {
+        'self': resource.getrusage(resource.RUSAGE_SELF)[0:2],
+        'children': resource.getrusage(resource.RUSAGE_CHILDREN)[0:2],
+        'memory reset': reset_peak_memory()
+    }
+
+
+def reset_peak_memory():
+    """
+    Reset maximum resident set size of the process. This is supported by Linux since version 4.0.
+
+    :return: True if maximum memory size was reset and False otherwise.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as fp:
+            fp.write('5')
+    except OSError:
+        return False
+
+    return True
+
+
+def get_peak_memory():
+    """
+    Get maximum resident set size of the process since it was started or reset by reset_peak_memory().
+
+    :return: Memory size in KB or None if it can not be obtained.
+    """
+    try:
+        with open('/proc/self/status', encoding='utf8') as fp:
+            for line in fp:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+
+    return None
+
+
 def launch_workers(logger, workers, monitoring_list=None):
     """
     Wait until all given components will finish their work. If one among them fails, terminate the rest.
@@ -162,16 +225,14 @@ def launch_workers(logger, workers, monitoring_list=None):
             w.start()
 
         logger.info('Wait for components')
-        while True:
-            operating_subcomponents_num = 0
+        operating = list(workers)
+        while operating:
+            wait_for_components(operating, monitoring_list)
 
-            for p in workers:
-                p.join(1.0 / len(workers))
-                operating_subcomponents_num += p.is_alive()
+            for p in [p for p in operating if not p.is_alive()]:
+                operating.remove(p)
+                p.join()
             check_components(logger, monitoring_list)
-
-            if not operating_subcomponents_num:
-                break
     finally:
         for p in workers:
             if p.is_alive():
@@ -216,49 +277,60 @@ def launch_queue_workers(logger, queue, constructor, number, fail_tolerant, moni
                         raise TypeError("Incorrect constructor, expect Component but get {}".
                                         format(type(worker).__name__))
 
-            # Wait for components termination
+            # Check that we can quit
+            if len(components) == 0 and len(elements) == 0 and not active:
+                break
+
+            # Wait for components termination or new elements
+            wait_for_components(components, monitoring_list, queue if active else None)
             finished = 0
-            # Becouse we use i for deletion we always delete the element near the end to not break order of
-            # following of the rest unprocessed elements
-            for i, p in reversed(list(enumerate(list(components)))):
+            for p in [p for p in components if not p.is_alive()]:
+                components.remove(p)
+                finished += 1
                 try:
-                    p.join(1.0 / len(components))
+                    p.join()
                 except ComponentError:
                     # Ignore or terminate the rest
                     if not fail_tolerant:
                         raise
-                # If all is OK
-                if not p.is_alive():
-                    # Make to be sure to execute join the last time
-                    try:
-                        p.join()
-                    except ComponentError:
-                        # Ignore or terminate the rest
-                        if not fail_tolerant:
-                            raise
-
-                    # Just remove it
-                    components.pop(i)
-                    finished += 1
             # Check additional components, actually they should not terminate or finish during this funciton run so
             # just check that they are OK
             check_components(logger, monitoring_list)
 
             if finished > 0:
                 logger.debug("Finished {} workers".format(finished))
-
-            # Check that we can quit or must wait
-            if len(components) == 0 and len(elements) == 0:
-                if not active:
-                    break
-                else:
-                    time.sleep(1)
     finally:
         for p in components:
             if p.is_alive():
                 p.terminate()
 
 
+def wait_for_components(components, monitoring_list=None, given_queue=None):
+    """
+    Block until any of given components or components from the monitoring list terminates or the queue has elements.
+
+    :param components: List with Component objects.
+    :param monitoring_list: List with already started Component objects.
+    :param given_queue: multiprocessing.Queue or None.
+    :return: None.
+    """
+    objects = [p.sentinel for p in components]
+    if isinstance(monitoring_list, list):
+        objects.extend(p.sentinel for p in monitoring_list if p.is_alive())
+
+    timeout = None
+    if given_queue is not None:
+        reader = getattr(given_queue, '_reader', None)
+        if reader is not None:
+            objects.append(reader)
+        else:
+            # Queues of managers can not be waited for, so poll them
+            timeout = 1
+
+    with klever.core.profiling.span('Wait for components', 'wait'):
+        multiprocessing.connection.wait(objects, timeout)
+
+
 def check_components(logger, components):
     """
     Check that all given processes are alive and raise an exception if it is not so.
@@ -377,67 +449,171 @@ class Component(multiprocessing.Process, CallbacksCaller):
         try:
             # Get component specific logger.
             self.logger = klever.core.utils.get_logger(self.name, self.conf['logging'])
+            klever.core.profiling.set_process_name(self.name)
             if self.separate_from_parent:
-                # Create special directory where child resources of processes separated from parents will be printed.
-                self.logger.info('Create child resources directory "child resources"')
-                os.makedirs('child resources'.encode('utf8'))
-
-                report = {
-                    'identifier': self.id,
-                    'parent': self.parent_id,
-                    'component': self.name
-                }
-                if self.attrs:
-                    report.update({'attrs': self.attrs})
-                klever.core.utils.report(self.logger, 'start', report, self.mqs['report files'], self.vals['report id'],
-                                         self.conf['main working directory'])
-
-            self.main()
+                self.__send_start_report()
+
+            with klever.core.profiling.span(self.name, 'component', id=self.id):
+                self.main()
         except Exception:
             exception = True
-
-            # Print information on exception to logs and as problem description.
-            exception_info = '{0}Raise exception:\n{1}'.format(self.__get_subcomponent_name(),
-                                                               traceback.format_exc().rstrip())
-            self.logger.error(exception_info)
-            with open('problem desc.txt', 'a', encoding='utf8') as fp:
-                if fp.tell():
-                    fp.write('\n')
-                fp.write(exception_info)
+            self.__print_exception()
         finally:
             self.__finalize(exception=exception)
 
+    def run_in_process(self):
+        """
+        Run the component within the current process rather than in a new one. This saves time on forking, importing
+        and (de)serializing data for short components. Reports are the same as if the component would be run in a
+        separate process, but its CPU time and maximum memory size are counted from the beginning of this method. The
+        latter is the maximum memory size of the whole process if it can not be reset (see get_resource_usage()).
+        Components run within the same process should not be nested since maximum memory size is reset for each of them.
+
+        :return: True if the component finished successfully and False otherwise.
+        """
+        self.tasks_start_time = time.time()
+        start_usage = get_resource_usage()
+        parent_logger = self.logger
+        cwd = os.getcwd()
+
+        if self.separate_from_parent:
+            if not os.path.isdir(self.work_dir):
+                self.logger.info(
+                    'Create working directory "{0}" for component "{1}"'.format(self.work_dir, self.name))
+                os.makedirs(self.work_dir.encode('utf8'))
+            self.logger.info('Change working directory to "{0}" for component "{1}"'.format(self.work_dir, self.name))
+            os.chdir(self.work_dir)
+
+        finalized = False
+
+        def finalize(exception):
+            nonlocal finalized
+            if finalized:
+                return exception
+            finalized = True
+
+            try:
+                if self.separate_from_parent:
+                    self.__send_finish_reports(start_usage)
+            except Exception:
+                exception = True
+                self.logger.exception('Catch exception')
+            finally:
+                self.__clean_dir()
+                # Close log files of the component since another component with the same name can be run later.
+                if self.logger is not parent_logger:
+                    for handler in list(self.logger.handlers):
+                        handler.close()
+                        self.logger.removeHandler(handler)
+                    self.logger = parent_logger
+                os.chdir(cwd)
+
+            return exception
+
+        # Report the component termination before the process will be stopped by parent.
+        parent_stop = signal.getsignal(signal.SIGUSR1)
+
+        def stop(signum, frame):
+            self.logger.error('Stop since some other component(s) likely failed')
+            finalize(False)
+            if callable(parent_stop):
+                parent_stop(signum, frame)
+
+        signal.signal(signal.SIGUSR1, stop)
+
+        exception = False
+        try:
+            self.logger = klever.core.utils.get_logger(self.name, self.conf['logging'])
+            if self.separate_from_parent:
+                self.__send_start_report()
+
+            with klever.core.profiling.span(self.name, 'component', id=self.id):
+                self.main()
+        except Exception:
+            exception = True
+            self.__print_exception()
+        except SystemExit as e:
+            # Components can exit themselves when they already reported a problem.
+            exception = bool(e.code)
+        finally:
+            signal.signal(signal.SIGUSR1, parent_stop)
+            exception = finalize(exception)
+
+        if exception:
+            self.logger.warning('Component "{0}" failed'.format(self.name))
+
+        return not exception
+
+    def __send_start_report(self):
+        # Create special directory where child resources of processes separated from parents will be printed.
+        self.logger.info('Create child resources directory "child resources"')
+        os.makedirs('child resources'.encode('utf8'))
+
+        report = {
+            'identifier': self.id,
+            'parent': self.parent_id,
+            'component': self.name
+        }
+        if self.attrs:
+            report.update({'attrs': self.attrs})
+        klever.core.utils.report(self.logger, 'start', report, self.mqs['report files'], self.vals['report id'],
+                                 self.conf['main working directory'])
+
+    def __print_exception(self):
+        # Print information on exception to logs and as problem description.
+        exception_info = '{0}Raise exception:\n{1}'.format(self.__get_subcomponent_name(),
+                                                           traceback.format_exc().rstrip())
+        self.logger.error(exception_info)
+        with open('problem desc.txt', 'a', encoding='utf8') as fp:
+            if fp.tell():
+                fp.write('\n')
+            fp.write(exception_info)
+
+    def __send_finish_reports(self, start_usage=None):
+        if os.path.isfile('problem desc.txt'):
+            klever.core.utils.report(
+                self.logger,
+                'unknown',
+                {
+                    'identifier': self.id + '/unknown',
+                    'parent': self.id,
+                    'problem_description': klever.core.utils.ArchiveFiles(['problem desc.txt'])
+                },
+                self.mqs['report files'],
+                self.vals['report id'],
+                self.conf['main working directory']
+            )
+
+        child_resources = all_child_resources()
+        report = {'identifier': self.id}
+        report.update(count_consumed_resources(self.logger, self.tasks_start_time, self.include_child_resources,
+                                               child_resources, start_usage))
+        # todo: this is embarassing
+        if self.coverage:
+            report['coverage'] = self.coverage
+
+        if os.path.isfile('log.txt'):
+            report['log'] = klever.core.utils.ArchiveFiles(['log.txt'])
+
+        klever.core.utils.report(self.logger, 'finish', report, self.mqs['report files'],
+                                 self.vals['report id'], self.conf['main working directory'])
+
+    def __clean_dir(self):
+        if self.clean_dir and not self.conf['keep intermediate files']:
+            self.logger.debug('Going to clean {0}'.format(os.path.abspath('.')))
+            for to_del in os.listdir('.'):
+                if to_del in self.excluded_clean:
+                    continue
+                if os.path.isfile(to_del) or os.path.islink(to_del):
+                    os.remove(to_del)
+                elif os.path.isdir(to_del):
+                    shutil.rmtree(to_del)
+
     def __finalize(self, exception=False, stopped=False):
         # Like in Core at least print information about unexpected exceptions in code below and properly exit.
         try:
             if self.separate_from_parent and self.__pid == os.getpid():
-                if os.path.isfile('problem desc.txt'):
-                    klever.core.utils.report(
-                        self.logger,
-                        'unknown',
-                        {
-                            'identifier': self.id + '/unknown',
-                            'parent': self.id,
-                            'problem_description': klever.core.utils.ArchiveFiles(['problem desc.txt'])
-                        },
-                        self.mqs['report files'],
-                        self.vals['report id'],
-                        self.conf['main working directory']
-                    )
-
-                child_resources = all_child_resources()
-                report = {'identifier': self.id}
-                report.update(count_consumed_resources(self.logger, self.tasks_start_time, self.include_child_resources,
-                                                       child_resources))
-                # todo: this is embarassing
-                if self.coverage:
-                    report['coverage'] = self.coverage
-
-                if os.path.isfile('log.txt'):
-                    report['log'] = klever.core.utils.ArchiveFiles(['log.txt'])
-
-                klever.core.utils.report(self.logger, 'finish', report, self.mqs['report files'],
-                                         self.vals['report id'], self.conf['main working directory'])
+                self.__send_finish_reports()
             else:
                 with open(os.path.join('child resources', self.name + '.json'), 'w', encoding='utf8') as fp:
                     klever.core.utils.json_dump(count_consumed_resources(self.logger, self.tasks_start_time,
@@ -448,15 +624,7 @@ class Component(multiprocessing.Process, CallbacksCaller):
             self.logger.exception('Catch exception')
         finally:
             # Clean dir if needed
-            if self.clean_dir and not self.conf['keep intermediate files']:
-                self.logger.debug('Going to clean {0}'.format(os.path.abspath('.')))
-                for to_del in os.listdir('.'):
-                    if to_del in self.excluded_clean:
-                        continue
-                    if os.path.isfile(to_del) or os.path.islink(to_del):
-                        os.remove(to_del)
-                    elif os.path.isdir(to_del):
-                        shutil.rmtree(to_del)
+            self.__clean_dir()
             if stopped or exception:
                 # Treat component stopping as normal termination.
                 exit_code = os.EX_SOFTWARE if exception else os.EX_OK
@@ -22,11 +22,13 @@ import multiprocessing
 import os
 import pkg_resources
 import shutil
+import threading
 import time
 import traceback
 import queue
 
 import klever.core.job
+import klever.core.profiling
 import klever.core.session
 import klever.core.utils
 import klever.core.components
@@ -49,6 +51,7 @@ class Core(klever.core.components.CallbacksCaller):
         self.report_id = multiprocessing.Value('i', 1)
         self.uploading_reports_process = None
         self.uploading_reports_process_exitcode = multiprocessing.Value('i', 0)
+        self.reporter_stats = None
         self.callbacks = {}
         self.is_start_report_uploaded = False
 
@@ -65,6 +68,10 @@ class Core(klever.core.components.CallbacksCaller):
             self.logger = klever.core.utils.get_logger(type(self).__name__, self.conf['logging'])
             self.logger.info('Solve job "{0}"'.format(self.conf['identifier']))
 
+            # Child processes inherit profiling settings.
+            klever.core.profiling.configure(self.conf)
+            klever.core.profiling.set_process_name(type(self).__name__)
+
             self.session = klever.core.session.Session(self.logger, self.conf['Klever Bridge'], self.conf['identifier'])
             self.session.start_job_decision(klever.core.job.JOB_FORMAT, klever.core.job.JOB_ARCHIVE)
 
@@ -72,8 +79,11 @@ class Core(klever.core.components.CallbacksCaller):
 
             os.makedirs('child resources'.encode('utf8'))
 
+            self.reporter_stats = multiprocessing.Manager().dict()
             self.uploading_reports_process = Reporter(self.conf, self.logger, self.ID, self.callbacks, self.mqs,
-                                                      {'report id': self.report_id}, session=self.session)
+                                                      {'report id': self.report_id,
+                                                       'reporter statistics': self.reporter_stats},
+                                                      session=self.session)
             self.uploading_reports_process.start()
 
             self.get_comp_desc()
@@ -135,6 +145,15 @@ class Core(klever.core.components.CallbacksCaller):
                         self.logger.info('Wait for uploading all reports except Core finish report')
                         self.uploading_reports_process.join()
 
+                    # Statistics of uploading reports is available only after it is finished, so it is sent together
+                    # with Core finish report.
+                    if self.reporter_stats:
+                        klever.core.utils.report(self.logger, 'patch',
+                                                 {'identifier': self.ID,
+                                                  'data': {'Reports uploading': dict(self.reporter_stats)}},
+                                                 self.mqs['report files'], self.report_id,
+                                                 self.conf['main working directory'])
+
                     # Create Core finish report just after other reports are uploaded. Otherwise time between creating
                     # Core finish report and finishing uploading all reports won't be included into wall time of Core.
                     child_resources = klever.core.components.all_child_resources()
@@ -142,8 +161,14 @@ class Core(klever.core.components.CallbacksCaller):
                     report.update(klever.core.components.count_consumed_resources(
                         self.logger, self.start_time, child_resources=child_resources))
 
-                    if os.path.isfile('log.txt'):
-                        report['log'] = klever.core.utils.ArchiveFiles(['log.txt'])
+                    log_files = ['log.txt'] if os.path.isfile('log.txt') else []
+                    # Attach trace of all components to the log of Core since they are investigated together.
+                    if klever.core.profiling.is_enabled():
+                        self.logger.info('Merged {0} trace events'.format(
+                            klever.core.profiling.merge_traces('trace.json')))
+                        log_files.append('trace.json')
+                    if log_files:
+                        report['log'] = klever.core.utils.ArchiveFiles(log_files)
 
                     klever.core.utils.report(self.logger, 'finish', report, self.mqs['report files'], self.report_id,
                                              self.conf['main working directory'])
@@ -231,6 +256,9 @@ class Core(klever.core.components.CallbacksCaller):
 
         # Create directory where all reports and report files archives will be actually written to.
         os.mkdir(os.path.join(self.conf['working directory'], 'reports'))
+        # Dump reports to separate files only for debugging since there may be too many of them.
+        if self.conf.get('report journal', True):
+            os.mkdir(os.path.join(self.conf['working directory'], 'reports', klever.core.utils.REPORTS_JOURNAL_DIR))
 
     def change_work_dir(self):
         # Change working directory forever.
@@ -279,66 +307,173 @@ class Core(klever.core.components.CallbacksCaller):
 
 
 class Reporter(klever.core.components.Component):
+    # Limits of batches of reports that are uploaded at once. Bridge processes each batch within a single request, so
+    # the number of reports is the same as it was before batches were sent without delays. The total size of reports is
+    # kept below the default limit of request data of Django (2.5 MB) that Bridge also applies to compressed reports.
+    # Batches are not delayed for longer than specified time (in seconds) if there are no more reports.
+    BATCH_MAX_REPORTS = 10
+    BATCH_MAX_SIZE = 2 * 1024 ** 2
+    BATCH_MAX_LATENCY = 1
 
     def __init__(self, conf, logger, parent_id, callbacks, mqs, vals, id=None, work_dir=None, attrs=None,
                  separate_from_parent=False, include_child_resources=False, session=None):
         super(Reporter, self).__init__(conf, logger, parent_id, callbacks, mqs, vals, id, work_dir, attrs,
                                        separate_from_parent, include_child_resources)
         self.session = session
+        self.__stop = False
+        self.__error = None
+        # {journal segment: [number of uploaded reports, number of all reports or None if the segment is not finished]}
+        self.__journal_segments = {}
 
     def send_reports(self):
-        issleep = True
-        while True:
-            # Report batches of reports each 3 seconds. This reduces the number of requests quite considerably.
-            if issleep:
-                time.sleep(3)
-            else:
-                issleep = True
-
-            reports_and_report_file_archives = []
-            is_finish = False
+        # Reports are read and compressed in a separate thread while the previous batch is uploaded.
+        batches = queue.Queue(maxsize=1)
+        preparer = threading.Thread(target=self.__prepare_batches, args=(batches,))
+        preparer.start()
+
+        stats = {
+            'reports': 0,
+            'batches': 0,
+            'size': 0,
+            'compressed size': 0,
+            'upload time': 0.0,
+            'maximum queue depth': 0
+        }
+        try:
             while True:
-                try:
-                    # TODO: replace MQ with "reports and report file archives".
-                    report_and_report_file_archives = self.mqs['report files'].get_nowait()
-
-                    if report_and_report_file_archives is None:
-                        self.logger.debug('Report files message queue was terminated')
-                        is_finish = True
-                        break
-
-                    reports_and_report_file_archives.append(report_and_report_file_archives)
-
-                    # Do not send more than 10 reports at once. Otherwise different strange issues may appear im Core
-                    # and Bridge.
-                    if len(reports_and_report_file_archives) == 10:
-                        # Do not sleep since there may be pending reports already.
-                        issleep = False
-                        break
-                except queue.Empty:
+                with klever.core.profiling.span('Wait for report batches', 'wait'):
+                    batch = batches.get()
+                if batch is None:
+                    if self.__error:
+                        raise self.__error
                     break
 
-            if reports_and_report_file_archives:
+                reports_and_report_file_archives, reports, compressed_reports, size, depth = batch
+
                 for report_and_report_file_archives in reports_and_report_file_archives:
                     report_file_archives = report_and_report_file_archives.get('report file archives')
+                    if 'journal' in report_and_report_file_archives:
+                        report_file = '{0}:{1}'.format(report_and_report_file_archives['journal'],
+                                                       report_and_report_file_archives['offset'])
+                    else:
+                        report_file = report_and_report_file_archives['report file']
                     self.logger.debug('Upload report file "{0}"{1}'.format(
-                        report_and_report_file_archives['report file'],
+                        report_file,
                         ' with report file archives:\n{0}'
                         .format('\n'.join(['  {0}'.format(archive) for archive in report_file_archives]))
                         if report_file_archives else ''))
 
-                self.session.upload_reports_and_report_file_archives(reports_and_report_file_archives)
+                start_time = time.time()
+                self.session.upload_reports(reports, [archive for r in reports_and_report_file_archives
+                                                      for archive in r.get('report file archives') or []],
+                                            compressed_reports)
+                stats['upload time'] = round(stats['upload time'] + time.time() - start_time, 3)
+                stats['reports'] += len(reports)
+                stats['batches'] += 1
+                stats['size'] += size
+                stats['compressed size'] += len(compressed_reports) if compressed_reports else size
+                stats['maximum queue depth'] = max(stats['maximum queue depth'], depth)
 
                 # Remove reports and report file archives if needed.
                 if not self.conf['keep intermediate files']:
                     for report_and_report_file_archives in reports_and_report_file_archives:
-                        os.remove(report_and_report_file_archives['report file'])
+                        if 'journal' in report_and_report_file_archives:
+                            self.__remove_uploaded_journal_segment(report_and_report_file_archives)
+                        else:
+                            os.remove(report_and_report_file_archives['report file'])
                         report_file_archives = report_and_report_file_archives.get('report file archives')
                         if report_file_archives:
                             for archive in report_file_archives:
                                 os.remove(archive)
+        finally:
+            self.__stop = True
+            # Do not let the preparing thread to hang on putting one more batch.
+            while preparer.is_alive():
+                try:
+                    batches.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+            if stats['batches']:
+                stats['throughput'] = round(stats['reports'] / stats['upload time'], 1) if stats['upload time'] else 0
+                self.logger.info('Uploaded {0} reports in {1} batches ({2} KB compressed to {3} KB) in {4:.1f} seconds'
+                                 .format(stats['reports'], stats['batches'], stats['size'] // 1024,
+                                         stats['compressed size'] // 1024, stats['upload time']))
+                if 'reporter statistics' in self.vals:
+                    self.vals['reporter statistics'].update(stats)
+
+    def __remove_uploaded_journal_segment(self, report_and_report_file_archives):
+        """
+        Remove the journal segment when all its reports are uploaded. Reports of the same segment can be uploaded in
+        any order, so just the number of them is known from the last report appended to the segment.
+        """
+        journal = report_and_report_file_archives['journal']
+        segment = self.__journal_segments.setdefault(journal, [0, None])
+        segment[0] += 1
+        if 'segment records' in report_and_report_file_archives:
+            segment[1] = report_and_report_file_archives['segment records']
+
+        if segment[0] == segment[1]:
+            os.remove(journal)
+            del self.__journal_segments[journal]
+
+    def __prepare_batches(self, batches):
+        """
+        Collect reports from the queue into batches, read and compress them. A batch is finished when it becomes large
+        enough or when its first report waits for too long.
+        """
+        try:
+            self.__collect_batches(batches)
+        except Exception as e:
+            self.__error = e
+        finally:
+            batches.put(None)
+
+    def __collect_batches(self, batches):
+        compress = self.conf.get('compress reports', True)
+        is_finish = False
+        while not is_finish and not self.__stop:
+            reports_and_report_file_archives = []
+            reports = []
+            size = 0
+            depth = 0
+            deadline = None
+            wait_start = time.time()
+            while len(reports) < self.BATCH_MAX_REPORTS and size < self.BATCH_MAX_SIZE:
+                try:
+                    if deadline is None:
+                        # Check from time to time whether uploading has failed.
+                        report_and_report_file_archives = self.mqs['report files'].get(timeout=1)
+                    else:
+                        report_and_report_file_archives = \
+                            self.mqs['report files'].get(timeout=max(deadline - time.time(), 0))
+                except queue.Empty:
+                    if deadline is None and not self.__stop:
+                        continue
+                    break
+
+                if deadline is None:
+                    # Reporter waits for the first report of a batch for long while next ones are already in the queue
+                    # or they are not awaited for longer than the batch latency.
+                    klever.core.profiling.add_span('Wait for reports', 'wait', wait_start)
+
+                if report_and_report_file_archives is None:
+                    self.logger.debug('Report files message queue was terminated')
+                    is_finish = True
+                    break
+
+                if deadline is None:
+                    deadline = time.time() + self.BATCH_MAX_LATENCY
+                    depth = self.mqs['report files'].qsize()
+
+                # TODO: replace MQ with "reports and report file archives".
+                content = klever.core.utils.read_report(report_and_report_file_archives)
+                size += len(content)
+                reports.append(json.loads(content))
+                reports_and_report_file_archives.append(report_and_report_file_archives)
 
-            if is_finish:
-                break
+            if reports:
+                compressed_reports = klever.core.session.Session.compress_reports(reports) if compress else None
+                batches.put((reports_and_report_file_archives, reports, compressed_reports, size, depth))
 
     main = send_reports
@@ -15,6 +15,10 @@
 # limitations under the License.
 #
 
+import array
+import collections
+import heapq
+import itertools
 import json
 import os
 import shutil
@@ -26,6 +30,10 @@ import klever.core.utils
 
 coverage_format_version = 1
 
+# Files which coverage is converted by a worker at once and the number of such chunks queued per worker
+CONVERSION_CHUNK_SIZE = 16
+CONVERSION_CHUNKS_PER_WORKER = 2
+
 
 def add_to_coverage(merged_coverage_info, coverage_info):
     for file_name, file_coverage_info in coverage_info.items():
@@ -33,7 +41,7 @@ def add_to_coverage(merged_coverage_info, coverage_info):
             'total functions': coverage_info[file_name]['total functions'],
             'covered lines': dict(),
             'covered functions': dict(),
-            'covered function names': list()
+            'covered function names': set()
         })
 
         for kind in ('covered lines', 'covered functions'):
@@ -41,12 +49,194 @@ def add_to_coverage(merged_coverage_info, coverage_info):
                 merged_coverage_info[file_name][kind].setdefault(line, 0)
                 merged_coverage_info[file_name][kind][line] += cov_num
 
-        for cov_func_name in file_coverage_info['covered function names']:
-            if cov_func_name not in merged_coverage_info[file_name]['covered function names']:
-                merged_coverage_info[file_name]['covered function names'].append(cov_func_name)
+        merged_coverage_info[file_name]['covered function names'].update(file_coverage_info['covered function names'])
+
+
+def merge_sorted_coverage(lines1, counts1, lines2, counts2):
+    """
+    Merge two coverages represented by sorted arrays of line numbers and arrays of corresponding coverage counts.
+
+    :return: Sorted array of line numbers and array of summed coverage counts.
+    """
+    lines = array.array('q')
+    counts = array.array('q')
+    i = j = 0
+    while i < len(lines1) and j < len(lines2):
+        if lines1[i] < lines2[j]:
+            lines.append(lines1[i])
+            counts.append(counts1[i])
+            i += 1
+        elif lines1[i] > lines2[j]:
+            lines.append(lines2[j])
+            counts.append(counts2[j])
+            j += 1
+        else:
+            lines.append(lines1[i])
+            counts.append(counts1[i] + counts2[j])
+            i += 1
+            j += 1
+    lines.extend(lines1[i:])
+    counts.extend(counts1[i:])
+    lines.extend(lines2[j:])
+    counts.extend(counts2[j:])
+
+    return lines, counts
+
+
+class TotalCoverage:
+    """
+    Total code coverage of many verification tasks.
+
+    Coverage of each source file is kept as sorted arrays of line numbers and arrays of corresponding coverage counts
+    for lines and functions and as a set of covered function names. After a number of added coverages they are spilled
+    to a new segment on disk as JSON lines sorted by source file names. Total coverage is obtained by a single k-way
+    merge of all segments, so at most coverage of one source file is held in memory at that point.
+    """
+    SPILL_THRESHOLD = 10
+    MAX_SEGMENTS = 16
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.segments = []
+        self.__coverage = dict()
+        self.__added = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def add(self, coverage_info):
+        for file_name, file_coverage_info in coverage_info.items():
+            new = [file_coverage_info['total functions']]
+            for kind in ('covered lines', 'covered functions'):
+                # Line numbers are strings after coverage was stored to JSON.
+                line_counts = sorted((int(line), count) for line, count in file_coverage_info[kind].items())
+                new.append(array.array('q', (line for line, _ in line_counts)))
+                new.append(array.array('q', (count for _, count in line_counts)))
+            new.append(set(file_coverage_info['covered function names']))
+
+            if file_name in self.__coverage:
+                self.__coverage[file_name] = self.__merge_file_coverage(self.__coverage[file_name], new)
+            else:
+                self.__coverage[file_name] = new
+
+        self.__added += 1
+        if self.__added >= self.SPILL_THRESHOLD:
+            self.spill()
+
+    def spill(self):
+        if not self.__coverage:
+            return
+
+        segment = os.path.join(self.directory, 'segment {0}.json'.format(len(self.segments)))
+        with open(segment, 'w', encoding='utf8') as fp:
+            for file_name in sorted(self.__coverage):
+                self.__dump_file_coverage(fp, file_name, self.__coverage[file_name])
+        self.segments.append(segment)
+
+        self.__coverage = dict()
+        self.__added = 0
+
+        # Keep the number of simultaneously opened segments bounded.
+        if len(self.segments) > self.MAX_SEGMENTS:
+            self.__compact()
+
+    def items(self):
+        """
+        Iterate over merged coverage of source files in the format expected by convert_coverage().
+        """
+        self.spill()
+
+        for file_name, file_coverage in self.__merge_segments():
+            total_funcs, lines, line_counts, funcs, func_counts, func_names = file_coverage
+            yield file_name, {
+                'total functions': total_funcs,
+                'covered lines': {str(line): count for line, count in zip(lines, line_counts)},
+                'covered functions': {str(line): count for line, count in zip(funcs, func_counts)},
+                'covered function names': sorted(func_names)
+            }
+
+    def __compact(self):
+        compacted_segment = os.path.join(self.directory, 'compacted segment.json')
+        with open(compacted_segment, 'w', encoding='utf8') as fp:
+            for file_name, file_coverage in self.__merge_segments():
+                self.__dump_file_coverage(fp, file_name, file_coverage)
+
+        for segment in self.segments:
+            os.remove(segment)
+        os.rename(compacted_segment, self.segments[0])
+        self.segments = self.segments[:1]
+
+    def __merge_segments(self):
+        fps = [open(segment, encoding='utf8') for segment in self.segments]
+        try:
+            file_name = None
+            file_coverage = None
+            for new_file_name, total_funcs, lines, line_counts, funcs, func_counts, func_names in \
+                    heapq.merge(*(map(json.loads, fp) for fp in fps), key=lambda file_coverage: file_coverage[0]):
+                new = [total_funcs, array.array('q', lines), array.array('q', line_counts), array.array('q', funcs),
+                       array.array('q', func_counts), set(func_names)]
+
+                if new_file_name == file_name:
+                    file_coverage = self.__merge_file_coverage(file_coverage, new)
+                    continue
+
+                if file_name is not None:
+                    yield file_name, file_coverage
+                file_name = new_file_name
+                file_coverage = new
+
+            if file_name is not None:
+                yield file_name, file_coverage
+        finally:
+            for fp in fps:
+                fp.close()
+
+    @staticmethod
+    def __merge_file_coverage(old, new):
+        lines, line_counts = merge_sorted_coverage(old[1], old[2], new[1], new[2])
+        funcs, func_counts = merge_sorted_coverage(old[3], old[4], new[3], new[4])
+        old[5].update(new[5])
+        return [old[0], lines, line_counts, funcs, func_counts, old[5]]
+
+    @staticmethod
+    def __dump_file_coverage(fp, file_name, file_coverage):
+        total_funcs, lines, line_counts, funcs, func_counts, func_names = file_coverage
+        fp.write(json.dumps([file_name, total_funcs, lines.tolist(), line_counts.tolist(), funcs.tolist(),
+                             func_counts.tolist(), sorted(func_names)], ensure_ascii=True))
+        fp.write('\n')
+
+
+def _convert_file_coverage(args):
+    coverage_dir, pretty, file_name, file_coverage_info = args
+
+    file_coverage = {
+        'format': coverage_format_version,
+        'line coverage': file_coverage_info['covered lines'],
+        'function coverage': file_coverage_info['covered functions']
+    }
+
+    os.makedirs(os.path.join(coverage_dir, os.path.dirname(file_name)), exist_ok=True)
+    with open(os.path.join(coverage_dir, file_name + '.cov.json'), 'w') as fp:
+        klever.core.utils.json_dump(file_coverage, fp, pretty)
+
+    return file_name, [
+        # Total number of covered lines of code.
+        len([line_number for line_number, line_coverage in file_coverage_info['covered lines'].items()
+             if line_coverage]),
+        # Total number of considered lines of code.
+        len(file_coverage_info['covered lines']),
+        # Total number of covered functions.
+        len([func_line_number for func_line_number, func_coverage in file_coverage_info['covered functions'].items()
+             if func_coverage]),
+        # Total number of considered functions.
+        len(file_coverage_info['covered functions'])
+    ]
 
 
-def convert_coverage(merged_coverage_info, coverage_dir, pretty, src_files_info=None):
+def _convert_files_coverage(chunk):
+    return [_convert_file_coverage(args) for args in chunk]
+
+
+def convert_coverage(merged_coverage_info, coverage_dir, pretty, src_files_info=None, workers=1):
     # Convert combined coverage to the required format.
     os.mkdir(coverage_dir)
 
@@ -58,29 +248,24 @@ def convert_coverage(merged_coverage_info, coverage_dir, pretty, src_files_info=
         'data statistics': dict()
     }
 
-    for file_name, file_coverage_info in merged_coverage_info.items():
-        file_coverage = {
-            'format': coverage_format_version,
-            'line coverage': file_coverage_info['covered lines'],
-            'function coverage': file_coverage_info['covered functions']
-        }
-
-        os.makedirs(os.path.join(coverage_dir, os.path.dirname(file_name)), exist_ok=True)
-        with open(os.path.join(coverage_dir, file_name + '.cov.json'), 'w') as fp:
-            klever.core.utils.json_dump(file_coverage, fp, pretty)
-
-        coverage_stats['coverage statistics'][file_name] = [
-            # Total number of covered lines of code.
-            len([line_number for line_number, line_coverage in file_coverage_info['covered lines'].items()
-                 if line_coverage]),
-            # Total number of considered lines of code.
-            len(file_coverage_info['covered lines']),
-            # Total number of covered functions.
-            len([func_line_number for func_line_number, func_coverage in file_coverage_info['covered functions'].items()
-                 if func_coverage]),
-            # Total number of considered functions.
-            len(file_coverage_info['covered functions'])
-        ]
+    args = ((coverage_dir, pretty, file_name, file_coverage_info)
+            for file_name, file_coverage_info in merged_coverage_info.items())
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            # Pool.imap_unordered() would pull all arguments at once, so merged coverage of all files would be kept in
+            # memory. Submit chunks of files gradually to keep just few of them at a time.
+            chunks = iter(lambda: list(itertools.islice(args, CONVERSION_CHUNK_SIZE)), [])
+            results = collections.deque()
+            for chunk in chunks:
+                if len(results) >= CONVERSION_CHUNKS_PER_WORKER * workers:
+                    coverage_stats['coverage statistics'].update(results.popleft().get())
+                results.append(pool.apply_async(_convert_files_coverage, (chunk,)))
+
+            while results:
+                coverage_stats['coverage statistics'].update(results.popleft().get())
+    else:
+        for file_name, file_coverage_stats in map(_convert_file_coverage, args):
+            coverage_stats['coverage statistics'][file_name] = file_coverage_stats
 
     if src_files_info:
         # Remove data for covered source files. It is out of interest, but we did not know these files earlier.
@@ -117,7 +302,7 @@ def convert_coverage(merged_coverage_info, coverage_dir, pretty, src_files_info=
 
 class JCR(klever.core.components.Component):
 
-    COVERAGE_FILE_NAME = "cached coverage.json"
+    SEGMENTS_DIR = "cached coverage"
 
     def __init__(self, conf, logger, parent_id, callbacks, mqs, vals, id=None, work_dir=None, attrs=None,
                  separate_from_parent=True, include_child_resources=False, queues_to_terminate=None):
@@ -134,8 +319,8 @@ class JCR(klever.core.components.Component):
 
         total_coverage_infos = dict()
         arcfiles = {}
+        workers = klever.core.utils.get_parallel_threads_num(self.logger, self.conf, 'Results processing')
         os.mkdir('total coverages')
-        counters = dict()
         try:
             while True:
                 coverage_info = self.mqs['req spec ids and coverage info files'].get()
@@ -154,7 +339,6 @@ class JCR(klever.core.components.Component):
                         total_coverage_infos[sub_job_id] = dict()
                         arcfiles[sub_job_id] = dict()
                     req_spec_id = coverage_info['req spec id']
-                    total_coverage_infos[sub_job_id].setdefault(req_spec_id, {})
                     arcfiles[sub_job_id].setdefault(req_spec_id, {})
 
                     if os.path.isfile(coverage_info['coverage info file']):
@@ -166,19 +350,13 @@ class JCR(klever.core.components.Component):
                             os.remove(os.path.join(self.conf['main working directory'],
                                                    coverage_info['coverage info file']))
 
-                        add_to_coverage(total_coverage_infos[sub_job_id][req_spec_id], loaded_coverage_info)
+                        if req_spec_id not in total_coverage_infos[sub_job_id]:
+                            total_coverage_infos[sub_job_id][req_spec_id] = TotalCoverage(
+                                os.path.join(self.__get_total_cov_dir(sub_job_id, req_spec_id), self.SEGMENTS_DIR))
+                        total_coverage_infos[sub_job_id][req_spec_id].add(loaded_coverage_info)
                         for file, file_coverage_info in loaded_coverage_info.items():
                             arcfiles[sub_job_id][req_spec_id][file_coverage_info['original source file name']] = file
                         del loaded_coverage_info
-
-                        counters.setdefault(sub_job_id, dict())
-                        counters[sub_job_id].setdefault(req_spec_id, 0)
-                        counters[sub_job_id][req_spec_id] += 1
-                        if counters[sub_job_id][req_spec_id] >= 10:
-                            self.__read_data(total_coverage_infos, sub_job_id, req_spec_id)
-                            self.__save_data(total_coverage_infos, sub_job_id, req_spec_id)
-                            self.__clean_data(total_coverage_infos, sub_job_id, req_spec_id)
-                            counters[sub_job_id][req_spec_id] = 0
                     else:
                         self.logger.warning("There is no coverage file {!r}".
                                             format(coverage_info['coverage info file']))
@@ -191,21 +369,20 @@ class JCR(klever.core.components.Component):
                     # This is ugly. But this should disappear after implementing TODO at klever.core.job.start_jobs.
                     sub_job_dir = 'job' if sub_job_id == '-' else 'sub-job {0}'.format(sub_job_id)
 
-                    for req_spec_id in counters[sub_job_id]:
-                        self.__read_data(total_coverage_infos, sub_job_id, req_spec_id)
-                        coverage_info = total_coverage_infos[sub_job_id][req_spec_id]
+                    for req_spec_id, total_coverage in total_coverage_infos[sub_job_id].items():
                         total_coverage_dir = os.path.join(self.__get_total_cov_dir(sub_job_id, req_spec_id), 'report')
 
                         with open(os.path.join(sub_job_dir, 'original sources basic information.json')) as fp:
                             src_files_info = json.load(fp)
 
-                        convert_coverage(coverage_info, total_coverage_dir, self.conf['keep intermediate files'],
-                                         src_files_info)
+                        convert_coverage(total_coverage, total_coverage_dir, self.conf['keep intermediate files'],
+                                         src_files_info, workers)
                         total_coverage_dirs.append(total_coverage_dir)
 
                         total_coverages[req_spec_id] = klever.core.utils.ArchiveFiles([total_coverage_dir])
-                        self.__save_data(total_coverage_infos, sub_job_id, req_spec_id)
-                        self.__clean_data(total_coverage_infos, sub_job_id, req_spec_id)
+
+                        if not self.conf['keep intermediate files']:
+                            shutil.rmtree(total_coverage.directory, ignore_errors=True)
 
                     # This isn't great to build component identifier in such the artificial way.
                     # But otherwise we need to pass it everywhere like "sub-job identifier".
@@ -267,46 +444,6 @@ class JCR(klever.core.components.Component):
 
         return total_coverage_dir
 
-    def __read_data(self, cache, sub_job_id, requirement):
-        file_name = os.path.join(self.__get_total_cov_dir(sub_job_id, requirement), self.COVERAGE_FILE_NAME)
-
-        if os.path.isfile(file_name):
-            with open(file_name, 'r', encoding='utf8') as fp:
-                large_cache = json.load(fp)
-        else:
-            large_cache = dict()
-
-        cache.setdefault(sub_job_id, dict())
-        cache[sub_job_id].setdefault(requirement, dict())
-
-        for file_name in large_cache:
-            # todo: Thic code is close to function add_to_coverage
-            cache[sub_job_id][requirement].setdefault(file_name, {
-                'total functions': large_cache[file_name]['total functions'],
-                'covered lines': {},
-                'covered functions': {},
-                'covered function names': list()
-            })
-
-            for path in ('covered lines', 'covered functions'):
-                for line, value in large_cache[file_name][path].items():
-                    cache[sub_job_id][requirement][file_name][path].setdefault(line, 0)
-                    cache[sub_job_id][requirement][file_name][path][line] += value
-            if large_cache[file_name].get('covered function names'):
-                for name in large_cache[file_name]['covered function names']:
-                    if name not in cache[sub_job_id][requirement][file_name]['covered function names']:
-                        cache[sub_job_id][requirement][file_name]['covered function names'].append(name)
-
-    def __save_data(self, cache, sub_job_id, requirement):
-        file_name = os.path.join(self.__get_total_cov_dir(sub_job_id, requirement), self.COVERAGE_FILE_NAME)
-        cache.setdefault(sub_job_id, dict())
-        cache[sub_job_id].setdefault(requirement, dict())
-        with open(file_name, 'w', encoding='utf8') as fp:
-            json.dump(cache[sub_job_id][requirement], fp)
-
-    def __clean_data(self, cache, job_id, requirement):
-        cache[job_id].pop(requirement, None)
-
 
 class LCOV:
     FILENAME_PREFIX = "SF:"
@@ -315,6 +452,7 @@ class LCOV:
     FUNCTION_PREFIX = "FNDA:"
     LINE_PREFIX = "DA:"
     EOR_PREFIX = "end_of_record"
+    PARALLEL_CONVERSION_THRESHOLD = 100
 
     def __init__(self, conf, logger, coverage_file, clade, source_dirs, search_dirs, main_work_dir, coverage_details,
                  coverage_id, coverage_info_dir, verification_task_files):
@@ -345,7 +483,10 @@ class LCOV:
 
             coverage = {}
             add_to_coverage(coverage, self.coverage_info)
-            convert_coverage(coverage, 'coverage', self.conf['keep intermediate files'])
+            # Do not spawn worker processes for small coverages.
+            workers = klever.core.utils.get_parallel_threads_num(self.logger, self.conf, 'Results processing') \
+                if len(coverage) > self.PARALLEL_CONVERSION_THRESHOLD else 1
+            convert_coverage(coverage, 'coverage', self.conf['keep intermediate files'], workers=workers)
         except Exception:
             shutil.rmtree('coverage', ignore_errors=True)
             raise
@@ -356,7 +497,6 @@ class LCOV:
 
         # Parse coverage file.
         coverage_info = {}
-        line_map = {}
         func_map = {}
         func_reverse_map = {}
 
@@ -381,21 +521,8 @@ class LCOV:
                     cil_src_file_name = self.verification_task_files[cil_src_file_name]
                     break
 
-            # Build C source files line map.
-            with open(cil_src_file_name) as cil_fp:
-                line_num = 1
-                orig_file = None
-                orig_file_line_num = 0
-                for line in cil_fp:
-                    m = re.match('#line\s+(\d+)\s*(.*)', line)
-                    if m:
-                        orig_file_line_num = int(m.group(1))
-                        if m.group(2):
-                            orig_file = m.group(2)[1:-1]
-                    else:
-                        line_map[line_num] = (orig_file, orig_file_line_num)
-                        orig_file_line_num += 1
-                    line_num += 1
+            # Get C source files line map. It is likely already built when processing witnesses.
+            line_map = klever.core.utils.get_cil_line_map(cil_src_file_name).line_map
 
             for line in fp:
                 line = line.rstrip('\n')
@@ -17,6 +17,7 @@
 
 import os
 
+import klever.core.cache
 import klever.core.utils
 from klever.core.highlight import Highlight
 
@@ -24,7 +25,8 @@ from klever.core.highlight import Highlight
 class CrossRefs:
     INDEX_DATA_FORMAT_VERSION = 1
 
-    def __init__(self, conf, logger, clade, file_name, new_file_name, common_dirs, common_prefix=''):
+    def __init__(self, conf, logger, clade, file_name, new_file_name, common_dirs, common_prefix='',
+                 idx_file_name=None):
         self.conf = conf
         self.logger = logger
         self.clade = clade
@@ -32,18 +34,21 @@ class CrossRefs:
         self.new_file_name = new_file_name
         self.common_dirs = common_dirs
         self.common_prefix = common_prefix
+        self.idx_file_name = idx_file_name if idx_file_name else self.new_file_name + '.idx.json'
 
-    def get_cross_refs(self):
-        with open(self.new_file_name) as fp:
-            try:
-                src = fp.read()
-            # Source files with non UTF-8 encoding will not be analyzed. There should not be many such source files.
-            except UnicodeDecodeError:
-                return
+    def get_key(self):
+        """
+        Get key of cross references. It is the same while the source file, its references and Klever are the same.
 
-        highlight = Highlight(self.logger, src)
-        highlight.highlight()
+        :return: Key string.
+        """
+        raw_refs_to, raw_refs_from = self.__get_raw_refs()
+        return klever.core.cache.PersistentCache.get_key(
+            'cross references', self.INDEX_DATA_FORMAT_VERSION, klever.core.cache.get_klever_version(),
+            klever.core.utils.get_file_checksum(self.new_file_name), self.file_name, raw_refs_to, raw_refs_from,
+            self.common_dirs, self.common_prefix, self.conf['keep intermediate files'])
 
+    def __get_raw_refs(self):
         # Get raw references to/from for a given source file. There is the only key-value pair in dictionaries
         # returned by Clade where keys are always source file names.
         raw_refs_to = {
@@ -63,6 +68,21 @@ class CrossRefs:
         if clade_refs_from:
             raw_refs_from.update(list(clade_refs_from.values())[0])
 
+        return raw_refs_to, raw_refs_from
+
+    def get_cross_refs(self):
+        with open(self.new_file_name) as fp:
+            try:
+                src = fp.read()
+            # Source files with non UTF-8 encoding will not be analyzed. There should not be many such source files.
+            except UnicodeDecodeError:
+                return
+
+        highlight = Highlight(self.logger, src)
+        highlight.highlight()
+
+        raw_refs_to, raw_refs_from = self.__get_raw_refs()
+
         # Get full list of referred source file names.
         ref_src_files = set()
         for ref_to_kind in ('decl_func', 'def_func', 'def_macro'):
@@ -191,5 +211,5 @@ class CrossRefs:
             'highlight': highlight.highlights
         }
 
-        with open(os.path.join(self.new_file_name + '.idx.json'), 'w') as fp:
+        with open(self.idx_file_name, 'w') as fp:
             klever.core.utils.json_dump(cross_ref, fp, self.conf['keep intermediate files'])
@@ -27,6 +27,7 @@ import zipfile
 
 from clade import Clade
 
+import klever.core.cache
 import klever.core.utils
 import klever.core.session
 import klever.core.components
@@ -243,6 +244,57 @@ def __solve_sub_jobs(core_obj, vals, components_common_conf, subcomponents):
                                                 components_common_conf['ignore failed sub-jobs'], subcomponents)
 
 
+# Workers preparing original sources are forked from Job, so they get what they need from this global variable
+# initialized by _init_original_sources_worker().
+_original_sources_worker = None
+
+
+def _init_original_sources_worker(conf, logger, clade):
+    global _original_sources_worker
+    _original_sources_worker = (conf, logger, clade, klever.core.cache.get_persistent_cache(logger, conf,
+                                                                                             'cross references'))
+
+
+def _get_original_source_file_cross_refs(file_name):
+    conf, logger, clade, _ = _original_sources_worker
+
+    src_file_name = klever.core.utils.make_relative_path(conf['working source trees'], file_name)
+    if src_file_name != file_name:
+        src_file_name = os.path.join('source files', src_file_name)
+
+    # Archive name of the original source file and the corresponding file with cross references.
+    arcname = src_file_name.lstrip(os.path.sep)
+    idx_file_name = os.path.join('original sources', arcname + '.idx.json')
+
+    return CrossRefs(conf, logger, clade, file_name, clade.get_storage_path(file_name), conf['working source trees'],
+                     'source files', idx_file_name), arcname
+
+
+def _get_original_source_file_key(file_name):
+    cross_refs, arcname = _get_original_source_file_cross_refs(file_name)
+    return file_name, arcname, cross_refs.get_key()
+
+
+def _prepare_original_source_file(args):
+    file_name, key = args
+    _, _, _, cache = _original_sources_worker
+    cross_refs, arcname = _get_original_source_file_cross_refs(file_name)
+    os.makedirs(os.path.dirname(cross_refs.idx_file_name), exist_ok=True)
+
+    if cache:
+        with cache.lock(key):
+            if not cache.get(key, {'idx.json': cross_refs.idx_file_name}, link=True):
+                cross_refs.get_cross_refs()
+                # Remember source files without cross references as well, e.g. ones with non UTF-8 encoding.
+                cache.put(key, {'idx.json': cross_refs.idx_file_name}
+                          if os.path.isfile(cross_refs.idx_file_name) else {})
+    else:
+        cross_refs.get_cross_refs()
+
+    return cross_refs.new_file_name, arcname, \
+        cross_refs.idx_file_name if os.path.isfile(cross_refs.idx_file_name) else None
+
+
 class REP(klever.core.components.Component):
 
     def __init__(self, conf, logger, parent_id, callbacks, mqs, vals, id=None, work_dir=None, attrs=None,
@@ -627,35 +679,6 @@ class Job(klever.core.components.Component):
             self.conf['main working directory']
         )
 
-    def __process_source_files(self):
-        for file_name in self.clade.src_info:
-            self.mqs['file names'].put(file_name)
-
-        for i in range(self.workers_num):
-            self.mqs['file names'].put(None)
-
-    def __process_source_file(self):
-        while True:
-            file_name = self.mqs['file names'].get()
-
-            if not file_name:
-                return
-
-            src_file_name = klever.core.utils.make_relative_path(self.common_components_conf['working source trees'],
-                                                                 file_name)
-
-            if src_file_name != file_name:
-                src_file_name = os.path.join('source files', src_file_name)
-
-            new_file_name = os.path.join('original sources', src_file_name.lstrip(os.path.sep))
-            os.makedirs(os.path.dirname(new_file_name), exist_ok=True)
-            shutil.copy(self.clade.get_storage_path(file_name), new_file_name)
-
-            cross_refs = CrossRefs(self.common_components_conf, self.logger, self.clade,
-                                   file_name, new_file_name,
-                                   self.common_components_conf['working source trees'], 'source files')
-            cross_refs.get_cross_refs()
-
     def __get_original_sources_basic_info(self):
         self.logger.info('Get information on original sources for following visualization of uncovered source files')
 
@@ -691,29 +714,35 @@ class Job(klever.core.components.Component):
             klever.core.utils.json_dump(src_files_info, fp, self.conf['keep intermediate files'])
 
     def __upload_original_sources(self):
-        # Use Clade UUID to distinguish various original sources. It is pretty well since this UUID is uuid.uuid4().
-        src_id = self.clade.get_uuid()
-
-        session = klever.core.session.Session(self.logger, self.conf['Klever Bridge'], self.conf['identifier'])
-
-        if session.check_original_sources(src_id):
-            self.logger.info('Original sources were uploaded already')
-            self.__refer_original_sources(src_id)
-            return
-
-        self.logger.info(
-            'Cut off working source trees or build directory from original source file names and convert index data')
-        os.makedirs('original sources')
-        self.mqs['file names'] = multiprocessing.Queue()
-        self.workers_num = klever.core.utils.get_parallel_threads_num(self.logger, self.conf)
-        subcomponents = [('PSFS', self.__process_source_files)]
-        for i in range(self.workers_num):
-            subcomponents.append(('RSF', self.__process_source_file))
-        self.launch_subcomponents(False, *subcomponents)
-        self.mqs['file names'].close()
-
-        self.logger.info('Compress original sources')
-        klever.core.utils.ArchiveFiles(['original sources']).make_archive('original sources.zip')
+        # Original sources are content-addressed. Each source file gets a key depending on its content and references,
+        # and identifier of all original sources is obtained from these keys. Thus, rebuilding Clade for the same
+        # sources does not result in uploading them again, and cross references are regenerated just for changed source
+        # files when the persistent cache is enabled.
+        self.logger.info('Get keys of original source files')
+        workers_num = klever.core.utils.get_parallel_threads_num(self.logger, self.conf)
+        with multiprocessing.Pool(workers_num, _init_original_sources_worker,
+                                  (self.common_components_conf, self.logger, self.clade)) as pool:
+            keys = {file_name: (arcname, key) for file_name, arcname, key
+                    in pool.imap_unordered(_get_original_source_file_key, self.clade.src_info, chunksize=16)}
+            src_id = klever.core.cache.PersistentCache.get_key('original sources', sorted(keys.values()))
+
+            session = klever.core.session.Session(self.logger, self.conf['Klever Bridge'], self.conf['identifier'])
+
+            if session.check_original_sources(src_id):
+                self.logger.info('Original sources were uploaded already')
+                self.__refer_original_sources(src_id)
+                return
+
+            # Do not copy source files and do not keep the whole index data at once. Add each source file and its cross
+            # references to the archive as soon as they are ready.
+            self.logger.info('Prepare and compress original sources and their cross references')
+            with zipfile.ZipFile('original sources.zip', mode='w', compression=zipfile.ZIP_DEFLATED) as zfp:
+                for file_name, arcname, idx_file_name in pool.imap_unordered(
+                        _prepare_original_source_file, ((file_name, key) for file_name, (_, key) in keys.items()),
+                        chunksize=16):
+                    zfp.write(file_name, arcname=arcname)
+                    if idx_file_name:
+                        zfp.write(idx_file_name, arcname=arcname + '.idx.json')
 
         self.logger.info('Upload original sources')
         try:
@@ -727,7 +756,7 @@ class Job(klever.core.components.Component):
         self.__refer_original_sources(src_id)
 
         if not self.conf['keep intermediate files']:
-            shutil.rmtree('original sources')
+            shutil.rmtree('original sources', ignore_errors=True)
             os.remove('original sources.zip')
 
     def __get_job_or_sub_job_components(self):
@@ -17,6 +17,7 @@
 
 import os
 import glob
+from array import array
 
 from klever.core.utils import make_relative_path
 from klever.core.pfg.abstractions.files_repr import File
@@ -25,7 +26,7 @@ from klever.core.pfg.abstractions.fragments_repr import Fragment
 
 class Program:
 
-    def __init__(self, logger, clade, source_paths, memory_efficient_mode=False):
+    def __init__(self, logger, clade, source_paths, memory_efficient_mode=False, compact_dependencies=False):
         """
         The class that represents a program as different data structures: graphs of files or units. Also, it provides
         common methods to extract, modify or delete fragments and other information.
@@ -33,19 +34,30 @@ class Program:
         :param logger:
         :param clade:
         :param source_paths:
-        :param memory_efficient_mode:
+        :param memory_efficient_mode: Do not extract dependencies between files.
+        :param compact_dependencies: Extract dependencies between files reading the callgraph file by file and store
+                                     them compactly. It requires much less memory for large programs.
         """
         self.logger = logger
         self.clade = clade
         self.source_paths = source_paths
         self._files = dict()
         self._fragments = dict()
+        # Inverted indexes: file name -> fragments with this file, function name -> files exporting or importing it
+        self._fragments_by_file = dict()
+        self._exporting_files = dict()
+        self._importing_files = dict()
         self.__divide()
-        if not memory_efficient_mode:
+        if compact_dependencies:
+            self.logger.info("Extract dependencies between files from the program callgraph file by file")
+            self.__stream_dependencies()
+            self.__index_functions()
+        elif not memory_efficient_mode:
             self.logger.info("Extract dependencies between files from the program callgraph")
             # This is very memory unefficient operation, so for Linux this is an optional step to prevent consuming
             # gigabytes of memory
             self.__establish_dependencies()
+            self.__index_functions()
 
     def create_fragment(self, name, files, add=False):
         """
@@ -69,6 +81,7 @@ class Program:
     def add_fragment(self, fragment):
         if fragment.name not in self._fragments:
             self._fragments[fragment.name] = fragment
+            self.__index_fragment_files(fragment, fragment.files)
         else:
             if not self._fragments[fragment.name].files.symmetric_difference(fragment.files):
                 self.logger.warning("There are several equal fragments {!r} extracted, keep only one".
@@ -128,7 +141,32 @@ class Program:
         if name not in self._fragments:
             raise ValueError("Cannot remove already missing fragment {!r}".format(fragment.name))
         else:
-            del self._fragments[name]
+            fragment = self._fragments.pop(name)
+            self.__unindex_fragment_files(fragment, fragment.files)
+
+    def add_fragment_files(self, fragment, files):
+        """
+        Add files to the fragment. Use it instead of modifying files of fragments from the collection directly.
+
+        :param fragment: Fragment object.
+        :param files: File objects.
+        """
+        files = set(files).difference(fragment.files)
+        fragment.files.update(files)
+        if self._fragments.get(fragment.name) is fragment:
+            self.__index_fragment_files(fragment, files)
+
+    def remove_fragment_files(self, fragment, files):
+        """
+        Remove files from the fragment. Use it instead of modifying files of fragments from the collection directly.
+
+        :param fragment: Fragment object.
+        :param files: File objects.
+        """
+        files = fragment.files.intersection(files)
+        fragment.files.difference_update(files)
+        if self._fragments.get(fragment.name) is fragment:
+            self.__unindex_fragment_files(fragment, files)
 
     @property
     def files(self):
@@ -254,11 +292,12 @@ class Program:
         # Check function names
         rest = expressions.difference(matched)
         if rest:
-            for file in (f for f in self.files if f not in suitable_files):
-                matched_funcs = set(file.export_functions.keys()).intersection(rest)
-                if matched_funcs:
-                    suitable_files.add(file)
-                    matched.update(matched_funcs)
+            matched_files = set(suitable_files)
+            for func in rest:
+                files = self._exporting_files.get(func, set()).difference(matched_files)
+                if files:
+                    suitable_files.update(files)
+                    matched.add(func)
 
         return suitable_files, matched
 
@@ -295,11 +334,8 @@ class Program:
         :return: Set of Fragment objects.
         """
         frags = set()
-        files = {f if isinstance(f, str) else f.name for f in files}
-        if files:
-            for frag in self.fragments:
-                if {f.name for f in frag.files}.intersection(files):
-                    frags.add(frag)
+        for file in files:
+            frags.update(self._fragments_by_file.get(file if isinstance(file, str) else file.name, set()))
         return frags
 
     def get_files_calling_functions(self, functions):
@@ -310,10 +346,8 @@ class Program:
         :return: File objects.
         """
         files = set()
-        if functions:
-            for file in self.files:
-                if set(file.import_functions.keys()).intersection(functions):
-                    files.add(file)
+        for func in functions:
+            files.update(self._importing_files.get(func, set()))
         return files
 
     def collect_dependencies(self, files, filter_func=lambda x: True, depth=None, max=None):
@@ -377,6 +411,81 @@ class Program:
                         file.size = 0
                     self._files[name] = file
 
+    def __stream_dependencies(self):
+        """
+        Do the same as __establish_dependencies() but load the callgraph and functions of one file at a time. Files that
+        export functions to the given one are stored as arrays of indexes of File objects. Files do not have imported
+        functions in this mode, they are available only via get_files_calling_functions().
+        """
+        paths = sorted(self._files.keys())
+        files = [self._files[path] for path in paths]
+        ids = {path: i for i, path in enumerate(paths)}
+
+        # Global functions are required in advance to skip calls of static functions with the same names
+        global_functions = [set() for _ in files]
+        for i, path in enumerate(paths):
+            functions = self.clade.get_functions_by_file([path], add_unknown=False).get(path, dict())
+            for func, func_desc in functions.items():
+                if func_desc.get('type', 'static') != 'static':
+                    global_functions[i].add(func)
+                    files[i].add_export_function(func)
+
+        successors = []
+        predecessors_num = [0] * len(files)
+        for i, path in enumerate(paths):
+            functions = self.clade.get_callgraph([path], add_unknown=False).get(path, dict())
+            imported = dict()
+            file_successors = set()
+            for func, func_desc in functions.items():
+                if func_desc.get('type', 'static') != 'static':
+                    files[i].add_export_function(func)
+
+                for called_definition_scope, called_functions in \
+                        ((s, d) for s, d in func_desc.get('calls', dict()).items()
+                         if s != path and s != 'unknown' and s in ids):
+                    scope_id = ids[called_definition_scope]
+                    for called_function in (c for c in called_functions if c in global_functions[scope_id]):
+                        match_score = list(called_functions[called_function].values())[0]["match_type"]
+                        # Like File.add_import_function() keep all definition scopes that were the best ones
+                        if called_function not in imported or imported[called_function] < match_score:
+                            imported[called_function] = match_score
+                            file_successors.add(scope_id)
+
+            for func in imported:
+                self._importing_files.setdefault(func, set()).add(files[i])
+            successors.append(array('I', sorted(file_successors)))
+            for scope_id in file_successors:
+                predecessors_num[scope_id] += 1
+
+        predecessors = [array('I', [0] * num) for num in predecessors_num]
+        for i, file_successors in enumerate(successors):
+            for scope_id in file_successors:
+                predecessors_num[scope_id] -= 1
+                predecessors[scope_id][predecessors_num[scope_id]] = i
+
+        for i, file in enumerate(files):
+            file.set_compact_dependencies(files, successors[i], predecessors[i])
+
+    def __index_fragment_files(self, fragment, files):
+        for file in files:
+            self._fragments_by_file.setdefault(file.name, set()).add(fragment)
+
+    def __unindex_fragment_files(self, fragment, files):
+        for file in files:
+            fragments = self._fragments_by_file.get(file.name)
+            if fragments:
+                fragments.discard(fragment)
+                if not fragments:
+                    del self._fragments_by_file[file.name]
+
+    def __index_functions(self):
+        """Collect files that export and import global functions after dependencies are established."""
+        for file in self.files:
+            for func in file.export_functions:
+                self._exporting_files.setdefault(func, set()).add(file)
+            for func in file.import_functions:
+                self._importing_files.setdefault(func, set()).add(file)
+
     def __check_cc(self, desc):
         """
         Sanity checks for CC commands.
@@ -32,6 +32,8 @@ class File:
         self._import_functions = dict()
         self._predecessors = set()
         self._successors = set()
+        # All files of the program if dependencies are stored as arrays of their indexes, see set_compact_dependencies()
+        self._program_files = None
         self.abs_path = None
         self.cmd_id = None,
         self.cmd_type = None,
@@ -41,10 +43,14 @@ class File:
 
     @property
     def successors(self):
+        if self._program_files is not None:
+            return {self._program_files[i] for i in self._successors}
         return set(self._successors)
 
     @property
     def predecessors(self):
+        if self._program_files is not None:
+            return {self._program_files[i] for i in self._predecessors}
         return set(self._predecessors)
 
     @property
@@ -95,6 +101,18 @@ class File:
             self._successors.add(successor)
             successor._predecessors.add(self)
 
+    def set_compact_dependencies(self, program_files, successors, predecessors):
+        """
+        Set successors and predecessors as arrays of indexes of File objects rather than sets of them to save memory.
+
+        :param program_files: List of all File objects of the program shared between them.
+        :param successors: Array of indexes of successors.
+        :param predecessors: Array of indexes of predecessors.
+        """
+        self._program_files = program_files
+        self._successors = successors
+        self._predecessors = predecessors
+
     def add_export_function(self, function_name, user_files=None):
         """
         Add an exported function.
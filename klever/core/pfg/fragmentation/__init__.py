@@ -75,13 +75,19 @@ class FragmentationAlgorythm:
         """
         # Extract dependencies
         self.logger.info("Start program fragmentation")
+        compact_dependencies = False
         if self.tactic.get('ignore dependencies'):
             self.logger.info("Use memory efficient mode with limitied dependencies extraction")
             memory_efficient_mode = True
+        elif self.tactic.get('compact dependencies'):
+            self.logger.info("Extract dependencies between files storing them compactly")
+            memory_efficient_mode = False
+            compact_dependencies = True
         else:
             self.logger.info("Extract full dependencies between files and functions")
             memory_efficient_mode = False
-        deps = Program(self.logger, self.clade, self.source_paths, memory_efficient_mode=memory_efficient_mode)
+        deps = Program(self.logger, self.clade, self.source_paths, memory_efficient_mode=memory_efficient_mode,
+                       compact_dependencies=compact_dependencies)
 
         # Decompose using units
         self.logger.info("Determine units in the target program")
@@ -106,7 +112,7 @@ class FragmentationAlgorythm:
                 allfiles = set()
                 for item in defined_groups[manual]:
                     allfiles.update(item.files)
-                fragment.files.difference_update(allfiles)
+                deps.remove_fragment_files(fragment, allfiles)
 
         # Before describing files add manually defined files
         for group in grps:
@@ -266,8 +272,8 @@ class FragmentationAlgorythm:
         # Do modification
         empty = set()
         for fragment in program.fragments:
-            fragment.files.update(addiction)
-            fragment.files.difference_update(removal)
+            program.add_fragment_files(fragment, addiction)
+            program.remove_fragment_files(fragment, removal)
             if not fragment.files:
                 empty.add(fragment)
 
@@ -0,0 +1,146 @@
+#
+# Copyright (c) 2020 ISP RAS (http://www.ispras.ru)
+# Ivannikov Institute for System Programming of the Russian Academy of Sciences
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Opt-in profiling of Klever Core. Spans are recorded in the Trace Event Format, so the merged trace can be examined by
+chrome://tracing, Perfetto and other tools. Each process appends its events to a separate file within the traces
+directory, thus processes do not need to synchronize with each other and events are not lost when components exit
+without any cleanup.
+"""
+
+import contextlib
+import glob
+import json
+import os
+import threading
+import time
+
+
+TRACES_DIR = 'traces'
+
+# Directory where processes write their events. Spans are not recorded if it is not set. Child processes inherit it.
+_traces_dir = None
+
+
+def configure(conf):
+    """
+    Enable profiling if configuration option "profiling" is set.
+
+    :param conf: Klever Core configuration.
+    """
+    global _traces_dir
+
+    if conf.get('profiling'):
+        _traces_dir = os.path.join(conf['main working directory'], TRACES_DIR)
+        os.makedirs(_traces_dir, exist_ok=True)
+
+
+def is_enabled():
+    return _traces_dir is not None
+
+
+def _write_event(event):
+    # Appending a single line is atomic, so events of different threads are not mixed.
+    fd = os.open(os.path.join(_traces_dir, '{0}.json'.format(os.getpid())), os.O_WRONLY | os.O_CREAT | os.O_APPEND)
+    try:
+        os.write(fd, (json.dumps(event, ensure_ascii=False) + '\n').encode('utf8'))
+    finally:
+        os.close(fd)
+
+
+def set_process_name(name):
+    """
+    Name the current process in the trace, e.g. after the component it runs.
+
+    :param name: Process name.
+    """
+    if _traces_dir:
+        _write_event({'name': 'process_name', 'ph': 'M', 'pid': os.getpid(), 'args': {'name': name}})
+
+
+@contextlib.contextmanager
+def span(name, category='core', **args):
+    """
+    Record the time that is spent within the context.
+
+    :param name: Span name.
+    :param category: Span category like "component", "tool", "bridge" or "wait".
+    :param args: Additional JSON serializable data.
+    """
+    if not _traces_dir:
+        yield
+        return
+
+    start = time.time()
+    try:
+        yield
+    finally:
+        add_span(name, category, start, **args)
+
+
+def add_span(name, category, start, end=None, **args):
+    """
+    Record the span that was measured by the caller.
+
+    :param name: Span name.
+    :param category: Span category.
+    :param start: Start time as returned by time.time().
+    :param end: End time. The current time is used by default.
+    :param args: Additional JSON serializable data.
+    """
+    if not _traces_dir:
+        return
+
+    if end is None:
+        end = time.time()
+
+    event = {
+        'name': name,
+        'cat': category,
+        'ph': 'X',
+        'ts': round(start * 1000000),
+        'dur': round((end - start) * 1000000),
+        'pid': os.getpid(),
+        'tid': threading.get_ident()
+    }
+    if args:
+        event['args'] = args
+    _write_event(event)
+
+
+def merge_traces(trace_file):
+    """
+    Merge events of all processes into a single trace file.
+
+    :param trace_file: Path to the trace file.
+    :return: Number of events.
+    """
+    events = []
+    for process_trace_file in glob.glob(os.path.join(_traces_dir, '*.json')):
+        with open(process_trace_file, encoding='utf8') as fp:
+            for line in fp:
+                # The last line may be incomplete if a process was killed.
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    pass
+
+    events.sort(key=lambda e: e.get('ts', 0))
+    with open(trace_file, 'w', encoding='utf8') as fp:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, fp, ensure_ascii=False)
+
+    return len(events)
@@ -0,0 +1,196 @@
+#
+# Copyright (c) 2020 ISP RAS (http://www.ispras.ru)
+# Ivannikov Institute for System Programming of the Russian Academy of Sciences
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import argparse
+import glob
+import gzip
+import json
+import os
+import pickle
+import time
+
+import ujson
+
+
+GZIP_MAGIC = b'\x1f\x8b'
+PICKLE_MAGIC = b'\x80'
+# Old versions of ujson round floats to 9 decimal digits, so they are not used
+UJSON_IS_EXACT = ujson.dumps(0.1 + 0.2) == json.dumps(0.1 + 0.2)
+
+
+def dumps_json(obj, pretty=False):
+    if pretty:
+        return json.dumps(obj, ensure_ascii=True, sort_keys=True, indent=4).encode('utf8')
+
+    if UJSON_IS_EXACT:
+        # ujson dumps large objects several times faster than the standard json module, but it can not dump integers
+        # that do not fit 64 bits.
+        try:
+            return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False).encode('utf8')
+        except OverflowError:
+            pass
+
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf8')
+
+
+def loads_json(data):
+    # The standard json module loads objects as fast as ujson does.
+    return json.loads(data.decode('utf8'))
+
+
+def dumps_pickle(obj, pretty=False):
+    return pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+
+
+def loads_pickle(data):
+    return pickle.loads(data)
+
+
+# Serializers of intermediate files that are written and read just by Klever Core. Each of them consists of functions
+# to dump an object to bytes and to load it from bytes. Loaded files should start with magic bytes that allow to
+# distinguish them from JSON files (see load()).
+SERIALIZERS = {
+    'json': (dumps_json, loads_json),
+    'pickle': (dumps_pickle, loads_pickle)
+}
+
+
+def dumps(obj, serializer='json', compress=False, pretty=False):
+    """
+    Serialize the object.
+
+    :param obj: Serializable object.
+    :param serializer: Serializer name from SERIALIZERS.
+    :param compress: Compress serialized data.
+    :param pretty: Pretty printing flag that makes sense just for JSON.
+    :return: Bytes.
+    """
+    if serializer not in SERIALIZERS:
+        raise ValueError('Unknown serializer "{0}", use one of {1}'.format(serializer, ', '.join(SERIALIZERS)))
+
+    data = SERIALIZERS[serializer][0](obj, pretty)
+    if compress:
+        # Intermediate files are read soon after they are written, so compress them fast.
+        data = gzip.compress(data, compresslevel=1)
+
+    return data
+
+
+def loads(data):
+    """
+    Deserialize the object independently on a serializer and compression that were used.
+
+    :param data: Bytes.
+    :return: Object.
+    """
+    if data.startswith(GZIP_MAGIC):
+        data = gzip.decompress(data)
+
+    if data.startswith(PICKLE_MAGIC):
+        return loads_pickle(data)
+
+    return loads_json(data)
+
+
+def dump(obj, file_name, conf):
+    """
+    Save the intermediate file. Readable JSON is used when intermediate files are kept. Otherwise configuration options
+    "intermediate files serializer" and "compress intermediate files" are taken into account.
+
+    :param obj: Serializable object.
+    :param file_name: File name.
+    :param conf: Component configuration.
+    """
+    if conf['keep intermediate files']:
+        data = dumps(obj, pretty=True)
+    else:
+        data = dumps(obj, conf.get('intermediate files serializer', 'json'),
+                     conf.get('compress intermediate files', False))
+
+    with open(file_name, 'wb') as fp:
+        fp.write(data)
+
+
+def load(file_name):
+    """
+    Read the intermediate file saved by dump().
+
+    :param file_name: File name.
+    :return: Object.
+    """
+    with open(file_name, 'rb') as fp:
+        return loads(fp.read())
+
+
+def benchmark(files, repeat=3):
+    """
+    Compare serializers on given intermediate files.
+
+    :param files: List of files.
+    :param repeat: Number of repetitions to get the best time.
+    :return: List of results including names of serializers, compression flags, total sizes and dump and load times.
+    """
+    objs = [load(file) for file in files]
+    variants = [('json', False, True)] + [(serializer, compress, False) for serializer in SERIALIZERS
+                                          for compress in (False, True)]
+
+    results = []
+    for serializer, compress, pretty in variants:
+        dump_time = load_time = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            datas = [dumps(obj, serializer, compress, pretty) for obj in objs]
+            dump_time = min(dump_time, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for data in datas:
+                loads(data)
+            load_time = min(load_time, time.perf_counter() - start)
+
+        results.append({
+            'serializer': serializer + (' (pretty)' if pretty else ''),
+            'compress': compress,
+            'size': sum(len(data) for data in datas),
+            'dump time': dump_time,
+            'load time': load_time
+        })
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare serializers of intermediate files of a Klever Core job.')
+    parser.add_argument('directory', help='Main working directory of Klever Core that was run with option "keep '
+                                          'intermediate files".')
+    parser.add_argument('--pattern', default='*abstract task.json',
+                        help='Pattern of names of intermediate files (default: "%(default)s").')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of repetitions (default: %(default)s).')
+    args = parser.parse_args()
+
+    files = sorted(file for file in glob.glob(os.path.join(args.directory, '**', args.pattern), recursive=True)
+                   if os.path.isfile(file) and not os.path.islink(file))
+    if not files:
+        raise FileNotFoundError('There are no files matching "{0}" in "{1}"'.format(args.pattern, args.directory))
+
+    print('Compare serializers on {0} files'.format(len(files)))
+    print('{0:<16} {1:<9} {2:>14} {3:>10} {4:>10}'.format('Serializer', 'Compress', 'Size, bytes', 'Dump, s', 'Load, s'))
+    for result in benchmark(files, args.repeat):
+        print('{serializer:<16} {compress!s:<9} {size:>14} {dump time:>10.3f} {load time:>10.3f}'.format(**result))
+
+
+if __name__ == '__main__':
+    main()
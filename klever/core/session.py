@@ -15,12 +15,16 @@
 # limitations under the License.
 #
 
+import gzip
 import json
 import os
+import re
 import requests
 import time
 import zipfile
 
+import klever.core.profiling
+
 
 class UnexpectedStatusCode(IOError):
     pass
@@ -61,6 +65,7 @@ class Session:
 
         self.logger.debug('Send "{0}" request to "{1}"'.format(method, url))
 
+        start_time = time.time()
         while True:
             try:
                 resp = self.session.request(method, url, **kwargs)
@@ -78,6 +83,9 @@ class Session:
                     raise UnexpectedStatusCode(
                         'Got unexpected status code "{0}" when send "{1}" request to "{2}"'.format(status_code,
                                                                                                    method, url))
+                # Identifiers are cut off to group spans by requests kind.
+                klever.core.profiling.add_span(re.sub(r'/[^/]*\d[^/]*/', '/*/', '/' + path_url)[1:], 'bridge',
+                                               start_time, method=method)
                 return resp
             except requests.ConnectionError:
                 self.logger.warning('Could not send "{0}" request to "{1}"'.format(method, url))
@@ -109,6 +117,23 @@ class Session:
         resp = self.__request('service/tasks/?job={}&fields=status&fields=id'.format(self.job_id), method='GET')
         return resp.json()
 
+    def get_tasks_statuses_changes(self, cursor=None, statuses=None):
+        """
+        Get statuses of tasks that were changed since the previous request.
+
+        :param cursor: Cursor returned by the previous request or None to get statuses of all tasks.
+        :param statuses: Return only tasks with these statuses.
+        :return: A new cursor and a list of dictionaries with task identifiers and statuses.
+        """
+        params = {'job': self.job_id}
+        if cursor:
+            params['cursor'] = cursor
+        if statuses:
+            params['status'] = list(statuses)
+        resp = self.__request('service/tasks/changes/', method='GET', params=params)
+        data = resp.json()
+        return data['cursor'], data['tasks']
+
     def get_task_error(self, task_id):
         resp = self.__request('service/tasks/{}/?fields=error'.format(task_id), method='GET')
         return resp.json()['error']
@@ -128,24 +153,31 @@ class Session:
                                {'identifier': src_id},
                                {'archive': src_archive})
 
-    def upload_reports_and_report_file_archives(self, reports_and_report_file_archives):
-        batch_reports = []
-        batch_report_file_archives = []
-        for report_and_report_file_archives in reports_and_report_file_archives:
-            with open(report_and_report_file_archives['report file'], encoding='utf8') as fp:
-                batch_reports.append(json.load(fp))
-
-            report_file_archives = report_and_report_file_archives.get('report file archives')
-            if report_file_archives:
-                batch_report_file_archives.extend(report_file_archives)
-
-        # TODO: report is likely should be compressed.
-        self.__upload_archives('reports/api/upload/{0}/'.format(self.job_id),
-                               {'reports': json.dumps(batch_reports)},
-                               {os.path.basename(archive): archive for archive in batch_report_file_archives})
+    @staticmethod
+    def compress_reports(reports):
+        # Reports contain a lot of repeating attributes, so even the fast compression level reduces them considerably.
+        return gzip.compress(json.dumps(reports, ensure_ascii=False).encode('utf8'), compresslevel=3)
+
+    def upload_reports(self, reports, report_file_archives, compressed_reports=None):
+        """
+        Upload a batch of reports together with report file archives.
+
+        :param reports: List of reports.
+        :param report_file_archives: List of paths to report file archives.
+        :param compressed_reports: Reports compressed by compress_reports() in advance or None to send them as is.
+        """
+        if compressed_reports:
+            data = {}
+            contents = {'compressed reports': ('reports.json.gz', compressed_reports)}
+        else:
+            data = {'reports': json.dumps(reports)}
+            contents = None
+
+        self.__upload_archives('reports/api/upload/{0}/'.format(self.job_id), data,
+                               {os.path.basename(archive): archive for archive in report_file_archives}, contents)
 
         # We can safely remove task and its files after uploading report referencing task files.
-        for report in batch_reports:
+        for report in reports:
             if 'task identifier' in report:
                 self.remove_task(report['task identifier'])
 
@@ -172,14 +204,16 @@ class Session:
                 if resp:
                     resp.close()
 
-    def __upload_archives(self, path_url, data, archives):
+    def __upload_archives(self, path_url, data, archives, contents=None):
         while True:
             resp = None
             try:
-                resp = self.__request(path_url, 'POST', data=data,
-                                      files={archive_name: open(archive_path, 'rb', buffering=0)
-                                             for archive_name, archive_path in archives.items()},
-                                      stream=True)
+                files = {archive_name: open(archive_path, 'rb', buffering=0)
+                         for archive_name, archive_path in archives.items()}
+                # Files that are prepared in memory
+                if contents:
+                    files.update(contents)
+                resp = self.__request(path_url, 'POST', data=data, files=files, stream=True)
                 return resp.json()
             except BridgeError:
                 if 'ZIP error' in self.error:
@@ -15,12 +15,14 @@
 # limitations under the License.
 #
 
+import bisect
 import fcntl
 import json
 import hashlib
 import logging
 import os
 import re
+import selectors
 import subprocess
 import sys
 import zipfile
@@ -32,6 +34,9 @@ import shutil
 import resource
 import random
 import string
+import struct
+
+import klever.core.profiling
 
 
 class Cd:
@@ -80,108 +85,146 @@ class LockedOpen(object):
             pass
 
 
-class StreamQueue:
+# todo: Get these limitations from some config
+EXECUTION_TIME_LIMIT = 450
+EXECUTION_MEMORY_LIMIT = 1000000000
+
+
+class StreamReader:
     def __init__(self, stream, stream_name, collect_all_output=False):
         self.stream = stream
         self.stream_name = stream_name
         self.collect_all_output = collect_all_output
-        self.queue = queue.Queue()
-        self.finished = False
-        self.traceback = None
-        self.thread = threading.Thread(target=self.__put_lines_from_stream_to_queue)
         self.output = []
+        # Lines that were read but were not printed to logs yet.
+        self.lines = []
+        self.__buffer = b''
+
+    def read(self):
+        """
+        Read available data from the stream without blocking.
+
+        :return: False if the stream was closed and True otherwise.
+        """
+        data = os.read(self.stream.fileno(), 65536)
+        if data:
+            self.__buffer += data
+            *lines, self.__buffer = self.__buffer.split(b'\n')
+        else:
+            # Print the last line even if it is not terminated.
+            lines = [self.__buffer] if self.__buffer else []
+            self.__buffer = b''
 
-    def get(self):
-        try:
-            return self.queue.get_nowait()
-        except queue.Empty:
-            return None
-
-    def join(self):
-        self.thread.join()
-
-    def start(self):
-        self.thread.start()
+        for line in lines:
+            line = line.decode('utf8', errors='replace').rstrip()
+            self.lines.append(line)
+            if self.collect_all_output:
+                self.output.append(line)
 
-    def __put_lines_from_stream_to_queue(self):
-        try:
-            # This will put lines from stream to queue until stream will be closed. For instance it will happen when
-            # execution of command will be completed.
-            for line in self.stream:
-                line = line.decode('utf8').rstrip()
-                self.queue.put(line)
-                if self.collect_all_output:
-                    self.output.append(line)
-
-            # Nothing will be put to queue from now.
-            self.finished = True
-        except Exception:
-            import traceback
-            self.traceback = traceback.format_exc().rstrip()
+        return bool(data)
 
 
 def execute(logger, args, env=None, cwd=None, timeout=0.1, collect_all_stdout=False, filter_func=None,
-            enforce_limitations=False):
+            enforce_limitations=False, resources=None):
+    """
+    Execute the command and print everything it outputs to logs each timeout seconds. In case of failure STDERR is
+    stored as problem description and the process exits.
+
+    :param logger: Logger object.
+    :param args: Command and its arguments.
+    :param env: Environment variables.
+    :param cwd: Working directory.
+    :param timeout: Period of printing command output to logs.
+    :param collect_all_stdout: Return all STDOUT lines.
+    :param filter_func: Function to filter STDERR lines for problem description.
+    :param enforce_limitations: Limit CPU time and virtual memory of the command.
+    :param resources: Dictionary to accumulate resources consumed by executed commands.
+    :return: List of STDOUT lines if it is requested.
+    """
     cmd = args[0]
     logger.debug('Execute:\n{0}{1}{2}'.format(cmd,
                                               '' if len(args) == 1 else ' ',
                                               ' '.join('"{0}"'.format(arg) for arg in args[1:])))
 
     if enforce_limitations:
-        # todo: Get these limitations from some config
-        timelimit = 450
-        memlimit = 1000000000
-
-        soft_time, hard_time = resource.getrlimit(resource.RLIMIT_CPU)
-        soft_mem, hard_mem = resource.getrlimit(resource.RLIMIT_AS)
-        logger.debug('Got the following limitations: time={}s, memory={}B'.format(timelimit, memlimit))
-
-    p = subprocess.Popen(args, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd)
-    if enforce_limitations:
-        resource.prlimit(p.pid, resource.RLIMIT_CPU, [timelimit, hard_time])
-        resource.prlimit(p.pid, resource.RLIMIT_AS, [memlimit, hard_mem])
-
-    out_q, err_q = (StreamQueue(p.stdout, 'STDOUT', collect_all_stdout), StreamQueue(p.stderr, 'STDERR', True))
-
-    for stream_q in (out_q, err_q):
-        stream_q.start()
-
-    # Print to logs everything that is printed to STDOUT and STDERR each timeout seconds. Last try is required to
-    # print last messages queued before command finishes.
-    last_try = True
-    while not out_q.finished or not err_q.finished or last_try:
-        if out_q.traceback:
-            raise RuntimeError('STDOUT reader thread failed with the following traceback:\n{0}'.format(out_q.traceback))
-        if err_q.traceback:
-            raise RuntimeError('STDERR reader thread failed with the following traceback:\n{0}'.format(err_q.traceback))
-        last_try = not out_q.finished or not err_q.finished
-        time.sleep(timeout)
-
-        for stream_q in (out_q, err_q):
-            output = []
-            while True:
-                line = stream_q.get()
-                if line is None:
-                    break
-                output.append(line)
-            if output:
-                m = '"{0}" outputted to {1}:\n{2}'.format(cmd, stream_q.stream_name, '\n'.join(output))
-                if stream_q is out_q:
+        logger.debug('Got the following limitations: time={}s, memory={}B'.format(EXECUTION_TIME_LIMIT,
+                                                                                  EXECUTION_MEMORY_LIMIT))
+        hard_time = resource.getrlimit(resource.RLIMIT_CPU)[1]
+        hard_mem = resource.getrlimit(resource.RLIMIT_AS)[1]
+
+    # Limitations are set before executing the command, so it can not exceed them even at the very beginning. This is
+    # done between fork() and exec() in the process that can have other threads, so do nothing else there.
+    def set_limits():
+        resource.setrlimit(resource.RLIMIT_CPU, (EXECUTION_TIME_LIMIT, hard_time))
+        resource.setrlimit(resource.RLIMIT_AS, (EXECUTION_MEMORY_LIMIT, hard_mem))
+
+    start_time = time.time()
+    p = subprocess.Popen(args, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd,
+                         preexec_fn=set_limits if enforce_limitations else None)
+
+    out_r, err_r = (StreamReader(p.stdout, 'STDOUT', collect_all_stdout), StreamReader(p.stderr, 'STDERR', True))
+
+    def print_output():
+        for reader in (out_r, err_r):
+            if reader.lines:
+                m = '"{0}" outputted to {1}:\n{2}'.format(cmd, reader.stream_name, '\n'.join(reader.lines))
+                reader.lines = []
+                if reader is out_r:
                     logger.debug(m)
                 else:
                     logger.warning(m)
 
-    for stream_q in (out_q, err_q):
-        stream_q.join()
-
-    if p.poll():
-        logger.error('"{0}" exitted with "{1}"'.format(cmd, p.poll()))
+    # Wait for output of the command in one loop rather than in threads and print it to logs each timeout seconds.
+    with selectors.DefaultSelector() as selector:
+        for reader in (out_r, err_r):
+            selector.register(reader.stream, selectors.EVENT_READ, reader)
+
+        last_print = time.time()
+        while selector.get_map():
+            wait = None
+            if out_r.lines or err_r.lines:
+                wait = max(0, last_print + timeout - time.time())
+
+            for key, _ in selector.select(wait):
+                if not key.data.read():
+                    selector.unregister(key.fileobj)
+
+            if time.time() - last_print >= timeout:
+                print_output()
+                last_print = time.time()
+
+    print_output()
+    for stream in (p.stdout, p.stderr):
+        stream.close()
+
+    # Wait for the command by means of wait4() to get resources consumed just by it.
+    _, status, rusage = os.wait4(p.pid, 0)
+    p.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+    consumed_resources = {
+        'wall time': round(1000 * (time.time() - start_time)),
+        'CPU time': round(1000 * (rusage.ru_utime + rusage.ru_stime)),
+        'memory size': 1000 * rusage.ru_maxrss
+    }
+    klever.core.profiling.add_span(os.path.basename(cmd), 'tool', start_time, **consumed_resources)
+    logger.debug('"{0}" consumed the following resources: {1}'.format(
+        cmd, ', '.join('{0} - {1}'.format(res, consumed_resources[res]) for res in sorted(consumed_resources))))
+
+    if resources is not None:
+        cmd_resources = resources.setdefault(os.path.basename(cmd), {'executions': 0, 'wall time': 0, 'CPU time': 0,
+                                                                     'memory size': 0})
+        cmd_resources['executions'] += 1
+        cmd_resources['wall time'] += consumed_resources['wall time']
+        cmd_resources['CPU time'] += consumed_resources['CPU time']
+        cmd_resources['memory size'] = max(cmd_resources['memory size'], consumed_resources['memory size'])
+
+    if p.returncode:
+        logger.error('"{0}" exitted with "{1}"'.format(cmd, p.returncode))
         with open('problem desc.txt', 'a', encoding='utf8') as fp:
-            out = filter(filter_func, err_q.output) if filter_func else err_q.output
+            out = filter(filter_func, err_r.output) if filter_func else err_r.output
             fp.write('\n'.join(out))
         sys.exit(1)
     elif collect_all_stdout:
-        return out_q.output
+        return out_r.output
 
 
 def reliable_rmtree(logger, directory):
@@ -484,9 +527,104 @@ def capitalize_attr_names(attrs):
             capitalize_attr_names(attr['value'])
 
 
+# Reports are appended to journals placed in this subdirectory of the reports directory if it exists. Otherwise each
+# report is dumped to a separate file that is convenient for debugging.
+REPORTS_JOURNAL_DIR = 'journal'
+# Each process starts a new journal segment when the current one exceeds this size (in bytes), so segments which
+# reports were uploaded can be removed.
+REPORTS_JOURNAL_SEGMENT_SIZE = 64 * 1024 ** 2
+# [process identifier, file descriptor, segment file, segment number, number of queued records in the segment]
+_reports_journal = None
+_reports_journal_lock = threading.Lock()
+
+
+def _append_to_reports_journal(journal_dir, data, queued=True):
+    """
+    Append a record to the reports journal of the current process.
+
+    :param journal_dir: Directory with journals.
+    :param data: Record data.
+    :param queued: Whether the record will be put to the report files message queue.
+    :return: Journal segment file, offset and size of the record data and the number of queued records in the segment
+             if the record is the last one in the segment or None otherwise.
+    """
+    global _reports_journal
+
+    with _reports_journal_lock:
+        # Processes forked from the one that already opened its journal should use their own ones.
+        if not _reports_journal or _reports_journal[0] != os.getpid():
+            _reports_journal = [os.getpid(), None, None, 0, 0]
+
+        if _reports_journal[1] is None:
+            _reports_journal[2] = os.path.join(journal_dir, '{0}.{1}.log'.format(os.getpid(), _reports_journal[3]))
+            _reports_journal[1] = os.open(_reports_journal[2], os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+        _, fd, journal, segment, records = _reports_journal
+        offset = os.lseek(fd, 0, os.SEEK_END)
+        record = memoryview(struct.pack('>Q', len(data)) + data)
+        while record:
+            record = record[os.write(fd, record):]
+
+        if queued:
+            records += 1
+        _reports_journal[4] = records
+
+        if offset + 8 + len(data) < REPORTS_JOURNAL_SEGMENT_SIZE:
+            return journal, offset + 8, len(data), None
+
+        os.close(fd)
+        _reports_journal[1:] = [None, None, segment + 1, 0]
+
+    return journal, offset + 8, len(data), records
+
+
+def read_report(report_and_report_file_archives):
+    """
+    Read report from the reports journal or from a separate file.
+
+    :param report_and_report_file_archives: Message from the report files message queue.
+    :return: Report data as a string.
+    """
+    if 'journal' in report_and_report_file_archives:
+        with open(report_and_report_file_archives['journal'], 'rb') as fp:
+            fp.seek(report_and_report_file_archives['offset'])
+            return fp.read(report_and_report_file_archives['size']).decode('utf8')
+
+    with open(report_and_report_file_archives['report file'], encoding='utf8') as fp:
+        return fp.read()
+
+
+def _name_archive_by_content(archive, report_id):
+    with open(archive, 'rb') as fp:
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: fp.read(1024 * 1024), b''):
+            digest.update(chunk)
+        digest = digest.hexdigest()
+
+    name = os.path.join(os.path.dirname(archive), '{0}.zip'.format(digest))
+    try:
+        os.link(archive, name)
+    except FileExistsError:
+        # The same archive was already created for another report. Share its content but keep a separate name since
+        # archives are removed as soon as reports referring them are uploaded.
+        existing_name = name
+        name = os.path.join(os.path.dirname(archive), '{0} {1}.zip'.format(digest, report_id))
+        try:
+            os.link(existing_name, name)
+        except FileNotFoundError:
+            os.link(archive, name)
+    os.remove(archive)
+
+    return name
+
+
 def report(logger, kind, report_data, mq, report_id, main_work_dir, report_dir='', data_files=None):
     logger.debug('Create {0} report'.format(kind))
 
+    reports_dir = os.path.join(main_work_dir, 'reports')
+    journal_dir = os.path.join(reports_dir, REPORTS_JOURNAL_DIR)
+    use_journal = os.path.isdir(journal_dir)
+
     # Specify report type.
     report_data.update({'type': kind})
 
@@ -502,7 +640,7 @@ def report(logger, kind, report_data, mq, report_id, main_work_dir, report_dir='
 
         if data_files:
             archive_name = '{} data attributes.zip'.format(cur_report_id)
-            data_zip = os.path.join(main_work_dir, 'reports', archive_name)
+            data_zip = os.path.join(reports_dir, archive_name)
             with open(data_zip, mode='w+b', buffering=0) as f:
                 with zipfile.ZipFile(f, mode='w', compression=zipfile.ZIP_DEFLATED) as zfp:
                     for df in data_files:
@@ -511,17 +649,18 @@ def report(logger, kind, report_data, mq, report_id, main_work_dir, report_dir='
             report_data['attr_data'] = archive_name
             archives.append(data_zip)
 
-            # Create symlink to report file in current working directory.
-            cwd_data_zip = os.path.join(report_dir, '{} {} data attributes.zip'.format(prefix, cur_report_id))
-            if os.path.isfile(cwd_data_zip):
-                raise FileExistsError('Report file "{0}" already exists'.format(cwd_data_zip))
-            os.symlink(os.path.relpath(data_zip, report_dir), cwd_data_zip)
-            logger.debug('{0} report was dumped to file "{1}"'.format(kind.capitalize(), cwd_data_zip))
+            if not use_journal:
+                # Create symlink to report file in current working directory.
+                cwd_data_zip = os.path.join(report_dir, '{} {} data attributes.zip'.format(prefix, cur_report_id))
+                if os.path.isfile(cwd_data_zip):
+                    raise FileExistsError('Report file "{0}" already exists'.format(cwd_data_zip))
+                os.symlink(os.path.relpath(data_zip, report_dir), cwd_data_zip)
+                logger.debug('{0} report was dumped to file "{1}"'.format(kind.capitalize(), cwd_data_zip))
 
     logger.debug('{0} prepare file archive'.format(kind.capitalize()))
     process_queue = [report_data]
     while process_queue:
-        elem = process_queue.pop(0)
+        elem = process_queue.pop()
         if isinstance(elem, dict):
             process_queue.extend(elem.values())
         elif isinstance(elem, list) or isinstance(elem, tuple) or isinstance(elem, set):
@@ -529,25 +668,46 @@ def report(logger, kind, report_data, mq, report_id, main_work_dir, report_dir='
         elif isinstance(elem, ArchiveFiles):
             logger.debug('{0} going to pack report files to archive'.format(kind.capitalize()))
 
-            fp, archive = tempfile.mkstemp(prefix='{0}-'.format(cur_report_id), suffix='.zip',
-                                           dir=os.path.join(main_work_dir, 'reports'))
+            fp, archive = tempfile.mkstemp(prefix='{0}-'.format(cur_report_id), suffix='.zip', dir=reports_dir)
             elem.make_archive(archive)
             os.close(fp)
 
+            if use_journal:
+                elem.archive = _name_archive_by_content(elem.archive, cur_report_id)
+
             archives.append(elem.archive)
 
-            # Create symlink to report files archive in current working directory.
-            tmp_name = os.path.splitext('-'.join(os.path.relpath(elem.archive).split('-')[1:]))[0]
-            cwd_report_files_archive = os.path.join(report_dir, '{0} report files {1}.zip'.format(kind, tmp_name))
-            if os.path.isfile(cwd_report_files_archive):
-                raise FileExistsError('Report files archive "{0}" already exists'.format(cwd_report_files_archive))
-            os.symlink(os.path.relpath(os.path.join(main_work_dir, 'reports', elem.archive), report_dir),
-                       cwd_report_files_archive)
-            logger.debug('{0} report files were packed to archive "{1}"'.format(kind.capitalize(),
-                                                                                cwd_report_files_archive))
+            if not use_journal:
+                # Create symlink to report files archive in current working directory.
+                tmp_name = os.path.splitext('-'.join(os.path.relpath(elem.archive).split('-')[1:]))[0]
+                cwd_report_files_archive = os.path.join(report_dir,
+                                                        '{0} report files {1}.zip'.format(kind, tmp_name))
+                if os.path.isfile(cwd_report_files_archive):
+                    raise FileExistsError('Report files archive "{0}" already exists'
+                                          .format(cwd_report_files_archive))
+                os.symlink(os.path.relpath(os.path.join(main_work_dir, 'reports', elem.archive), report_dir),
+                           cwd_report_files_archive)
+                logger.debug('{0} report files were packed to archive "{1}"'.format(kind.capitalize(),
+                                                                                    cwd_report_files_archive))
+
+    if use_journal:
+        journal, offset, size, segment_records = _append_to_reports_journal(
+            journal_dir, json.dumps(report_data, cls=ExtendedJSONEncoder, ensure_ascii=False).encode('utf8'),
+            bool(mq))
+        logger.debug('{0} report was appended to journal "{1}"'.format(kind.capitalize(), journal))
+
+        if mq:
+            report_and_report_file_archives = {'journal': journal, 'offset': offset, 'size': size,
+                                               'report file archives': archives}
+            # The journal segment is finished, so it can be removed as soon as this number of its reports is uploaded.
+            if segment_records:
+                report_and_report_file_archives['segment records'] = segment_records
+            mq.put(report_and_report_file_archives)
+
+        return None
 
     # Create report file in reports directory.
-    report_file = os.path.join(main_work_dir, 'reports', '{0}.json'.format(cur_report_id))
+    report_file = os.path.join(reports_dir, '{0}.json'.format(cur_report_id))
     with open(report_file, 'w', encoding='utf8') as fp:
         json.dump(report_data, fp, cls=ExtendedJSONEncoder, ensure_ascii=False, sort_keys=True, indent=4)
 
@@ -713,7 +873,7 @@ def json_dump(obj, fp, pretty=True):
     if pretty:
         json.dump(obj, fp, ensure_ascii=True, sort_keys=True, indent=4)
     else:
-        json.dump(obj, fp, ensure_ascii=True)
+        json.dump(obj, fp, ensure_ascii=True, separators=(',', ':'))
 
 
 def save_program_fragment_description(program_fragment_desc, file_name):
@@ -736,3 +896,79 @@ def get_file_checksum(file_name):
             hash_sha256.update(chunk)
 
     return hash_sha256.hexdigest()
+
+
+class CILLineMap:
+    """
+    Map from lines of CIL file to lines of original source files that is built on the basis of "#line" directives.
+    Artificial references to "<built-in>" files are ignored, i.e. corresponding lines are treated as lines of the
+    previously referred source file.
+    """
+    LINE_DIRECTIVE = re.compile(r'#line\s+(\d+)\s*(.*)')
+
+    def __init__(self, file_name):
+        # File content is required to get sources of error trace edges.
+        self.content = None
+        # Sorted offsets of new line characters to resolve file content offsets to line numbers.
+        self.newline_offsets = []
+        # Line number -> (original source file name or None, original source file line number).
+        self.line_map = {}
+        # Original source file names in order of their first appearance.
+        self.files = []
+
+        lines = []
+        files = set()
+        offset = 0
+        line_num = 1
+        orig_file = None
+        orig_file_line_num = 0
+        with open(file_name) as fp:
+            for line in fp:
+                lines.append(line)
+                offset += len(line)
+                if line.endswith('\n'):
+                    self.newline_offsets.append(offset - 1)
+
+                m = self.LINE_DIRECTIVE.match(line) if line.startswith('#') else None
+                if m:
+                    orig_file_line_num = int(m.group(1))
+                    if m.group(2):
+                        new_orig_file = m.group(2)[1:-1]
+                        if os.path.basename(new_orig_file) != '<built-in>':
+                            orig_file = new_orig_file
+                            if orig_file not in files:
+                                files.add(orig_file)
+                                self.files.append(orig_file)
+                else:
+                    self.line_map[line_num] = (orig_file, orig_file_line_num)
+                    orig_file_line_num += 1
+                line_num += 1
+
+        self.content = ''.join(lines)
+
+    def get_line_num(self, offset):
+        """
+        Get number of line that contains a given offset within file content.
+        """
+        return bisect.bisect_left(self.newline_offsets, offset) + 1
+
+
+__cil_line_map_cache = dict()
+
+
+def get_cil_line_map(file_name):
+    """
+    Get CILLineMap object for a given file. The last built map is reused while the file is not changed, e.g. when both
+    a witness and code coverage are processed for the same verification task.
+
+    :param file_name: CIL file name.
+    :return: CILLineMap object.
+    """
+    stat = os.stat(file_name)
+    key = (os.path.realpath(file_name), stat.st_size, stat.st_mtime_ns)
+
+    if key not in __cil_line_map_cache:
+        __cil_line_map_cache.clear()
+        __cil_line_map_cache[key] = CILLineMap(file_name)
+
+    return __cil_line_map_cache[key]
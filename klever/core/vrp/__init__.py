@@ -31,6 +31,7 @@ from clade import Clade
 from klever.core.vrp.et import import_error_trace
 
 import klever.core.components
+import klever.core.profiling
 import klever.core.session
 import klever.core.utils
 from klever.core.coverage import LCOV
@@ -48,12 +49,15 @@ def __submit_common_attrs(context):
 
 
 class VRP(klever.core.components.Component):
+    # Number of tasks processed by a worker process before it is replaced with a new one
+    WORKER_MAX_TASKS = 100
 
     def __init__(self, conf, logger, parent_id, callbacks, mqs, vals, id=None, work_dir=None, attrs=None,
                  separate_from_parent=False, include_child_resources=False):
         # Requirement specification descriptions were already extracted when getting VTG callbacks.
         self.__downloaded = dict()
         self.__workers = None
+        self.__tasks_received = None
 
         # Read this in a callback
         self.verdict = None
@@ -106,6 +110,15 @@ class VRP(klever.core.components.Component):
         def submit_processing_task(status, t):
             task_data, tryattempt = pending[t]
             self.mqs['processing tasks'].put([status.lower(), task_data, tryattempt, source_paths])
+            processed.add(t)
+
+        # Request only changes of tasks statuses rather than statuses of all tasks of the job
+        poll_changes = self.conf.get('poll task status changes', True)
+        cursor = None
+        # Final statuses of tasks that have not been received from the queue yet
+        finished = dict()
+        # Cursors overlap, so the same changes can be returned several times, while they should be processed just once
+        processed = set()
 
         receiving = True
         session = klever.core.session.Session(self.logger, self.conf['Klever Bridge'], self.conf['identifier'])
@@ -128,7 +141,8 @@ class VRP(klever.core.components.Component):
                             self.logger.debug("Fetched {} tasks".format(number))
                     else:
                         try:
-                            data = self.mqs['pending tasks'].get(block=True, timeout=generation_timeout)
+                            with klever.core.profiling.span('Wait for pending tasks', 'wait'):
+                                data = self.mqs['pending tasks'].get(block=True, timeout=generation_timeout)
                             if not data:
                                 receiving = False
                                 self.logger.info("Expect no tasks to be generated")
@@ -139,10 +153,18 @@ class VRP(klever.core.components.Component):
 
                 # Plan for processing new tasks
                 if len(pending) > 0:
-                    tasks_statuses = session.get_tasks_statuses()
+                    if poll_changes:
+                        cursor, tasks_statuses = session.get_tasks_statuses_changes(cursor, ('FINISHED', 'ERROR'))
+                    else:
+                        tasks_statuses = session.get_tasks_statuses()
                     for item in tasks_statuses:
                         task = str(item['id'])
-                        if task in pending.keys():
+                        if task in processed:
+                            continue
+                        elif task not in pending and poll_changes:
+                            # Tasks can be finished before they are received from the queue, so remember their statuses
+                            finished[task] = item['status']
+                        elif task in pending:
                             if item['status'] == 'FINISHED':
                                 submit_processing_task('FINISHED', task)
                                 del pending[task]
@@ -153,6 +175,9 @@ class VRP(klever.core.components.Component):
                                 pass
                             else:
                                 raise NotImplementedError('Unknown task status {!r}'.format(item['status']))
+                    for task in set(finished).intersection(pending):
+                        submit_processing_task('FINISHED' if finished.pop(task) == 'FINISHED' else 'error', task)
+                        del pending[task]
 
                 if not receiving and len(pending) == 0:
                     # Wait for all rest tasks, no tasks can come currently
@@ -168,46 +193,73 @@ class VRP(klever.core.components.Component):
         self.logger.debug("Shutting down result processing gracefully")
 
     def __loop_worker(self):
+        # Tasks are processed by a child process that is replaced after a failure or after a number of tasks, so memory
+        # leaks or a state corrupted by some tasks do not affect processing of the rest ones.
+        self.__tasks_received = multiprocessing.Event()
+        generation = 0
+        while not self.__tasks_received.is_set():
+            p = self.function_to_subcomponent(
+                False, 'KleverSubcomponentRPW{}-{}'.format(os.getpid(), generation), self.__process_tasks)
+            p.start()
+            p.join()
+            generation += 1
+
+    def __process_tasks(self):
         self.logger.info("VRP fetcher is ready to work")
 
         # First get QOS resource limitations
         qos_resource_limits = klever.core.utils.read_max_resource_limitations(self.logger, self.conf)
-        self.vals['task solution triples'] = multiprocessing.Manager().dict()
-
-        while True:
-            element = self.mqs['processing tasks'].get()
-            if element is None:
-                break
-
-            status, data, attempt, source_paths = element
-            pf = data[2]['id']
-            requirement = data[3]
-            attrs = None
-            if attempt:
-                new_id = "{}/{}/{}/RP".format(pf, requirement, attempt)
-                workdir = os.path.join(pf, requirement, str(attempt))
-                attrs = [{
-                    "name": "Rescheduling attempt",
-                    "value": str(attempt),
-                    "compare": False,
-                    "associate": False
-                }]
-            else:
-                new_id = "{}/{}/RP".format(pf, requirement)
-                workdir = os.path.join(pf, requirement)
-            self.vals['task solution triples']['{}:{}'.format(pf, requirement)] = [None, None, None]
-            try:
-                rp = RP(self.conf, self.logger, self.id, self.callbacks, self.mqs, self.vals, new_id,
-                        workdir, attrs, separate_from_parent=True, qos_resource_limits=qos_resource_limits,
-                        source_paths=source_paths, element=[status, data])
-                rp.start()
-                rp.join()
-            except klever.core.components.ComponentError:
-                self.logger.debug("RP that processed {!r}, {!r} failed".format(pf, requirement))
-            finally:
-                solution = list(self.vals['task solution triples'].get('{}:{}'.format(pf, requirement)))
-                del self.vals['task solution triples']['{}:{}'.format(pf, requirement)]
-                self.mqs['processed tasks'].put((pf, requirement, solution))
+        # RPs are run within this process one by one, so there is no need to share their results via a manager
+        self.vals['task solution triples'] = dict()
+
+        # Keep objects that are expensive to create for all tasks processed by the worker
+        clade = Clade(self.conf['build base'])
+        if not clade.work_dir_ok():
+            raise RuntimeError('Build base is not OK')
+        search_dirs = klever.core.utils.get_search_dirs(self.conf['main working directory'], abs_paths=True)
+        session = klever.core.session.Session(self.logger, self.conf['Klever Bridge'], self.conf['identifier'])
+
+        try:
+            for _ in range(self.WORKER_MAX_TASKS):
+                with klever.core.profiling.span('Wait for processing tasks', 'wait'):
+                    element = self.mqs['processing tasks'].get()
+                if element is None:
+                    self.__tasks_received.set()
+                    break
+
+                status, data, attempt, source_paths = element
+                pf = data[2]['id']
+                requirement = data[3]
+                attrs = None
+                if attempt:
+                    new_id = "{}/{}/{}/RP".format(pf, requirement, attempt)
+                    workdir = os.path.join(pf, requirement, str(attempt))
+                    attrs = [{
+                        "name": "Rescheduling attempt",
+                        "value": str(attempt),
+                        "compare": False,
+                        "associate": False
+                    }]
+                else:
+                    new_id = "{}/{}/RP".format(pf, requirement)
+                    workdir = os.path.join(pf, requirement)
+                self.vals['task solution triples']['{}:{}'.format(pf, requirement)] = [None, None, None]
+                try:
+                    rp = RP(self.conf, self.logger, self.id, self.callbacks, self.mqs, self.vals, new_id,
+                            workdir, attrs, separate_from_parent=True, qos_resource_limits=qos_resource_limits,
+                            source_paths=source_paths, element=[status, data], clade=clade, search_dirs=search_dirs,
+                            session=session)
+                    succeeded = rp.run_in_process()
+                finally:
+                    solution = list(self.vals['task solution triples'].pop('{}:{}'.format(pf, requirement)))
+                    self.mqs['processed tasks'].put((pf, requirement, solution))
+
+                if not succeeded:
+                    self.logger.debug("RP that processed {!r}, {!r} failed, so the worker is restarted".
+                                      format(pf, requirement))
+                    break
+        finally:
+            session.sign_out()
 
         self.logger.info("VRP fetcher finishes its work")
 
@@ -225,7 +277,7 @@ class RP(klever.core.components.Component):
 
     def __init__(self, conf, logger, parent_id, callbacks, mqs, vals, id=None, work_dir=None, attrs=None,
                  separate_from_parent=False, include_child_resources=False, qos_resource_limits=None, source_paths=None,
-                 element=None):
+                 element=None, clade=None, search_dirs=None, session=None):
         # Read this in a callback
         self.element = element
         self.verdict = None
@@ -240,14 +292,26 @@ class RP(klever.core.components.Component):
                                  separate_from_parent, include_child_resources)
 
         self.clean_dir = True
-        self.session = klever.core.session.Session(self.logger, self.conf['Klever Bridge'], self.conf['identifier'])
+        # Session, Clade and search directories can be shared by RPs processing tasks one by one.
+        self.__own_session = session is None
+        if session:
+            self.session = session
+        else:
+            self.session = klever.core.session.Session(self.logger, self.conf['Klever Bridge'],
+                                                       self.conf['identifier'])
 
         # Obtain file prefixes that can be removed from file paths.
-        self.clade = Clade(self.conf['build base'])
-        if not self.clade.work_dir_ok():
-            raise RuntimeError('Build base is not OK')
+        if clade:
+            self.clade = clade
+        else:
+            self.clade = Clade(self.conf['build base'])
+            if not self.clade.work_dir_ok():
+                raise RuntimeError('Build base is not OK')
 
-        self.search_dirs = klever.core.utils.get_search_dirs(self.conf['main working directory'], abs_paths=True)
+        if search_dirs:
+            self.search_dirs = search_dirs
+        else:
+            self.search_dirs = klever.core.utils.get_search_dirs(self.conf['main working directory'], abs_paths=True)
 
     def fetcher(self):
         self.logger.info("VRP instance is ready to work")
@@ -307,12 +371,15 @@ class RP(klever.core.components.Component):
             else:
                 raise ValueError("Unknown task {!r} status {!r}".format(task_id, status))
         finally:
-            self.session.sign_out()
+            if self.__own_session:
+                self.session.sign_out()
 
     main = fetcher
 
     def process_witness(self, witness):
-        error_trace, attrs = import_error_trace(self.logger, witness, self.verification_task_files)
+        with klever.core.profiling.span('Import error trace', 'witness', witness=witness):
+            error_trace, attrs = import_error_trace(self.logger, witness, self.verification_task_files,
+                                                    self.conf.get('stream witnesses', False))
         trimmed_file_names = self.__trim_file_names(error_trace['files'])
         error_trace['files'] = [trimmed_file_names[file] for file in error_trace['files']]
 
@@ -19,9 +19,9 @@ from klever.core.vrp.et.parser import ErrorTraceParser
 from klever.core.vrp.et.envmodel import envmodel_simplifications
 
 
-def import_error_trace(logger, witness, verification_task_files):
+def import_error_trace(logger, witness, verification_task_files, stream=False):
     # Parse witness
-    po = ErrorTraceParser(logger, witness, verification_task_files)
+    po = ErrorTraceParser(logger, witness, verification_task_files, stream)
     trace = po.error_trace
 
     # Parse comments from sources
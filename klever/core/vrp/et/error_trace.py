@@ -43,7 +43,7 @@ class ErrorTrace:
         self.emg_comments = dict()
         self.displays = dict()
         self.programfile_content = ''
-        self.programfile_line_map = dict()
+        self.programfile_line_map = None
 
     @property
     def functions(self):
@@ -269,6 +269,9 @@ class ErrorTrace:
         self._nodes[node_id] = {'in': list(), 'out': list()}
         return self._nodes[node_id]
 
+    def has_node(self, node_id):
+        return node_id in self._nodes
+
     def add_edge(self, source, target):
         source_node = self._nodes[source]
         target_node = self._nodes[target]
@@ -19,15 +19,31 @@ import os
 import re
 import xml.etree.ElementTree as ET
 
+import klever.core.utils
 from klever.core.vrp.et.error_trace import ErrorTrace
 
 
 class ErrorTraceParser:
     WITNESS_NS = {'graphml': 'http://graphml.graphdrawing.org/xmlns'}
+    GRAPH_TAG = '{{{0}}}graph'.format(WITNESS_NS['graphml'])
+    DATA_TAG = '{{{0}}}data'.format(WITNESS_NS['graphml'])
+    NODE_TAG = '{{{0}}}node'.format(WITNESS_NS['graphml'])
+    EDGE_TAG = '{{{0}}}edge'.format(WITNESS_NS['graphml'])
 
-    def __init__(self, logger, witness, verification_task_files):
+    def __init__(self, logger, witness, verification_task_files, stream=False):
         self._logger = logger
         self.verification_task_files = verification_task_files
+        self._stream = stream
+        self._programfile_read = False
+        self._file_ids = dict()
+        self._sink_nodes_map = dict()
+        self._nodes_number = 0
+        self._unsupported_node_data_keys = dict()
+        self._edges_num = 0
+        self._sink_edges_num = 0
+        self._edges_to_remove = list()
+        self._referred_file_ids = set()
+        self._unsupported_edge_data_keys = dict()
 
         # Start parsing
         self.error_trace = ErrorTrace(logger)
@@ -53,6 +69,10 @@ class ErrorTraceParser:
     def _parse_witness(self, witness):
         self._logger.info('Parse witness {!r}'.format(witness))
 
+        if self._stream:
+            self.__stream_witness(witness)
+            return
+
         with open(witness, encoding='utf8') as fp:
             tree = ET.parse(fp)
 
@@ -60,183 +80,215 @@ class ErrorTraceParser:
 
         graph = root.find('graphml:graph', self.WITNESS_NS)
 
-        self.__parse_witness_data(graph)
-        sink_nodes_map = self.__parse_witness_nodes(graph)
-        self.__parse_witness_edges(graph, sink_nodes_map)
-
-    def __parse_witness_data(self, graph):
         for data in graph.findall('graphml:data', self.WITNESS_NS):
-            if 'klever-attrs' in data.attrib and data.attrib['klever-attrs'] == 'true':
-                self.error_trace.add_attr(data.attrib['key'], data.text,
-                                          True if data.attrib['associate'] == 'true' else False,
-                                          True if data.attrib['compare'] == 'true' else False)
-
-            # TODO: at the moment violation witnesses do not support multiple program files.
-            if data.attrib['key'] == 'programfile':
-                with open(self.verification_task_files[os.path.normpath(data.text)]) as fp:
-                    line_num = 1
-                    orig_file_id = None
-                    orig_file_line_num = 0
-                    for line in fp:
-                        self.error_trace.programfile_content += line
-                        m = re.match(r'#line\s+(\d+)\s*(.*)', line)
-                        if m:
-                            orig_file_line_num = int(m.group(1))
-                            if m.group(2):
-                                file_name = m.group(2)[1:-1]
-                                # Do not treat artificial file references. Let's hope that they will disappear one day.
-                                if not os.path.basename(file_name) == '<built-in>':
-                                    orig_file_id = self.error_trace.add_file(file_name)
-                        else:
-                            self.error_trace.programfile_line_map[line_num] = (orig_file_id, orig_file_line_num)
-                            orig_file_line_num += 1
-                        line_num += 1
-
-    def __parse_witness_nodes(self, graph):
-        sink_nodes_map = dict()
-        unsupported_node_data_keys = dict()
-        nodes_number = 0
-
+            self.__parse_witness_data(data)
         for node in graph.findall('graphml:node', self.WITNESS_NS):
-            is_sink = False
-
-            for data in node.findall('graphml:data', self.WITNESS_NS):
-                data_key = data.attrib['key']
-                if data_key == 'entry':
-                    self.error_trace.add_entry_node_id(node.attrib['id'])
-                    self._logger.debug('Parse entry node {!r}'.format(node.attrib['id']))
-                elif data_key == 'sink':
-                    is_sink = True
-                    self._logger.debug('Parse sink node {!r}'.format(node.attrib['id']))
-                elif data_key == 'violation':
-                    if len(list(self.error_trace.violation_nodes)) > 0:
-                        raise NotImplementedError('Several violation nodes are not supported')
-                    self.error_trace.add_violation_node_id(node.attrib['id'])
-                    self._logger.debug('Parse violation node {!r}'.format(node.attrib['id']))
-                elif data_key not in unsupported_node_data_keys:
-                    self._logger.warning('Node data key {!r} is not supported'.format(data_key))
-                    unsupported_node_data_keys[data_key] = None
-
-            # Do not track sink nodes as all other nodes. All edges leading to sink nodes will be excluded as well.
-            if is_sink:
-                sink_nodes_map[node.attrib['id']] = None
-            else:
-                nodes_number += 1
-                self.error_trace.add_node(node.attrib['id'])
+            self.__parse_witness_node(node)
+        self.__check_witness_nodes()
+        for edge in graph.findall('graphml:edge', self.WITNESS_NS):
+            self.__parse_witness_edge(edge)
+        self.__finalize_witness_edges()
+
+    def __stream_witness(self, witness):
+        # Process graph children one by one as soon as they are parsed and drop them afterwards, so the whole witness
+        # tree never resides in memory. Edges refer to the program file and to nodes, thus, if some edge precedes them,
+        # it and all subsequent edges are postponed till the end of the graph to keep their order.
+        graph = None
+        depth = 0
+        postponed_edges = list()
+
+        for event, elem in ET.iterparse(witness, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if depth == 2 and elem.tag == self.GRAPH_TAG:
+                    graph = elem
+                continue
+
+            depth -= 1
+            if depth != 2 or graph is None:
+                continue
 
+            if elem.tag == self.DATA_TAG:
+                self.__parse_witness_data(elem)
+            elif elem.tag == self.NODE_TAG:
+                self.__parse_witness_node(elem)
+            elif elem.tag == self.EDGE_TAG:
+                if postponed_edges or not self.__is_witness_edge_ready(elem):
+                    postponed_edges.append(elem)
+                    continue
+                self.__parse_witness_edge(elem)
+
+            graph.remove(elem)
+
+        if graph is None:
+            raise KeyError('Graph was not found')
+
+        self.__check_witness_nodes()
+        if postponed_edges:
+            self._logger.debug('Parse {} postponed edges'.format(len(postponed_edges)))
+        for edge in postponed_edges:
+            self.__parse_witness_edge(edge)
+        self.__finalize_witness_edges()
+
+    def __is_witness_edge_ready(self, edge):
+        if not self._programfile_read:
+            return False
+
+        for attr in ('source', 'target'):
+            node_id = edge.attrib.get(attr)
+            if node_id is not None and node_id not in self._sink_nodes_map and \
+                    not self.error_trace.has_node(node_id):
+                return False
+
+        return True
+
+    def __parse_witness_data(self, data):
+        if 'klever-attrs' in data.attrib and data.attrib['klever-attrs'] == 'true':
+            self.error_trace.add_attr(data.attrib['key'], data.text,
+                                      True if data.attrib['associate'] == 'true' else False,
+                                      True if data.attrib['compare'] == 'true' else False)
+
+        # TODO: at the moment violation witnesses do not support multiple program files.
+        if data.attrib['key'] == 'programfile':
+            cil_line_map = klever.core.utils.get_cil_line_map(
+                self.verification_task_files[os.path.normpath(data.text)])
+            for file_name in cil_line_map.files:
+                self._file_ids[file_name] = self.error_trace.add_file(file_name)
+            self.error_trace.programfile_content = cil_line_map.content
+            self.error_trace.programfile_line_map = cil_line_map
+            self._programfile_read = True
+
+    def __parse_witness_node(self, node):
+        is_sink = False
+
+        for data in node.findall('graphml:data', self.WITNESS_NS):
+            data_key = data.attrib['key']
+            if data_key == 'entry':
+                self.error_trace.add_entry_node_id(node.attrib['id'])
+                self._logger.debug('Parse entry node {!r}'.format(node.attrib['id']))
+            elif data_key == 'sink':
+                is_sink = True
+                self._logger.debug('Parse sink node {!r}'.format(node.attrib['id']))
+            elif data_key == 'violation':
+                if len(list(self.error_trace.violation_nodes)) > 0:
+                    raise NotImplementedError('Several violation nodes are not supported')
+                self.error_trace.add_violation_node_id(node.attrib['id'])
+                self._logger.debug('Parse violation node {!r}'.format(node.attrib['id']))
+            elif data_key not in self._unsupported_node_data_keys:
+                self._logger.warning('Node data key {!r} is not supported'.format(data_key))
+                self._unsupported_node_data_keys[data_key] = None
+
+        # Do not track sink nodes as all other nodes. All edges leading to sink nodes will be excluded as well.
+        if is_sink:
+            self._sink_nodes_map[node.attrib['id']] = None
+        else:
+            self._nodes_number += 1
+            self.error_trace.add_node(node.attrib['id'])
+
+    def __check_witness_nodes(self):
         # Sanity checks.
         if not self.error_trace.entry_node:
             raise KeyError('Entry node was not found')
         if len(list(self.error_trace.violation_nodes)) == 0:
             raise KeyError('Violation nodes were not found')
 
-        self._logger.debug('Parse {0} nodes and {1} sink nodes'.format(nodes_number, len(sink_nodes_map)))
-        return sink_nodes_map
+        self._logger.debug('Parse {0} nodes and {1} sink nodes'
+                           .format(self._nodes_number, len(self._sink_nodes_map)))
 
-    def __parse_witness_edges(self, graph, sink_nodes_map):
-        unsupported_edge_data_keys = dict()
-
-        # Use maps for source files and functions as for nodes. Add artificial map to 0 for default file without
-        # explicitly specifying its path.
-        # The number of edges leading to sink nodes. Such edges will be completely removed.
-        sink_edges_num = 0
-        edges_num = 0
-
-        edges_to_remove = []
-        referred_file_ids = set()
-        for edge in graph.findall('graphml:edge', self.WITNESS_NS):
-            # Sanity checks.
-            if 'source' not in edge.attrib:
-                raise KeyError('Source node was not found')
-            if 'target' not in edge.attrib:
-                raise KeyError('Destination node was not found')
-
-            source_node_id = edge.attrib['source']
+    def __parse_witness_edge(self, edge):
+        # Sanity checks.
+        if 'source' not in edge.attrib:
+            raise KeyError('Source node was not found')
+        if 'target' not in edge.attrib:
+            raise KeyError('Destination node was not found')
 
-            if edge.attrib['target'] in sink_nodes_map:
-                sink_edges_num += 1
-                continue
+        source_node_id = edge.attrib['source']
 
-            target_node_id = edge.attrib['target']
-
-            # Update lists of input and output edges for source and target nodes.
-            _edge = self.error_trace.add_edge(source_node_id, target_node_id)
-
-            startoffset = None
-            endoffset = None
-            control = None
-            for data in edge.findall('graphml:data', self.WITNESS_NS):
-                data_key = data.attrib['key']
-                if data_key == 'startoffset':
-                    startoffset = int(data.text)
-                elif data_key == 'endoffset':
-                    endoffset = int(data.text)
-                elif data_key == 'enterFunction' or data_key == 'returnFrom' or data_key == 'assumption.scope':
-                    self.error_trace.add_function(data.text)
-                    if data_key == 'enterFunction':
-                        _edge['enter'] = self.error_trace.resolve_function_id(data.text)
-                        # Frama-C (CIL) can add artificial suffixes "_\d+" for functions with the same name during
-                        # merge to avoid conflicts during subsequent name resolution. Remember references to original
-                        # function names that can be useful later, e.g. when adding displays for instrumenting
-                        # functions.
-                        m = re.search(r'(.+)(_\d+)$', data.text)
-                        if m:
-                            unmerged_func_name = m.group(1)
-                            self.error_trace.add_function(unmerged_func_name)
-                            _edge['unmerged enter'] = self.error_trace.resolve_function_id(unmerged_func_name)
-                    elif data_key == 'returnFrom':
-                        _edge['return'] = self.error_trace.resolve_function_id(data.text)
-                    else:
-                        _edge['assumption scope'] = self.error_trace.resolve_function_id(data.text)
-                elif data_key == 'control':
-                    control = True if data.text == 'condition-true' else False
-                    _edge['condition'] = True
-                elif data_key == 'assumption':
-                    _edge['assumption'] = data.text
-                elif data_key == 'threadId':
-                    # TODO: SV-COMP states that thread identifiers should unique, they may be non-numbers as we want.
-                    _edge['thread'] = int(data.text)
-                elif data_key in ('note', 'warning'):
-                    _edge[data_key if data_key == 'note' else 'warn'] = data.text
-                elif data_key not in unsupported_edge_data_keys:
-                    self._logger.warning('Edge data key {!r} is not supported'.format(data_key))
-                    unsupported_edge_data_keys[data_key] = None
-
-            if startoffset and endoffset:
-                _edge['source'] = self.error_trace.programfile_content[startoffset:(endoffset + 1)]
-
-                # Calculate the number of lines up to start offset. It is key within line map hash.
-                lines_num = len(re.findall(r'\n', self.error_trace.programfile_content[:startoffset])) + 1
-                _edge['file'], _edge['line'] = self.error_trace.programfile_line_map[lines_num]
-                referred_file_ids.add(_edge['file'])
-
-                if control is not None:
-                    # Replace conditions to negative ones to consider else branches.
-                    if not control:
-                        cond_replaces = {'==': '!=', '!=': '==', '<=': '>', '>=': '<', '<': '>=', '>': '<='}
-                        for orig_cond, replace_cond in cond_replaces.items():
-                            m = re.match(r'^(.+){0}(.+)$'.format(orig_cond), _edge['source'])
-                            if m:
-                                _edge['source'] = '{0}{1}{2}'.format(m.group(1), replace_cond, m.group(2))
-                                # Do not proceed after some replacement is applied - others won't be done.
-                                break
-
-                    control = None
+        # The number of edges leading to sink nodes. Such edges will be completely removed.
+        if edge.attrib['target'] in self._sink_nodes_map:
+            self._sink_edges_num += 1
+            return
+
+        target_node_id = edge.attrib['target']
+
+        # Update lists of input and output edges for source and target nodes.
+        _edge = self.error_trace.add_edge(source_node_id, target_node_id)
+
+        startoffset = None
+        endoffset = None
+        control = None
+        for data in edge.findall('graphml:data', self.WITNESS_NS):
+            data_key = data.attrib['key']
+            if data_key == 'startoffset':
+                startoffset = int(data.text)
+            elif data_key == 'endoffset':
+                endoffset = int(data.text)
+            elif data_key == 'enterFunction' or data_key == 'returnFrom' or data_key == 'assumption.scope':
+                self.error_trace.add_function(data.text)
+                if data_key == 'enterFunction':
+                    _edge['enter'] = self.error_trace.resolve_function_id(data.text)
+                    # Frama-C (CIL) can add artificial suffixes "_\d+" for functions with the same name during
+                    # merge to avoid conflicts during subsequent name resolution. Remember references to original
+                    # function names that can be useful later, e.g. when adding displays for instrumenting
+                    # functions.
+                    m = re.search(r'(.+)(_\d+)$', data.text)
+                    if m:
+                        unmerged_func_name = m.group(1)
+                        self.error_trace.add_function(unmerged_func_name)
+                        _edge['unmerged enter'] = self.error_trace.resolve_function_id(unmerged_func_name)
+                elif data_key == 'returnFrom':
+                    _edge['return'] = self.error_trace.resolve_function_id(data.text)
                 else:
-                    # End all statements with ";" like in C.
-                    if _edge['source'][-1] != ';':
-                        _edge['source'] += ';'
-            # TODO: workaround! Here VRP should fail since violation witnesses format is not valid.
+                    _edge['assumption scope'] = self.error_trace.resolve_function_id(data.text)
+            elif data_key == 'control':
+                control = True if data.text == 'condition-true' else False
+                _edge['condition'] = True
+            elif data_key == 'assumption':
+                _edge['assumption'] = data.text
+            elif data_key == 'threadId':
+                # TODO: SV-COMP states that thread identifiers should unique, they may be non-numbers as we want.
+                _edge['thread'] = int(data.text)
+            elif data_key in ('note', 'warning'):
+                _edge[data_key if data_key == 'note' else 'warn'] = data.text
+            elif data_key not in self._unsupported_edge_data_keys:
+                self._logger.warning('Edge data key {!r} is not supported'.format(data_key))
+                self._unsupported_edge_data_keys[data_key] = None
+
+        if startoffset and endoffset:
+            _edge['source'] = self.error_trace.programfile_content[startoffset:(endoffset + 1)]
+
+            # Calculate the number of lines up to start offset. It is key within line map hash.
+            lines_num = self.error_trace.programfile_line_map.get_line_num(startoffset)
+            file_name, _edge['line'] = self.error_trace.programfile_line_map.line_map[lines_num]
+            _edge['file'] = self._file_ids.get(file_name)
+            self._referred_file_ids.add(_edge['file'])
+
+            if control is not None:
+                # Replace conditions to negative ones to consider else branches.
+                if not control:
+                    cond_replaces = {'==': '!=', '!=': '==', '<=': '>', '>=': '<', '<': '>=', '>': '<='}
+                    for orig_cond, replace_cond in cond_replaces.items():
+                        m = re.match(r'^(.+){0}(.+)$'.format(orig_cond), _edge['source'])
+                        if m:
+                            _edge['source'] = '{0}{1}{2}'.format(m.group(1), replace_cond, m.group(2))
+                            # Do not proceed after some replacement is applied - others won't be done.
+                            break
             else:
-                self._logger.warning('Edge from {0} to {1} does not have start or/and end offsets'
-                                     .format(source_node_id, target_node_id))
-                edges_to_remove.append(_edge)
-
-            edges_num += 1
-
-        for edge_to_remove in edges_to_remove:
+                # End all statements with ";" like in C.
+                if _edge['source'][-1] != ';':
+                    _edge['source'] += ';'
+        # TODO: workaround! Here VRP should fail since violation witnesses format is not valid.
+        else:
+            self._logger.warning('Edge from {0} to {1} does not have start or/and end offsets'
+                                 .format(source_node_id, target_node_id))
+            self._edges_to_remove.append(_edge)
+
+        self._edges_num += 1
+
+    def __finalize_witness_edges(self):
+        for edge_to_remove in self._edges_to_remove:
             self.error_trace.remove_edge_and_target_node(edge_to_remove)
 
-        self.error_trace.remove_unreffered_files(referred_file_ids)
+        self.error_trace.remove_unreffered_files(self._referred_file_ids)
 
-        self._logger.debug('Parse {0} edges and {1} sink edges'.format(edges_num, sink_edges_num))
+        self._logger.debug('Parse {0} edges and {1} sink edges'.format(self._edges_num, self._sink_edges_num))
@@ -22,15 +22,30 @@ import os
 import re
 import copy
 import hashlib
+import shutil
 import time
 
+from clade import Clade
+
+import klever.core.cache
 import klever.core.components
+import klever.core.serialization
 import klever.core.utils
 import klever.core.session
 
 from klever.core.vtg.scheduling import Balancer
 
 
+def get_plugin(name):
+    """
+    Get a plugin class by its name. Modules of plugins are imported just once per process.
+
+    :param name: Plugin name.
+    :return: Plugin class.
+    """
+    return getattr(importlib.import_module('.{0}'.format(name.lower()), 'klever.core.vtg'), name)
+
+
 @klever.core.components.before_callback
 def __launch_sub_job_components(context):
     context.mqs['VTG common attrs'] = multiprocessing.Queue()
@@ -528,9 +543,13 @@ class VTGWL(klever.core.components.Component):
                  separate_from_parent=False, include_child_resources=False):
         super(VTGWL, self).__init__(conf, logger, parent_id, callbacks, mqs, vals, id, work_dir, attrs,
                                     separate_from_parent, include_child_resources)
+        self.specifications_checksum = None
 
     def task_generating_loop(self):
         self.logger.info("Start VTGL worker")
+        if self.conf.get('persistent cache directory'):
+            # Results of plugins stored in persistent cache depend on specifications, so check them just once.
+            self.specifications_checksum = klever.core.cache.get_directory_checksum(self.conf['specifications dir'])
         number = klever.core.utils.get_parallel_threads_num(self.logger, self.conf, 'Tasks generation')
         klever.core.components.launch_queue_workers(self.logger, self.mqs['prepare program fragments'],
                                              self.vtgw_constructor, number, True)
@@ -554,11 +573,16 @@ class VTGWL(klever.core.components.Component):
             identifier = "{}/{}/VTGW".format(program_fragment_id, req_spec_id)
             workdir = os.path.join(program_fragment_id, req_spec_id)
 
+        if self.conf.get('run plugins in process', False):
+            # Import plugins just once, so all workers forked from this long-lived process will have them imported.
+            for plugin_desc in element[1]['plugins']:
+                get_plugin(plugin_desc['name'])
+
         return VTGW(self.conf, self.logger, self.parent_id, self.callbacks, self.mqs,
                     self.vals, identifier, workdir,
                     attrs=attrs, separate_from_parent=True, program_fragment_desc=element[0], req_spec_desc=element[1],
                     req_spec_class=element[2], req_spec_classes=element[3], resource_limits=element[4],
-                    rerun=element[5])
+                    rerun=element[5], specifications_checksum=self.specifications_checksum)
 
     main = task_generating_loop
 
@@ -567,7 +591,8 @@ class VTGW(klever.core.components.Component):
 
     def __init__(self, conf, logger, parent_id, callbacks, mqs, vals, id=None, work_dir=None, attrs=None,
                  separate_from_parent=False, include_child_resources=False, program_fragment_desc=None,
-                 req_spec_desc=None, req_spec_class=None, req_spec_classes=None, resource_limits=None, rerun=False):
+                 req_spec_desc=None, req_spec_class=None, req_spec_classes=None, resource_limits=None, rerun=False,
+                 specifications_checksum=None):
         super(VTGW, self).__init__(conf, logger, parent_id, callbacks, mqs, vals, id, work_dir, attrs,
                                    separate_from_parent, include_child_resources)
         self.program_fragment_desc = program_fragment_desc
@@ -579,6 +604,7 @@ class VTGW(klever.core.components.Component):
         self.abstract_task_desc_file = None
         self.override_limits = resource_limits
         self.rerun = rerun
+        self.specifications_checksum = specifications_checksum
         self.session = klever.core.session.Session(self.logger, self.conf['Klever Bridge'], self.conf['identifier'])
 
     def tasks_generator_worker(self):
@@ -636,10 +662,11 @@ class VTGW(klever.core.components.Component):
         self.logger.debug(
             'Put initial abstract verification task description to file "{0}"'.format(
                 initial_abstract_task_desc_file))
-        with open(initial_abstract_task_desc_file, 'w', encoding='utf8') as fp:
-            klever.core.utils.json_dump(initial_abstract_task_desc, fp, self.conf['keep intermediate files'])
+        klever.core.serialization.dump(initial_abstract_task_desc, initial_abstract_task_desc_file, self.conf)
 
         # Invoke all plugins one by one.
+        in_process = self.conf.get('run plugins in process', False)
+        abstract_task_desc = initial_abstract_task_desc
         cur_abstract_task_desc_file = initial_abstract_task_desc_file
         out_abstract_task_desc_file = None
         if self.rerun:
@@ -658,6 +685,7 @@ class VTGW(klever.core.components.Component):
                 cur_abstract_task_desc_file = os.path.join(os.pardir, out_abstract_task_desc_file)
                 os.symlink(os.path.relpath(cur_abstract_task_desc_file, os.path.curdir),
                            out_abstract_task_desc_file)
+                abstract_task_desc = None
 
             if self.req_spec_id not in [c[0]['identifier'] for c in self.req_spec_classes.values()] and \
                     plugin_desc['name'] in ['SA', 'EMG']:
@@ -672,41 +700,36 @@ class VTGW(klever.core.components.Component):
                 os.symlink(os.path.relpath(pilot_abstract_task_desc_file, os.path.curdir),
                            out_abstract_task_desc_file)
                 os.symlink(os.path.relpath(pilot_plugin_work_dir, os.path.curdir), plugin_work_dir)
+                abstract_task_desc = None
             else:
-                self.logger.info('Launch plugin {0}'.format(plugin_desc['name']))
-
-                # Get plugin configuration on the basis of common configuration, plugin options specific for requirement
-                # specification and information on requirement itself. In addition put either initial or
-                # current description of abstract verification task into plugin configuration.
-                plugin_conf = copy.deepcopy(self.conf)
-                if 'options' in plugin_desc:
-                    plugin_conf.update(plugin_desc['options'])
-                plugin_conf['in abstract task desc file'] = os.path.relpath(cur_abstract_task_desc_file,
-                                                                            self.conf[
-                                                                                'main working directory'])
-                plugin_conf['out abstract task desc file'] = os.path.relpath(out_abstract_task_desc_file,
-                                                                             self.conf[
-                                                                                 'main working directory'])
-                plugin_conf['solution class'] = self.req_spec_id
-                plugin_conf['override resource limits'] = self.override_limits
-
-                plugin_conf_file = '{0} conf.json'.format(plugin_desc['name'].lower())
-                self.logger.debug(
-                    'Put configuration of plugin "{0}" to file "{1}"'.format(plugin_desc['name'],
-                                                                             plugin_conf_file))
-                with open(plugin_conf_file, 'w', encoding='utf8') as fp:
-                    klever.core.utils.json_dump(plugin_conf, fp, self.conf['keep intermediate files'])
-
-                try:
-                    plugin = getattr(importlib.import_module(
-                        '.{0}'.format(plugin_desc['name'].lower()), 'klever.core.vtg'),
-                        plugin_desc['name'])
-                    p = plugin(plugin_conf, self.logger, self.id, self.callbacks, self.mqs, self.vals,
-                               plugin_desc['name'], plugin_work_dir, separate_from_parent=True,
-                               include_child_resources=True)
-                    p.start()
-                    p.join()
-                except klever.core.components.ComponentError:
+                results_cache = None
+                if plugin_desc['name'] in ('SA', 'EMG'):
+                    # These plugins do not depend on requirements specifications, so their results can be reused by
+                    # other jobs.
+                    results_cache = klever.core.cache.get_persistent_cache(self.logger, self.conf, plugin_desc['name'])
+
+                if results_cache:
+                    key = self.__get_plugin_results_key(results_cache, plugin_desc, cur_abstract_task_desc_file,
+                                                        abstract_task_desc)
+                    with results_cache.lock(key):
+                        if self.__restore_plugin_results(results_cache, key, plugin_work_dir,
+                                                         out_abstract_task_desc_file):
+                            self.logger.info('Get results of plugin {0} from cache'.format(plugin_desc['name']))
+                            success = True
+                            abstract_task_desc = None
+                        else:
+                            success, abstract_task_desc = self.__launch_plugin(
+                                plugin_desc, plugin_work_dir, cur_abstract_task_desc_file, out_abstract_task_desc_file,
+                                abstract_task_desc, in_process)
+                            if success:
+                                self.__store_plugin_results(results_cache, key, plugin_work_dir,
+                                                            out_abstract_task_desc_file)
+                else:
+                    success, abstract_task_desc = self.__launch_plugin(
+                        plugin_desc, plugin_work_dir, cur_abstract_task_desc_file, out_abstract_task_desc_file,
+                        abstract_task_desc, in_process)
+
+                if not success:
                     self.plugin_fail_processing()
                     break
 
@@ -735,8 +758,10 @@ class VTGW(klever.core.components.Component):
                os.path.isfile(os.path.join(plugin_work_dir, 'task files.zip')):
                 task_id = self.session.schedule_task(os.path.join(plugin_work_dir, 'task.json'),
                                                      os.path.join(plugin_work_dir, 'task files.zip'))
-                with open(self.abstract_task_desc_file, 'r', encoding='utf8') as fp:
-                    final_task_data = json.load(fp)
+                if in_process and abstract_task_desc is not None:
+                    final_task_data = abstract_task_desc
+                else:
+                    final_task_data = klever.core.serialization.load(self.abstract_task_desc_file)
 
                 # Plan for checking status
                 self.mqs['pending tasks'].put([
@@ -752,6 +777,125 @@ class VTGW(klever.core.components.Component):
                                     format(os.path.join(plugin_work_dir, 'task.json')))
                 self.mqs['processed tasks'].put((self.program_fragment_id, self.req_spec_id, [None, None, None]))
 
+    def __launch_plugin(self, plugin_desc, plugin_work_dir, cur_abstract_task_desc_file, out_abstract_task_desc_file,
+                        abstract_task_desc, in_process):
+        """
+        Run the plugin either in a separate process or within this one.
+
+        :return: True if the plugin succeeded and the abstract verification task description if it is kept in memory.
+        """
+        self.logger.info('Launch plugin {0}'.format(plugin_desc['name']))
+
+        # Get plugin configuration on the basis of common configuration, plugin options specific for requirement
+        # specification and information on requirement itself. In addition put either initial or
+        # current description of abstract verification task into plugin configuration.
+        if in_process:
+            # Nested values of the common configuration are shared by plugins run in process, so plugins should not
+            # modify them. Plugin options are copied completely since plugins do modify them, e.g. EMG sets defaults
+            # of translation options.
+            plugin_conf = copy.copy(self.conf)
+        else:
+            plugin_conf = copy.deepcopy(self.conf)
+        if 'options' in plugin_desc:
+            plugin_conf.update(copy.deepcopy(plugin_desc['options']))
+        plugin_conf['in abstract task desc file'] = os.path.relpath(cur_abstract_task_desc_file,
+                                                                    self.conf[
+                                                                        'main working directory'])
+        plugin_conf['out abstract task desc file'] = os.path.relpath(out_abstract_task_desc_file,
+                                                                     self.conf[
+                                                                         'main working directory'])
+        plugin_conf['solution class'] = self.req_spec_id
+        plugin_conf['override resource limits'] = self.override_limits
+
+        # Plugin configuration is needed just for debugging when plugins are run in process.
+        if not in_process or self.conf['keep intermediate files']:
+            plugin_conf_file = '{0} conf.json'.format(plugin_desc['name'].lower())
+            self.logger.debug(
+                'Put configuration of plugin "{0}" to file "{1}"'.format(plugin_desc['name'],
+                                                                         plugin_conf_file))
+            with open(plugin_conf_file, 'w', encoding='utf8') as fp:
+                klever.core.utils.json_dump(plugin_conf, fp, self.conf['keep intermediate files'])
+
+        plugin = get_plugin(plugin_desc['name'])
+        p = plugin(plugin_conf, self.logger, self.id, self.callbacks, self.mqs, self.vals,
+                   plugin_desc['name'], plugin_work_dir, separate_from_parent=True,
+                   include_child_resources=True)
+        if in_process:
+            # Pass the abstract verification task description from plugin to plugin without reading it again
+            # unless it was obtained from a pilot or an original run.
+            abstract_task_desc = p.run_in_process(abstract_task_desc)
+            return abstract_task_desc is not None, abstract_task_desc
+
+        try:
+            p.start()
+            p.join()
+        except klever.core.components.ComponentError:
+            return False, None
+
+        return True, None
+
+    def __get_plugin_results_key(self, results_cache, plugin_desc, cur_abstract_task_desc_file, abstract_task_desc):
+        if abstract_task_desc is None:
+            abstract_task_desc = klever.core.serialization.load(cur_abstract_task_desc_file)
+
+        clade = Clade(self.conf['build base'])
+        fragment_files_checksums = []
+        for file in sorted(file for grp in self.program_fragment_desc['grps'] for file in grp['files']):
+            storage_file = clade.get_storage_path(file)
+            fragment_files_checksums.append(
+                [file, klever.core.utils.get_file_checksum(storage_file) if os.path.isfile(storage_file) else None])
+
+        return results_cache.get_key(klever.core.cache.get_klever_version(), clade.get_uuid(),
+                                     fragment_files_checksums, self.specifications_checksum,
+                                     plugin_desc.get('options'),
+                                     self.__make_paths_independent(json.dumps(abstract_task_desc, sort_keys=True)))
+
+    def __restore_plugin_results(self, results_cache, key, plugin_work_dir, out_abstract_task_desc_file):
+        # Files are copied rather than linked since next plugins and RPs can modify them, and this would corrupt the
+        # cache entry.
+        if not results_cache.get(key, {'files': plugin_work_dir, 'abstract task.json': out_abstract_task_desc_file}):
+            return False
+
+        # Paths depend on the current task.
+        content = self.__make_paths_independent(
+            json.dumps(klever.core.serialization.load(out_abstract_task_desc_file)), restore=True)
+        klever.core.serialization.dump(json.loads(content), out_abstract_task_desc_file, self.conf)
+
+        return True
+
+    def __store_plugin_results(self, results_cache, key, plugin_work_dir, out_abstract_task_desc_file):
+        content = self.__make_paths_independent(
+            json.dumps(klever.core.serialization.load(out_abstract_task_desc_file)))
+        with open('results abstract task.json', 'w', encoding='utf8') as fp:
+            fp.write(content)
+
+        # Do not store files that relate to plugin reports.
+        results_cache.put(key, {'files': plugin_work_dir, 'abstract task.json': 'results abstract task.json'},
+                          ignore=shutil.ignore_patterns('log.txt', 'problem desc.txt', 'child resources',
+                                                        '* report.json', '* report files *.zip'))
+        os.remove('results abstract task.json')
+
+    def __make_paths_independent(self, content, restore=False):
+        """
+        Replace paths to working directories of the job and the task with placeholders and vice versa. Task identifiers
+        correspond to relative paths to their working directories, so they are replaced as well.
+        """
+        replacements = [
+            (os.path.join(os.path.realpath(self.conf['main working directory']), ''), '$MAIN_WORK_DIR/'),
+            (os.path.relpath(os.path.realpath(os.path.curdir), os.path.realpath(self.conf['main working directory'])),
+             '$TASK_WORK_DIR'),
+            ('{0}/{1}'.format(self.program_fragment_id, self.req_spec_id), '$TASK_ID')
+        ]
+
+        if restore:
+            for path, placeholder in reversed(replacements):
+                content = content.replace(placeholder, json.dumps(path)[1:-1])
+        else:
+            for path, placeholder in replacements:
+                content = content.replace(json.dumps(path)[1:-1], placeholder)
+
+        return content
+
     def plugin_fail_processing(self):
         """The function has a callback in sub-job processing!"""
         self.logger.debug("VTGW that processed {!r}, {!r} failed".
@@ -16,6 +16,9 @@
 #
 
 
+import os
+
+from klever.core.profiling import span
 from klever.core.utils import report
 from klever.core.vtg.plugins import Plugin
 from klever.core.vtg.emg.common import get_or_die
@@ -23,6 +26,7 @@ from klever.core.vtg.emg.generators import generate_processes
 from klever.core.vtg.emg.common.process import ProcessCollection
 from klever.core.vtg.emg.translation import translate_intermediate_model
 from klever.core.vtg.emg.common.c.source import create_source_representation
+from klever.core.vtg.emg.common.c.types.typeParser import load_declarations_cache, save_declarations_cache
 
 
 class EMG(Plugin):
@@ -43,14 +47,20 @@ class EMG(Plugin):
         """
         self.logger.info("Start environment model generator {}".format(self.id))
 
+        # Reuse declarations parsed by other EMG processes of the job.
+        declarations_cache = os.path.join(get_or_die(self.conf, "cache directory"), 'parsed declarations.pickle')
+        load_declarations_cache(declarations_cache)
+
         # Initialization of EMG
         self.logger.info("Import results of source analysis")
-        sa = create_source_representation(self.logger, self.conf, self.abstract_task_desc)
+        with span('Import results of source analysis', 'EMG'):
+            sa = create_source_representation(self.logger, self.conf, self.abstract_task_desc)
 
         # Generate processes
         self.logger.info("Generate processes of an environment model")
         collection = ProcessCollection()
-        reports = generate_processes(self.logger, self.conf, collection, self.abstract_task_desc, sa)
+        with span('Generate processes', 'EMG'):
+            reports = generate_processes(self.logger, self.conf, collection, self.abstract_task_desc, sa)
 
         # Send data to the server
         self.logger.info("Send data about generated instances to the server")
@@ -60,7 +70,10 @@ class EMG(Plugin):
         self.logger.info("An intermediate environment model has been prepared")
 
         # Import additional aspect files
-        translate_intermediate_model(self.logger, self.conf, self.abstract_task_desc, sa, collection)
+        with span('Translate intermediate model', 'EMG'):
+            translate_intermediate_model(self.logger, self.conf, self.abstract_task_desc, sa, collection)
         self.logger.info("An environment model has been generated successfully")
 
+        save_declarations_cache(declarations_cache)
+
     main = generate_environment
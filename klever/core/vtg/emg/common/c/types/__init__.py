@@ -16,6 +16,7 @@
 #
 
 import re
+import sys
 import copy
 import sortedcontainers
 
@@ -230,20 +231,28 @@ class Declaration:
         self.typedef = None
         self._str = None
         self._str_no_specifiers = None
+        self._key = None
+        self._hash = None
 
     def __str__(self):
         if not self._str:
-            self._str = self.to_string(declarator='')
+            self._str = sys.intern(self.to_string(declarator=''))
         return self._str
 
     def __hash__(self):
-        return hash(self.to_string(declarator='', qualifiers=True))
+        if self._hash is None:
+            self._hash = hash(self.key)
+        return self._hash
 
     def __eq__(self, other):
-        if isinstance(other, Declaration):
+        # Types are interned by import_declaration(), so the same types are usually the same objects
+        if self is other:
+            return True
+        elif isinstance(other, Declaration):
             # Apply all transformations
             if type(self) is type(other):
-                if str(self) == str(other) or self.str_without_specifiers == other.str_without_specifiers:
+                if self.key is other.key or str(self) is str(other) or \
+                        self.str_without_specifiers is other.str_without_specifiers:
                     return True
                 elif self.str_without_specifiers == 'void *' or other.str_without_specifiers == 'void *':
                     return True
@@ -262,10 +271,22 @@ class Declaration:
     def __lt__(self, other):
         return str(self) < str(other)
 
+    @property
+    def key(self):
+        """
+        Canonical string of the type that is used for hashing. Types are not changed after creation (typedef names are
+        not printed here), so the key is computed once. It is interned, so keys can be compared by identity.
+
+        :return: String.
+        """
+        if self._key is None:
+            self._key = sys.intern(self.to_string(declarator='', qualifiers=True))
+        return self._key
+
     @property
     def str_without_specifiers(self):
         if not self._str_no_specifiers:
-            self._str_no_specifiers = self.to_string('', specifiers=False)
+            self._str_no_specifiers = sys.intern(self.to_string('', specifiers=False))
         return self._str_no_specifiers
 
     @property
@@ -15,7 +15,10 @@
 # limitations under the License.
 #
 
-from klever.core.vtg.emg.common.c.types import import_declaration
+import ply.yacc as yacc
+
+from klever.core.vtg.emg.common.c.types import Declaration, import_declaration, import_typedefs, typeParser, \
+    typeParserTab
 
 
 def parser_test(method):
@@ -254,3 +257,69 @@ def test_mess_declarations():
     return [
         'void (*((*a)(int, ...)) []) (void) []'
     ]
+
+
+def test_parser_tables():
+    # Shipped tables should be regenerated by typeParser.generate_tables() each time the grammar is changed.
+    grammar = yacc.ParserReflect(vars(typeParser))
+    grammar.get_all()
+    assert grammar.signature() == typeParserTab._lr_signature
+
+
+def test_parse_declaration_copies():
+    ast = typeParser.parse_declaration('int *x')
+    ast['declarator'].pop()
+    assert typeParser.parse_declaration('int *x')['declarator']
+
+
+def test_interned_types():
+    # Typedefs of a Linux kernel which are widely used in callbacks of drivers
+    typedefs = {
+        'common': [
+            'unsigned int __u32',
+            '__u32 u32',
+            'unsigned long long u64',
+            'long long loff_t',
+            'unsigned int gfp_t',
+            'long int ssize_t',
+            'long unsigned int size_t',
+            'int irqreturn_t',
+            'irqreturn_t (*irq_handler_t)(int, void *)',
+            'struct { int counter; } atomic_t'
+        ]
+    }
+    declarations = [
+        'ssize_t (*read)(struct file *, char *, size_t, loff_t *)',
+        'ssize_t (*write)(struct file *, const char *, size_t, loff_t *)',
+        'irq_handler_t handler',
+        'int (*probe)(struct platform_device *)',
+        'void * (*alloc)(size_t, gfp_t)',
+        'atomic_t refcount'
+    ]
+    import_typedefs(typedefs, dict())
+
+    objects = [import_declaration(d) for d in declarations]
+    for declaration, obj in zip(declarations, objects):
+        # The same types are the same objects
+        assert import_declaration(declaration) is obj
+        assert import_declaration(obj.to_string('name')) == obj
+
+    # Hashing should not print types again
+    printed = []
+    to_string = Declaration.to_string
+
+    def counting_to_string(self, *args, **kwargs):
+        printed.append(self)
+        return to_string(self, *args, **kwargs)
+
+    Declaration.to_string = counting_to_string
+    try:
+        collection = set()
+        for _ in range(1000):
+            for obj in objects:
+                collection.add(obj)
+                assert obj in collection
+    finally:
+        Declaration.to_string = to_string
+    assert not printed
+    assert len(collection) == len(objects)
@@ -15,13 +15,26 @@
 # limitations under the License.
 #
 
+import os
 import re
+import pickle
+import collections
 import sortedcontainers
 import ply.lex as lex
 import ply.yacc as yacc
 
+import klever.core.utils
+
+# Pregenerated parser tables shipped together with this module. PLY checks that their signature corresponds to the
+# grammar below and builds tables in memory otherwise. Use generate_tables() to update them after changing the grammar.
+TABLES_MODULE = 'typeParserTab'
+DECLARATIONS_CACHE_SIZE = 100000
+
 __parser = None
 __lexer = None
+# Declaration string -> pickled abstract syntax tree. ASTs are pickled since callers modify them.
+__declarations = collections.OrderedDict()
+__new_declarations = 0
 
 tokens = (
     'STRING',
@@ -788,7 +801,16 @@ def setup_parser():
     global __lexer
 
     __lexer = lex.lex()
-    __parser = yacc.yacc(debug=0, write_tables=0)
+    __parser = yacc.yacc(debug=0, write_tables=0, tabmodule=TABLES_MODULE)
+
+
+def generate_tables():
+    """
+    Generate parser tables to be shipped together with this module.
+
+    :return: None
+    """
+    yacc.yacc(debug=0, write_tables=1, tabmodule=TABLES_MODULE, outputdir=os.path.dirname(os.path.abspath(__file__)))
 
 
 def parse_declaration(string):
@@ -800,8 +822,71 @@ def parse_declaration(string):
     """
     global __parser
     global __lexer
+    global __new_declarations
+
+    if string in __declarations:
+        __declarations.move_to_end(string)
+        return pickle.loads(__declarations[string])
 
     if not __parser:
         setup_parser()
 
-    return __parser.parse(string, lexer=__lexer)
+    ast = __parser.parse(string, lexer=__lexer)
+
+    __declarations[string] = pickle.dumps(ast, pickle.HIGHEST_PROTOCOL)
+    __new_declarations += 1
+    if len(__declarations) > DECLARATIONS_CACHE_SIZE:
+        __declarations.popitem(last=False)
+
+    return ast
+
+
+def load_declarations_cache(file_name):
+    """
+    Load parsed declarations stored by other processes.
+
+    :param file_name: Cache file name.
+    :return: None
+    """
+    if not os.path.isfile(file_name):
+        return
+
+    with klever.core.utils.LockedOpen(file_name, 'rb') as fp:
+        content = fp.read()
+
+    if content:
+        for string, ast in pickle.loads(content).items():
+            __declarations.setdefault(string, ast)
+
+
+def save_declarations_cache(file_name):
+    """
+    Merge parsed declarations into the cache file shared with other processes.
+
+    :param file_name: Cache file name.
+    :return: None
+    """
+    global __new_declarations
+
+    if not __new_declarations:
+        return
+
+    with klever.core.utils.LockedOpen(file_name, 'a+b') as fp:
+        fp.seek(0)
+        content = fp.read()
+        declarations = pickle.loads(content) if content else dict()
+
+        declarations.update(__declarations)
+        # Forget least recently added declarations.
+        for string in list(declarations)[:max(len(declarations) - DECLARATIONS_CACHE_SIZE, 0)]:
+            del declarations[string]
+
+        fp.seek(0)
+        fp.truncate()
+        pickle.dump(declarations, fp, pickle.HIGHEST_PROTOCOL)
+
+    __new_declarations = 0
+
+
+if __name__ == '__main__':
+    generate_tables()
@@ -0,0 +1,132 @@
+
+# typeParserTab.py
+# This file is automatically generated. Do not edit.
+# pylint: disable=W,C,R
+_tabversion = '3.10'
+
+_lr_method = 'LALR'
+
+_lr_signature = 'ATTRIBUTE BIT_SIZE_DELEMITER BLOCK_CLOSE BLOCK_OPEN COMMA DOTS END ENUM EQUAL_SIGN FUNCTION_SPECIFIER IDENTIFIER INTERFACE NUMBER PARENTH_CLOSE PARENTH_OPEN SQUARE_BCLOSE_SIGN SQUARE_BOPEN_SIGN STAR_SIGN STORAGE_CLASS_SPECIFIER STRING STRUCT TYPE_QUALIFIER TYPE_SPECIFIER UNION UNKNOWN\n    full_declaration : parameter_declaration BIT_SIZE_DELEMITER NUMBER END\n                     | parameter_declaration BIT_SIZE_DELEMITER NUMBER\n                     | parameter_declaration END\n                     | parameter_declaration\n    \n    declaration_specifiers_list : prefix_specifiers_list type_specifier suffix_specifiers_list\n                                | prefix_specifiers_list type_specifier\n                                | type_specifier suffix_specifiers_list\n                                | type_specifier\n    \n    prefix_specifiers_list : prefix_specifiers_option prefix_specifiers_list\n                           | prefix_specifiers_option\n    \n    prefix_specifiers_option : STORAGE_CLASS_SPECIFIER\n                             | TYPE_QUALIFIER\n                             | FUNCTION_SPECIFIER\n    \n    suffix_specifiers_list : suffix_specifiers_option suffix_specifiers_list\n                           | suffix_specifiers_option\n    \n    suffix_specifiers_option : TYPE_QUALIFIER\n    \n    type_specifier : type_specifier_list\n                   | struct_specifier\n                   | union_specifier\n                   | enum_specifier\n                   | typedef\n    \n    type_specifier_list : TYPE_SPECIFIER type_specifier_list\n                        | TYPE_SPECIFIER\n    \n    struct_specifier : complete_struct_specifier attribute_dict\n                     | short_struct_specifier attribute_dict\n                     | complete_struct_specifier\n                     | short_struct_specifier\n    \n    short_struct_specifier : STRUCT BLOCK_OPEN struct_declaration_list BLOCK_CLOSE\n                           | STRUCT BLOCK_OPEN BLOCK_CLOSE\n    \n    complete_struct_specifier : STRUCT IDENTIFIER BLOCK_OPEN struct_declaration_list BLOCK_CLOSE\n                              | STRUCT IDENTIFIER BLOCK_OPEN BLOCK_CLOSE\n                              | STRUCT IDENTIFIER\n    \n    attribute_dict : attribute attribute_dict\n                   | attribute \n    \n    attribute : ATTRIBUTE PARENTH_OPEN PARENTH_OPEN inside_attr_list PARENTH_CLOSE PARENTH_CLOSE\n              | ATTRIBUTE PARENTH_OPEN PARENTH_OPEN PARENTH_CLOSE PARENTH_CLOSE\n    \n    inside_attr_list : inside_attr COMMA inside_attr_list\n                     | inside_attr \n    \n    inside_attr : IDENTIFIER PARENTH_OPEN attr_param_list PARENTH_CLOSE \n                | IDENTIFIER PARENTH_OPEN PARENTH_CLOSE\n                | IDENTIFIER \n    \n    attr_param_list : attr_param COMMA attr_param_list\n                    | attr_param\n    \n    attr_param : STRING IDENTIFIER STRING\n               | IDENTIFIER\n               | NUMBER\n    \n    struct_declaration_list : struct_declaration struct_declaration_list\n                            | struct_declaration\n    \n    struct_declaration : parameter_declaration BIT_SIZE_DELEMITER NUMBER END\n                       | parameter_declaration BIT_SIZE_DELEMITER NUMBER\n                       | parameter_declaration END\n    \n    union_specifier : union_partial_complex_specifier attribute_dict\n                    | union_partial_complex_specifier \n                    | union_partial_simple_specifier\n    \n    union_partial_simple_specifier : UNION IDENTIFIER\n    \n    union_partial_complex_specifier : UNION BLOCK_OPEN struct_declaration_list BLOCK_CLOSE\n                                    | UNION BLOCK_OPEN BLOCK_CLOSE\n    \n    enum_specifier : ENUM IDENTIFIER\n                   | ENUM BLOCK_OPEN enumerator_list BLOCK_CLOSE\n    \n    enumerator_list : enumerator COMMA enumerator_list\n                    | enumerator\n    \n    enumerator : IDENTIFIER\n               | IDENTIFIER EQUAL_SIGN NUMBER\n    \n    typedef : IDENTIFIER\n    \n    declarator : pointer direct_declarator\n               | direct_declarator\n    \n    pointer : STAR_SIGN suffix_specifiers_list pointer\n            | STAR_SIGN suffix_specifiers_list\n            | STAR_SIGN pointer\n            | STAR_SIGN\n    \n    direct_declarator : direct_declarator array_list\n                      | direct_declarator PARENTH_OPEN PARENTH_CLOSE\n                      | direct_declarator PARENTH_OPEN function_parameters_list PARENTH_CLOSE\n                      | PARENTH_OPEN declarator PARENTH_CLOSE\n                      | IDENTIFIER\n    \n    array_list : array_expression array_list\n               | array_expression\n    \n    array_expression : SQUARE_BOPEN_SIGN array_size SQUARE_BCLOSE_SIGN\n                     | SQUARE_BOPEN_SIGN SQUARE_BCLOSE_SIGN\n    \n    array_size : suffix_specifiers_list STAR_SIGN\n               | suffix_specifiers_list NUMBER\n               | STAR_SIGN\n               | NUMBER\n    \n    function_parameters_list : parameter_declaration COMMA function_parameters_list\n                             | parameter_declaration\n    \n    parameter_declaration : declaration_specifiers_list declarator\n                          | declaration_specifiers_list abstract_declarator\n                          | UNKNOWN declarator\n                          | INTERFACE declarator\n                          | UNKNOWN abstract_declarator\n                          | INTERFACE abstract_declarator\n                          | declaration_specifiers_list\n                          | UNKNOWN\n                          | INTERFACE\n                          | DOTS\n    \n    abstract_declarator : pointer direct_abstract_declarator\n                        | direct_abstract_declarator\n                        | pointer\n    \n    direct_abstract_declarator : direct_abstract_declarator array_list\n                               | direct_abstract_declarator PARENTH_OPEN PARENTH_CLOSE\n                               | direct_abstract_declarator PARENTH_OPEN function_parameters_list PARENTH_CLOSE\n                               | PARENTH_OPEN abstract_declarator PARENTH_CLOSE\n    '
+    
+_lr_action_items = {'UNKNOWN':([0,55,56,62,66,78,81,109,112,124,130,],[4,4,4,4,4,4,4,-51,4,-50,-49,]),'INTERFACE':([0,55,56,62,66,78,81,109,112,124,130,],[5,5,5,5,5,5,5,-51,5,-50,-49,]),'DOTS':([0,55,56,62,66,78,81,109,112,124,130,],[6,6,6,6,6,6,6,-51,6,-50,-49,]),'STORAGE_CLASS_SPECIFIER':([0,9,15,16,17,55,56,62,66,78,81,109,112,124,130,],[15,15,-11,-12,-13,15,15,15,15,15,15,-51,15,-50,-49,]),'TYPE_QUALIFIER':([0,8,9,10,11,12,13,14,15,16,17,18,19,20,21,22,24,34,41,43,44,46,47,48,50,51,52,54,55,56,57,62,64,66,73,78,80,81,84,101,105,106,109,110,112,123,124,127,130,131,],[16,44,16,-17,-18,-19,-20,-21,-11,-12,-13,-23,-26,-27,-53,-54,-64,44,44,44,-16,-22,-24,-34,-25,-52,-58,-32,16,16,-55,16,44,16,-33,16,-29,16,-57,-59,-31,-28,-51,-56,16,-30,-50,-36,-49,-35,]),'FUNCTION_SPECIFIER':([0,9,15,16,17,55,56,62,66,78,81,109,112,124,130,],[17,17,-11,-12,-13,17,17,17,17,17,17,-51,17,-50,-49,]),'TYPE_SPECIFIER':([0,7,9,15,16,17,18,45,55,56,62,66,78,81,109,112,124,130,],[18,18,-10,-11,-12,-13,18,-9,18,18,18,18,18,18,-51,18,-50,-49,]),'ENUM':([0,7,9,15,16,17,45,55,56,62,66,78,81,109,112,124,130,],[23,23,-10,-11,-12,-13,-9,23,23,23,23,23,23,-51,23,-50,-49,]),'IDENTIFIER':([0,3,4,5,7,8,9,10,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,31,34,35,41,42,43,44,45,46,47,48,50,51,52,53,54,55,56,57,62,66,67,68,71,72,73,78,80,81,84,97,100,101,102,105,106,109,110,112,123,124,127,128,129,130,131,137,140,],[24,36,36,36,24,-8,-10,-17,-18,-19,-20,-21,-11,-12,-13,-23,-26,-27,-53,-54,52,-64,54,57,36,-70,36,-6,-7,-15,-16,-9,-22,-24,-34,-25,-52,-58,77,-32,24,24,-55,24,24,-68,-69,-5,-14,-33,24,-29,24,-57,-67,120,-59,77,-31,-28,-51,-56,24,-30,-50,-36,120,133,-49,-35,141,133,]),'STRUCT':([0,7,9,15,16,17,45,55,56,62,66,78,81,109,112,124,130,],[25,25,-10,-11,-12,-13,-9,25,25,25,25,25,25,-51,25,-50,-49,]),'UNION':([0,7,9,15,16,17,45,55,56,62,66,78,81,109,112,124,130,],[26,26,-10,-11,-12,-13,-9,26,26,26,26,26,26,-51,26,-50,-49,]),'$end':([1,2,3,4,5,6,8,10,11,12,13,14,18,19,20,21,22,24,28,29,30,31,32,33,34,36,37,38,39,40,41,42,43,44,46,47,48,50,51,52,54,57,58,59,60,61,63,65,67,68,71,72,73,80,84,85,86,89,91,95,97,98,99,101,105,106,110,111,113,116,123,127,131,],[0,-4,-92,-93,-94,-95,-8,-17,-18,-19,-20,-21,-23,-26,-27,-53,-54,-64,-3,-86,-87,-98,-66,-97,-70,-75,-88,-90,-89,-91,-6,-7,-15,-16,-22,-24,-34,-25,-52,-58,-32,-55,-2,-65,-96,-71,-77,-99,-68,-69,-5,-14,-33,-29,-57,-1,-72,-76,-79,-100,-67,-74,-102,-59,-31,-28,-56,-73,-78,-101,-30,-36,-35,]),'BIT_SIZE_DELEMITER':([2,3,4,5,6,8,10,11,12,13,14,18,19,20,21,22,24,29,30,31,32,33,34,36,37,38,39,40,41,42,43,44,46,47,48,50,51,52,54,57,59,60,61,63,65,67,68,71,72,73,80,82,84,86,89,91,95,97,98,99,101,105,106,110,111,113,116,123,127,131,],[27,-92,-93,-94,-95,-8,-17,-18,-19,-20,-21,-23,-26,-27,-53,-54,-64,-86,-87,-98,-66,-97,-70,-75,-88,-90,-89,-91,-6,-7,-15,-16,-22,-24,-34,-25,-52,-58,-32,-55,-65,-96,-71,-77,-99,-68,-69,-5,-14,-33,-29,108,-57,-72,-76,-79,-100,-67,-74,-102,-59,-31,-28,-56,-73,-78,-101,-30,-36,-35,]),'END':([2,3,4,5,6,8,10,11,12,13,14,18,19,20,21,22,24,29,30,31,32,33,34,36,37,38,39,40,41,42,43,44,46,47,48,50,51,52,54,57,58,59,60,61,63,65,67,68,71,72,73,80,82,84,86,89,91,95,97,98,99,101,105,106,110,111,113,116,123,124,127,131,],[28,-92,-93,-94,-95,-8,-17,-18,-19,-20,-21,-23,-26,-27,-53,-54,-64,-86,-87,-98,-66,-97,-70,-75,-88,-90,-89,-91,-6,-7,-15,-16,-22,-24,-34,-25,-52,-58,-32,-55,85,-65,-96,-71,-77,-99,-68,-69,-5,-14,-33,-29,109,-57,-72,-76,-79,-100,-67,-74,-102,-59,-31,-28,-56,-73,-78,-101,-30,130,-36,-35,]),'COMMA':([3,4,5,6,8,10,11,12,13,14,18,19,20,21,22,24,29,30,31,32,33,34,36,37,38,39,40,41,42,43,44,46,47,48,50,51,52,54,57,59,60,61,63,65,67,68,71,72,73,76,77,80,84,86,88,89,91,95,97,98,99,101,105,106,110,111,113,116,119,120,122,123,127,131,133,135,136,138,139,143,],[-92,-93,-94,-95,-8,-17,-18,-19,-20,-21,-23,-26,-27,-53,-54,-64,-86,-87,-98,-66,-97,-70,-75,-88,-90,-89,-91,-6,-7,-15,-16,-22,-24,-34,-25,-52,-58,-32,-55,-65,-96,-71,-77,-99,-68,-69,-5,-14,-33,102,-62,-29,-57,-72,112,-76,-79,-100,-67,-74,-102,-59,-31,-28,-56,-73,-78,-101,128,-41,-63,-30,-36,-35,-45,-40,140,-46,-39,-44,]),'PARENTH_CLOSE':([3,4,5,6,8,10,11,12,13,14,18,19,20,21,22,24,29,30,31,32,33,34,36,37,38,39,40,41,42,43,44,46,47,48,50,51,52,54,57,59,60,61,62,63,65,66,67,68,69,70,71,72,73,80,84,86,87,88,89,91,95,96,97,98,99,100,101,105,106,110,111,113,116,117,118,119,120,123,125,126,127,129,131,132,133,134,135,136,138,139,142,143,],[-92,-93,-94,-95,-8,-17,-18,-19,-20,-21,-23,-26,-27,-53,-54,-64,-86,-87,-98,-66,-97,-70,-75,-88,-90,-89,-91,-6,-7,-15,-16,-22,-24,-34,-25,-52,-58,-32,-55,-65,-96,-71,86,-77,-99,95,-68,-69,98,99,-5,-14,-33,-29,-57,-72,111,-85,-76,-79,-100,116,-67,-74,-102,118,-59,-31,-28,-56,-73,-78,-101,126,127,-38,-41,-30,-84,131,-36,135,-35,-37,-45,139,-40,-43,-46,-39,-42,-44,]),'STAR_SIGN':([3,4,5,8,10,11,12,13,14,18,19,20,21,22,24,34,35,41,42,43,44,46,47,48,50,51,52,54,57,64,67,71,72,73,80,84,92,101,105,106,110,123,127,131,],[34,34,34,-8,-17,-18,-19,-20,-21,-23,-26,-27,-53,-54,-64,34,34,-6,-7,-15,-16,-22,-24,-34,-25,-52,-58,-32,-55,93,34,-5,-14,-33,-29,-57,114,-59,-31,-28,-56,-30,-36,-35,]),'PARENTH_OPEN':([3,4,5,8,10,11,12,13,14,18,19,20,21,22,24,31,32,33,34,35,36,41,42,43,44,46,47,48,49,50,51,52,54,57,59,60,61,63,65,67,68,71,72,73,74,80,84,86,89,91,95,97,98,99,101,105,106,110,111,113,116,120,123,127,131,],[35,35,35,-8,-17,-18,-19,-20,-21,-23,-26,-27,-53,-54,-64,35,62,66,-70,35,-75,-6,-7,-15,-16,-22,-24,-34,74,-25,-52,-58,-32,-55,62,66,-71,-77,-99,-68,-69,-5,-14,-33,100,-29,-57,-72,-76,-79,-100,-67,-74,-102,-59,-31,-28,-56,-73,-78,-101,129,-30,-36,-35,]),'ATTRIBUTE':([19,20,21,48,54,80,84,105,106,110,123,127,131,],[49,49,49,49,-32,-29,-57,-31,-28,-56,-30,-36,-35,]),'BLOCK_OPEN':([23,25,26,54,],[53,55,56,78,]),'NUMBER':([27,43,44,64,72,92,103,108,129,140,],[58,-15,-16,94,-14,115,122,124,138,138,]),'SQUARE_BOPEN_SIGN':([32,33,36,59,60,61,63,65,86,89,91,95,98,99,111,113,116,],[64,64,-75,64,64,-71,64,-99,-72,-76,-79,-100,-74,-102,-73,-78,-101,]),'BLOCK_CLOSE':([55,56,75,76,77,78,79,81,83,104,107,109,121,122,124,130,],[80,84,101,-61,-62,105,106,-48,110,123,-47,-51,-60,-63,-50,-49,]),'SQUARE_BCLOSE_SIGN':([64,90,93,94,114,115,],[91,113,-82,-83,-80,-81,]),'EQUAL_SIGN':([77,],[103,]),'STRING':([129,140,141,],[137,137,143,]),}
+
+_lr_action = {}
+for _k, _v in _lr_action_items.items():
+   for _x,_y in zip(_v[0],_v[1]):
+      if not _x in _lr_action:  _lr_action[_x] = {}
+      _lr_action[_x][_k] = _y
+del _lr_action_items
+
+_lr_goto_items = {'full_declaration':([0,],[1,]),'parameter_declaration':([0,55,56,62,66,78,81,112,],[2,82,82,88,88,82,82,88,]),'declaration_specifiers_list':([0,55,56,62,66,78,81,112,],[3,3,3,3,3,3,3,3,]),'prefix_specifiers_list':([0,9,55,56,62,66,78,81,112,],[7,45,7,7,7,7,7,7,7,]),'type_specifier':([0,7,55,56,62,66,78,81,112,],[8,41,8,8,8,8,8,8,8,]),'prefix_specifiers_option':([0,9,55,56,62,66,78,81,112,],[9,9,9,9,9,9,9,9,9,]),'type_specifier_list':([0,7,18,55,56,62,66,78,81,112,],[10,10,46,10,10,10,10,10,10,10,]),'struct_specifier':([0,7,55,56,62,66,78,81,112,],[11,11,11,11,11,11,11,11,11,]),'union_specifier':([0,7,55,56,62,66,78,81,112,],[12,12,12,12,12,12,12,12,12,]),'enum_specifier':([0,7,55,56,62,66,78,81,112,],[13,13,13,13,13,13,13,13,13,]),'typedef':([0,7,55,56,62,66,78,81,112,],[14,14,14,14,14,14,14,14,14,]),'complete_struct_specifier':([0,7,55,56,62,66,78,81,112,],[19,19,19,19,19,19,19,19,19,]),'short_struct_specifier':([0,7,55,56,62,66,78,81,112,],[20,20,20,20,20,20,20,20,20,]),'union_partial_complex_specifier':([0,7,55,56,62,66,78,81,112,],[21,21,21,21,21,21,21,21,21,]),'union_partial_simple_specifier':([0,7,55,56,62,66,78,81,112,],[22,22,22,22,22,22,22,22,22,]),'declarator':([3,4,5,35,],[29,37,39,69,]),'abstract_declarator':([3,4,5,35,],[30,38,40,70,]),'pointer':([3,4,5,34,35,67,],[31,31,31,68,31,97,]),'direct_declarator':([3,4,5,31,35,],[32,32,32,59,32,]),'direct_abstract_declarator':([3,4,5,31,35,],[33,33,33,60,33,]),'suffix_specifiers_list':([8,34,41,43,64,],[42,67,71,72,92,]),'suffix_specifiers_option':([8,34,41,43,64,],[43,43,43,43,43,]),'attribute_dict':([19,20,21,48,],[47,50,51,73,]),'attribute':([19,20,21,48,],[48,48,48,48,]),'array_list':([32,33,59,60,63,],[61,65,61,65,89,]),'array_expression':([32,33,59,60,63,],[63,63,63,63,63,]),'enumerator_list':([53,102,],[75,121,]),'enumerator':([53,102,],[76,76,]),'struct_declaration_list':([55,56,78,81,],[79,83,104,107,]),'struct_declaration':([55,56,78,81,],[81,81,81,81,]),'function_parameters_list':([62,66,112,],[87,96,125,]),'array_size':([64,],[90,]),'inside_attr_list':([100,128,],[117,132,]),'inside_attr':([100,128,],[119,119,]),'attr_param_list':([129,140,],[134,142,]),'attr_param':([129,140,],[136,136,]),}
+
+_lr_goto = {}
+for _k, _v in _lr_goto_items.items():
+   for _x, _y in zip(_v[0], _v[1]):
+       if not _x in _lr_goto: _lr_goto[_x] = {}
+       _lr_goto[_x][_k] = _y
+del _lr_goto_items
+_lr_productions = [
+  ("S' -> full_declaration","S'",1,None,None,None),
+  ('full_declaration -> parameter_declaration BIT_SIZE_DELEMITER NUMBER END','full_declaration',4,'p_full_declaration','typeParser.py',166),
+  ('full_declaration -> parameter_declaration BIT_SIZE_DELEMITER NUMBER','full_declaration',3,'p_full_declaration','typeParser.py',167),
+  ('full_declaration -> parameter_declaration END','full_declaration',2,'p_full_declaration','typeParser.py',168),
+  ('full_declaration -> parameter_declaration','full_declaration',1,'p_full_declaration','typeParser.py',169),
+  ('declaration_specifiers_list -> prefix_specifiers_list type_specifier suffix_specifiers_list','declaration_specifiers_list',3,'p_declaration_specifiers_list','typeParser.py',187),
+  ('declaration_specifiers_list -> prefix_specifiers_list type_specifier','declaration_specifiers_list',2,'p_declaration_specifiers_list','typeParser.py',188),
+  ('declaration_specifiers_list -> type_specifier suffix_specifiers_list','declaration_specifiers_list',2,'p_declaration_specifiers_list','typeParser.py',189),
+  ('declaration_specifiers_list -> type_specifier','declaration_specifiers_list',1,'p_declaration_specifiers_list','typeParser.py',190),
+  ('prefix_specifiers_list -> prefix_specifiers_option prefix_specifiers_list','prefix_specifiers_list',2,'p_prefix_specifiers_list','typeParser.py',224),
+  ('prefix_specifiers_list -> prefix_specifiers_option','prefix_specifiers_list',1,'p_prefix_specifiers_list','typeParser.py',225),
+  ('prefix_specifiers_option -> STORAGE_CLASS_SPECIFIER','prefix_specifiers_option',1,'p_prefix_specifiers_option','typeParser.py',232),
+  ('prefix_specifiers_option -> TYPE_QUALIFIER','prefix_specifiers_option',1,'p_prefix_specifiers_option','typeParser.py',233),
+  ('prefix_specifiers_option -> FUNCTION_SPECIFIER','prefix_specifiers_option',1,'p_prefix_specifiers_option','typeParser.py',234),
+  ('suffix_specifiers_list -> suffix_specifiers_option suffix_specifiers_list','suffix_specifiers_list',2,'p_suffix_specifiers_list','typeParser.py',242),
+  ('suffix_specifiers_list -> suffix_specifiers_option','suffix_specifiers_list',1,'p_suffix_specifiers_list','typeParser.py',243),
+  ('suffix_specifiers_option -> TYPE_QUALIFIER','suffix_specifiers_option',1,'p_suffix_specifiers_option','typeParser.py',250),
+  ('type_specifier -> type_specifier_list','type_specifier',1,'p_type_specifier','typeParser.py',258),
+  ('type_specifier -> struct_specifier','type_specifier',1,'p_type_specifier','typeParser.py',259),
+  ('type_specifier -> union_specifier','type_specifier',1,'p_type_specifier','typeParser.py',260),
+  ('type_specifier -> enum_specifier','type_specifier',1,'p_type_specifier','typeParser.py',261),
+  ('type_specifier -> typedef','type_specifier',1,'p_type_specifier','typeParser.py',262),
+  ('type_specifier_list -> TYPE_SPECIFIER type_specifier_list','type_specifier_list',2,'p_type_specifier_list','typeParser.py',276),
+  ('type_specifier_list -> TYPE_SPECIFIER','type_specifier_list',1,'p_type_specifier_list','typeParser.py',277),
+  ('struct_specifier -> complete_struct_specifier attribute_dict','struct_specifier',2,'p_struct_specifier','typeParser.py',292),
+  ('struct_specifier -> short_struct_specifier attribute_dict','struct_specifier',2,'p_struct_specifier','typeParser.py',293),
+  ('struct_specifier -> complete_struct_specifier','struct_specifier',1,'p_struct_specifier','typeParser.py',294),
+  ('struct_specifier -> short_struct_specifier','struct_specifier',1,'p_struct_specifier','typeParser.py',295),
+  ('short_struct_specifier -> STRUCT BLOCK_OPEN struct_declaration_list BLOCK_CLOSE','short_struct_specifier',4,'p_short_struct_specifier','typeParser.py',306),
+  ('short_struct_specifier -> STRUCT BLOCK_OPEN BLOCK_CLOSE','short_struct_specifier',3,'p_short_struct_specifier','typeParser.py',307),
+  ('complete_struct_specifier -> STRUCT IDENTIFIER BLOCK_OPEN struct_declaration_list BLOCK_CLOSE','complete_struct_specifier',5,'p_complete_struct_specifier','typeParser.py',319),
+  ('complete_struct_specifier -> STRUCT IDENTIFIER BLOCK_OPEN BLOCK_CLOSE','complete_struct_specifier',4,'p_complete_struct_specifier','typeParser.py',320),
+  ('complete_struct_specifier -> STRUCT IDENTIFIER','complete_struct_specifier',2,'p_complete_struct_specifier','typeParser.py',321),
+  ('attribute_dict -> attribute attribute_dict','attribute_dict',2,'p_attribute_dict','typeParser.py',336),
+  ('attribute_dict -> attribute','attribute_dict',1,'p_attribute_dict','typeParser.py',337),
+  ('attribute -> ATTRIBUTE PARENTH_OPEN PARENTH_OPEN inside_attr_list PARENTH_CLOSE PARENTH_CLOSE','attribute',6,'p_attribute','typeParser.py',350),
+  ('attribute -> ATTRIBUTE PARENTH_OPEN PARENTH_OPEN PARENTH_CLOSE PARENTH_CLOSE','attribute',5,'p_attribute','typeParser.py',351),
+  ('inside_attr_list -> inside_attr COMMA inside_attr_list','inside_attr_list',3,'p_inside_attr_list','typeParser.py',365),
+  ('inside_attr_list -> inside_attr','inside_attr_list',1,'p_inside_attr_list','typeParser.py',366),
+  ('inside_attr -> IDENTIFIER PARENTH_OPEN attr_param_list PARENTH_CLOSE','inside_attr',4,'p_inside_attr','typeParser.py',379),
+  ('inside_attr -> IDENTIFIER PARENTH_OPEN PARENTH_CLOSE','inside_attr',3,'p_inside_attr','typeParser.py',380),
+  ('inside_attr -> IDENTIFIER','inside_attr',1,'p_inside_attr','typeParser.py',381),
+  ('attr_param_list -> attr_param COMMA attr_param_list','attr_param_list',3,'p_attr_param_list','typeParser.py',396),
+  ('attr_param_list -> attr_param','attr_param_list',1,'p_attr_param_list','typeParser.py',397),
+  ('attr_param -> STRING IDENTIFIER STRING','attr_param',3,'p_attr_param','typeParser.py',410),
+  ('attr_param -> IDENTIFIER','attr_param',1,'p_attr_param','typeParser.py',411),
+  ('attr_param -> NUMBER','attr_param',1,'p_attr_param','typeParser.py',412),
+  ('struct_declaration_list -> struct_declaration struct_declaration_list','struct_declaration_list',2,'p_struct_declaration_list','typeParser.py',424),
+  ('struct_declaration_list -> struct_declaration','struct_declaration_list',1,'p_struct_declaration_list','typeParser.py',425),
+  ('struct_declaration -> parameter_declaration BIT_SIZE_DELEMITER NUMBER END','struct_declaration',4,'p_struct_declaration','typeParser.py',432),
+  ('struct_declaration -> parameter_declaration BIT_SIZE_DELEMITER NUMBER','struct_declaration',3,'p_struct_declaration','typeParser.py',433),
+  ('struct_declaration -> parameter_declaration END','struct_declaration',2,'p_struct_declaration','typeParser.py',434),
+  ('union_specifier -> union_partial_complex_specifier attribute_dict','union_specifier',2,'p_union_specifier','typeParser.py',442),
+  ('union_specifier -> union_partial_complex_specifier','union_specifier',1,'p_union_specifier','typeParser.py',443),
+  ('union_specifier -> union_partial_simple_specifier','union_specifier',1,'p_union_specifier','typeParser.py',444),
+  ('union_partial_simple_specifier -> UNION IDENTIFIER','union_partial_simple_specifier',2,'p_union_partial_simple_specifier','typeParser.py',456),
+  ('union_partial_complex_specifier -> UNION BLOCK_OPEN struct_declaration_list BLOCK_CLOSE','union_partial_complex_specifier',4,'p_union_partial_complex_specifier','typeParser.py',463),
+  ('union_partial_complex_specifier -> UNION BLOCK_OPEN BLOCK_CLOSE','union_partial_complex_specifier',3,'p_union_partial_complex_specifier','typeParser.py',464),
+  ('enum_specifier -> ENUM IDENTIFIER','enum_specifier',2,'p_enum_specifier','typeParser.py',476),
+  ('enum_specifier -> ENUM BLOCK_OPEN enumerator_list BLOCK_CLOSE','enum_specifier',4,'p_enum_specifier','typeParser.py',477),
+  ('enumerator_list -> enumerator COMMA enumerator_list','enumerator_list',3,'p_enumerator_list','typeParser.py',493),
+  ('enumerator_list -> enumerator','enumerator_list',1,'p_enumerator_list','typeParser.py',494),
+  ('enumerator -> IDENTIFIER','enumerator',1,'p_enumerator','typeParser.py',501),
+  ('enumerator -> IDENTIFIER EQUAL_SIGN NUMBER','enumerator',3,'p_enumerator','typeParser.py',502),
+  ('typedef -> IDENTIFIER','typedef',1,'p_typedef','typeParser.py',510),
+  ('declarator -> pointer direct_declarator','declarator',2,'p_declarator','typeParser.py',521),
+  ('declarator -> direct_declarator','declarator',1,'p_declarator','typeParser.py',522),
+  ('pointer -> STAR_SIGN suffix_specifiers_list pointer','pointer',3,'p_pointer','typeParser.py',529),
+  ('pointer -> STAR_SIGN suffix_specifiers_list','pointer',2,'p_pointer','typeParser.py',530),
+  ('pointer -> STAR_SIGN pointer','pointer',2,'p_pointer','typeParser.py',531),
+  ('pointer -> STAR_SIGN','pointer',1,'p_pointer','typeParser.py',532),
+  ('direct_declarator -> direct_declarator array_list','direct_declarator',2,'p_direct_declarator','typeParser.py',550),
+  ('direct_declarator -> direct_declarator PARENTH_OPEN PARENTH_CLOSE','direct_declarator',3,'p_direct_declarator','typeParser.py',551),
+  ('direct_declarator -> direct_declarator PARENTH_OPEN function_parameters_list PARENTH_CLOSE','direct_declarator',4,'p_direct_declarator','typeParser.py',552),
+  ('direct_declarator -> PARENTH_OPEN declarator PARENTH_CLOSE','direct_declarator',3,'p_direct_declarator','typeParser.py',553),
+  ('direct_declarator -> IDENTIFIER','direct_declarator',1,'p_direct_declarator','typeParser.py',554),
+  ('array_list -> array_expression array_list','array_list',2,'p_array_list','typeParser.py',561),
+  ('array_list -> array_expression','array_list',1,'p_array_list','typeParser.py',562),
+  ('array_expression -> SQUARE_BOPEN_SIGN array_size SQUARE_BCLOSE_SIGN','array_expression',3,'p_array_expression','typeParser.py',569),
+  ('array_expression -> SQUARE_BOPEN_SIGN SQUARE_BCLOSE_SIGN','array_expression',2,'p_array_expression','typeParser.py',570),
+  ('array_size -> suffix_specifiers_list STAR_SIGN','array_size',2,'p_array_size','typeParser.py',583),
+  ('array_size -> suffix_specifiers_list NUMBER','array_size',2,'p_array_size','typeParser.py',584),
+  ('array_size -> STAR_SIGN','array_size',1,'p_array_size','typeParser.py',585),
+  ('array_size -> NUMBER','array_size',1,'p_array_size','typeParser.py',586),
+  ('function_parameters_list -> parameter_declaration COMMA function_parameters_list','function_parameters_list',3,'p_function_parameters_list','typeParser.py',600),
+  ('function_parameters_list -> parameter_declaration','function_parameters_list',1,'p_function_parameters_list','typeParser.py',601),
+  ('parameter_declaration -> declaration_specifiers_list declarator','parameter_declaration',2,'p_parameter_declaration','typeParser.py',608),
+  ('parameter_declaration -> declaration_specifiers_list abstract_declarator','parameter_declaration',2,'p_parameter_declaration','typeParser.py',609),
+  ('parameter_declaration -> UNKNOWN declarator','parameter_declaration',2,'p_parameter_declaration','typeParser.py',610),
+  ('parameter_declaration -> INTERFACE declarator','parameter_declaration',2,'p_parameter_declaration','typeParser.py',611),
+  ('parameter_declaration -> UNKNOWN abstract_declarator','parameter_declaration',2,'p_parameter_declaration','typeParser.py',612),
+  ('parameter_declaration -> INTERFACE abstract_declarator','parameter_declaration',2,'p_parameter_declaration','typeParser.py',613),
+  ('parameter_declaration -> declaration_specifiers_list','parameter_declaration',1,'p_parameter_declaration','typeParser.py',614),
+  ('parameter_declaration -> UNKNOWN','parameter_declaration',1,'p_parameter_declaration','typeParser.py',615),
+  ('parameter_declaration -> INTERFACE','parameter_declaration',1,'p_parameter_declaration','typeParser.py',616),
+  ('parameter_declaration -> DOTS','parameter_declaration',1,'p_parameter_declaration','typeParser.py',617),
+  ('abstract_declarator -> pointer direct_abstract_declarator','abstract_declarator',2,'p_abstract_declarator','typeParser.py',624),
+  ('abstract_declarator -> direct_abstract_declarator','abstract_declarator',1,'p_abstract_declarator','typeParser.py',625),
+  ('abstract_declarator -> pointer','abstract_declarator',1,'p_abstract_declarator','typeParser.py',626),
+  ('direct_abstract_declarator -> direct_abstract_declarator array_list','direct_abstract_declarator',2,'p_direct_abstract_declarator','typeParser.py',633),
+  ('direct_abstract_declarator -> direct_abstract_declarator PARENTH_OPEN PARENTH_CLOSE','direct_abstract_declarator',3,'p_direct_abstract_declarator','typeParser.py',634),
+  ('direct_abstract_declarator -> direct_abstract_declarator PARENTH_OPEN function_parameters_list PARENTH_CLOSE','direct_abstract_declarator',4,'p_direct_abstract_declarator','typeParser.py',635),
+  ('direct_abstract_declarator -> PARENTH_OPEN abstract_declarator PARENTH_CLOSE','direct_abstract_declarator',3,'p_direct_abstract_declarator','typeParser.py',636),
+]
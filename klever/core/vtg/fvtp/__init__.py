@@ -17,6 +17,7 @@
 
 import importlib
 
+import klever.core.utils
 import klever.core.vtg.plugins
 
 
@@ -50,7 +51,14 @@ class FVTP(klever.core.vtg.plugins.Plugin):
         s = strategy(self.logger, self.conf, self.abstract_task_desc)
 
         self.logger.info('Begin task generating')
-        s.generate_verification_task()
+        try:
+            s.generate_verification_task()
+        finally:
+            if s.cache_stats:
+                klever.core.utils.report(self.logger, 'patch',
+                                         {'identifier': self.id, 'data': {'CIL cache': s.cache_stats}},
+                                         self.mqs['report files'], self.vals['report id'],
+                                         self.conf['main working directory'])
 
         # Prepare final abstract verification task
         self.abstract_task_desc['verifier'] = self.conf['verifier']['name']
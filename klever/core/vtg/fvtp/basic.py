@@ -41,6 +41,13 @@ class Basic:
         self.logger = logger
         self.conf = conf
         self.abstract_task_desc = abstract_task_desc
+        # Numbers of CIL cache hits and misses.
+        self.cache_stats = dict()
+        # Requirement specification which is checked by the task.
+        self.requirement = None
+        # Verifier options that are passed to schedulers as features of the task. Options depending on resource
+        # limitations are omitted since limitations are chosen by schedulers themselves.
+        self.verifier_opts = []
 
     def generate_verification_task(self):
         """
@@ -77,7 +84,9 @@ class Basic:
                 benchmark.set('timelimit',
                               str(int(int(resource_limits["CPU time"]) * float(resource_limits["soft CPU time"]))))
 
-        opts, safe_prps = common.get_verifier_opts_and_safe_prps(self.logger, resource_limits, self.conf)
+        opts, safe_prps = common.get_verifier_opts_and_safe_prps(self.logger, None, self.conf)
+        self.verifier_opts = [opt for opt in opts if not common.depends_on_resource_limits(opt)]
+        opts = common.substitute_resource_limits(opts, resource_limits)
 
         # Then add options
         self._prepare_run_definition(benchmark, opts)
@@ -139,11 +148,40 @@ class Basic:
         # Save to task its class.
         task_desc['solution class'] = self.conf['solution class']
 
+        # Schedulers can predict resources required for solving the task on the basis of its features.
+        task_desc['features'] = self._prepare_task_features(self.requirement)
+
         # Keep reference to additional sources. It will be used for verification reports.
         task_desc['additional sources'] = self.abstract_task_desc['additional sources']
 
         return task_desc
 
+    def _prepare_task_features(self, requirement):
+        """
+        Collect features of the verification task that affect resources required for its solution.
+
+        :param requirement: Requirement specification identifier.
+        :return: Dictionary.
+        """
+        size = 0
+        functions = 0
+        for file in self.abstract_task_desc['verification task files'].values():
+            if not file.endswith(('.i', '.c')):
+                continue
+
+            size += os.path.getsize(file)
+            # Function definitions are printed by CIL with opening braces at separate lines.
+            with open(file, encoding='utf8', errors='ignore') as fp:
+                functions += sum(1 for line in fp if line.startswith('{'))
+
+        return {
+            'CIL file size': size,
+            'functions': functions,
+            'requirement': requirement,
+            'verifier options': ['{}={}'.format(name, value) if value is not None else name
+                                 for opt in self.verifier_opts for name, value in opt.items()]
+        }
+
     def _prepare_run_definition(self, benchmark_definition, options):
         """
         The function should add a new subelement with name 'rundefinition' to the XML description of the given
@@ -170,7 +208,7 @@ class Basic:
         """
         tasks = ElementTree.SubElement(benchmark_definition, "tasks")
         if "merge source files" in self.conf and self.conf["merge source files"]:
-            file = common.merge_files(self.logger, self.conf, self.abstract_task_desc)
+            file = common.merge_files(self.logger, self.conf, self.abstract_task_desc, self.cache_stats)
             with open('cil.yml', 'w') as fp:
                 fp.write("format_version: '1.0'\n\n")
                 fp.write("input_files: 'cil.i'\n\n")
@@ -19,22 +19,42 @@ import os
 import re
 import zipfile
 import json
+import klever.core.cache
 import klever.core.utils
 
 
-def merge_files(logger, conf, abstract_task_desc):
+def get_cil_cache(logger, conf):
+    """
+    Get cache of CIL merge results. It is shared between jobs if persistent cache is enabled and between tasks of the
+    job otherwise.
+
+    :param logger: Logger object.
+    :param conf: Configration dictionary.
+    :return: PersistentCache object or None if caching is disabled.
+    """
+    if not conf.get('cache merged source files', True):
+        return None
+
+    cache = klever.core.cache.get_persistent_cache(logger, conf, 'CIL')
+    if not cache:
+        cache = klever.core.cache.PersistentCache(logger, os.path.join(conf['cache directory'], 'CIL'),
+                                                  int(conf.get('persistent cache size', 10) * 1024 ** 3))
+    return cache
+
+
+def merge_files(logger, conf, abstract_task_desc, cache_stats=None):
     """
     Merge several given C files into single one using CIL.
 
     :param logger: Logger object.
     :param conf: Configration dictionary.
     :param abstract_task_desc: Abstract verification task description dictionary.
+    :param cache_stats: Dictionary with numbers of CIL cache "hits" and "misses" to be updated.
     :return: A file name of the newly created file.
     """
     logger.info('Merge source files by means of CIL')
 
-    args = ['toplevel.opt'] + \
-        conf.get('CIL additional opts', []) + \
+    opts = conf.get('CIL additional opts', []) + \
         [
             # This disables searching for add-ons enabled by default. One still is able to load plugins manually.
             '-no-autoload-plugins', '-no-findlib',
@@ -65,14 +85,36 @@ def merge_files(logger, conf, abstract_task_desc):
             '-aggressive-merging',
             '-print', '-print-lines', '-no-print-annot',
             '-ocode', 'cil.i',
-        ] + \
-        [
-            os.path.join(conf['main working directory'], extra_c_file['C file'])
-            for extra_c_file in abstract_task_desc['extra C files']
-            if 'C file' in extra_c_file
-           ]
+        ]
+    c_files = [
+        os.path.join(conf['main working directory'], extra_c_file['C file'])
+        for extra_c_file in abstract_task_desc['extra C files']
+        if 'C file' in extra_c_file
+    ]
+    args = ['toplevel.opt'] + opts + c_files
+
+    cache = get_cil_cache(logger, conf)
+    if cache:
+        # Input files are merged in the given order, so it matters.
+        key = cache.get_key([klever.core.utils.get_file_checksum(c_file) for c_file in c_files], opts,
+                            klever.core.cache.get_tools_fingerprint(('toplevel.opt',)))
+        with cache.lock(key):
+            # Only successful merges are cached since CIL can fail not only due to input files but also due to being
+            # killed, e.g. when the job is cancelled. Entries without merged files could remain from earlier versions.
+            if cache.get(key, {'cil.i': 'cil.i'}, link=True) and os.path.isfile('cil.i'):
+                logger.info('Get merged source files from cache')
+                if cache_stats is not None:
+                    cache_stats['hits'] = cache_stats.get('hits', 0) + 1
+            else:
+                if cache_stats is not None:
+                    cache_stats['misses'] = cache_stats.get('misses', 0) + 1
 
-    klever.core.utils.execute(logger, args=args, enforce_limitations=True)
+                klever.core.utils.execute(logger, args=args, enforce_limitations=True)
+
+                logger.info('Store merged source files to cache')
+                cache.put(key, {'cil.i': 'cil.i'})
+    else:
+        klever.core.utils.execute(logger, args=args, enforce_limitations=True)
     # There will be empty file if CIL succeeded. Remove it to avoid unknown reports of whole FVTP later.
     if os.path.isfile('problem desc.txt'):
         os.unlink('problem desc.txt')
@@ -90,7 +132,8 @@ def get_verifier_opts_and_safe_prps(logger, resource_limits, conf):
     (the most important), options provided by a profile and options from the template.
 
     :param logger: Logger.
-    :param resource_limits: Dictionary with resource limitations of the task.
+    :param resource_limits: Dictionary with resource limitations of the task or None to keep patterns like
+                            "%ldv:memory size:0.8:MB%" in options (see substitute_resource_limits()).
     :param conf: Configuration dictionary.
     :return: List with options.
     """
@@ -187,8 +230,35 @@ def get_verifier_opts_and_safe_prps(logger, resource_limits, conf):
     if conf.get('verifier profile description'):
         last = merge(last, conf['verifier profile description'])
 
-    # Process given options according to ldv patterns
-    matcher = re.compile("\%ldv\:([\w|\s]+)\:(\d+\.\d+)\:(\w+)\%")
+    if resource_limits is not None:
+        return substitute_resource_limits(last['add options'], resource_limits), last['safety properties']
+
+    return last['add options'], last['safety properties']
+
+
+# Patterns of verifier options that are replaced with values of resource limitations
+RESOURCE_LIMITS_PATTERN = re.compile("\%ldv\:([\w|\s]+)\:(\d+\.\d+)\:(\w+)\%")
+
+
+def depends_on_resource_limits(option):
+    """
+    Check whether the verifier option contains patterns that are replaced with values of resource limitations.
+
+    :param option: Dictionary with an option name as a key and its value.
+    :return: True or False.
+    """
+    return any(v and RESOURCE_LIMITS_PATTERN.search(v) for item in option.items() for v in item)
+
+
+def substitute_resource_limits(options, resource_limits):
+    """
+    Replace patterns in verifier options like "%ldv:memory size:0.8:MB%" with values of resource limitations.
+
+    :param options: List with options represented as dictionaries (see get_verifier_opts_and_safe_prps()).
+    :param resource_limits: Dictionary with resource limitations of the task.
+    :return: List with options.
+    """
+    matcher = RESOURCE_LIMITS_PATTERN
 
     def processor(v):
         """Replace patterns in options by values"""
@@ -217,12 +287,15 @@ def get_verifier_opts_and_safe_prps(logger, resource_limits, conf):
 
         return v
 
-    for index in range(len(last['add options'])):
-        option = list(last['add options'][index].keys())[0]
-        value = list(last['add options'][index].values())[0]
-        last['add options'][index] = {processor(option): processor(value)}
+    substituted = []
+    for opt in options:
+        option = list(opt.keys())[0]
+        value = list(opt.values())[0]
+        substituted.append({processor(option): processor(value)})
+
+    return substituted
+
 
-    return last['add options'], last['safety properties']
 
 
 def prepare_verification_task_files_archive(files):
@@ -0,0 +1,103 @@
+#
+# Copyright (c) 2020 ISP RAS (http://www.ispras.ru)
+# Ivannikov Institute for System Programming of the Russian Academy of Sciences
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import json
+import logging
+import zipfile
+from xml.etree import ElementTree
+
+from klever.core.vtg.fvtp.basic import Basic
+
+PROFILES = {
+    'templates': {
+        'common': {
+            'add options': [
+                {'-heap': '%ldv:memory size:0.8:MB%m'},
+                {'-setprop': 'output.disable=true'}
+            ]
+        },
+        'reachability': {
+            'inherit': 'common',
+            'safety properties': ['CHECK( init({entry_point}()), LTL(G ! call(__VERIFIER_error())) )'],
+            'add options': [
+                {'-ldv': ''}
+            ]
+        }
+    },
+    'profiles': {
+        'reachability': {
+            'CPAchecker': {
+                'trunk': {'inherit': 'reachability'}
+            }
+        }
+    }
+}
+
+
+def generate_task(tmpdir):
+    tmpdir.join('profiles.json').write(json.dumps(PROFILES))
+    tmpdir.join('tasks.json').write(json.dumps({'memory size': '1GB', 'CPU time': '15min'}))
+    tmpdir.join('main.c').write('int main(void)\n{\n  return 0;\n}\n')
+    conf = {
+        'identifier': 'job',
+        'main working directory': str(tmpdir),
+        'verifier profiles base': str(tmpdir.join('profiles.json')),
+        'verifier profile': 'reachability',
+        'verifier': {'name': 'CPAchecker', 'version': 'trunk'},
+        'solution class': 'reachability',
+        'priority': 'LOW',
+        'upload verifier input files': False,
+        'keep intermediate files': False
+    }
+    abstract_task_desc = {
+        'id': '1',
+        'attrs': [{'program fragment': 'main.ko'}, {'requirement': 'memory safety'}],
+        'extra C files': [{'C file': 'main.c'}],
+        'entry points': ['main'],
+        'additional sources': None
+    }
+
+    with tmpdir.as_cwd():
+        Basic(logging.getLogger('test'), conf, abstract_task_desc).generate_verification_task()
+
+    with open(str(tmpdir.join('task.json')), encoding='utf8') as fp:
+        return json.load(fp)
+
+
+def test_generate_verification_task(tmpdir):
+    task_desc = generate_task(tmpdir)
+
+    assert task_desc['id'] == '1'
+    assert task_desc['solution class'] == 'reachability'
+    assert task_desc['resource limits']['memory size'] == 1000 ** 3
+    assert task_desc['features'] == {
+        'CIL file size': tmpdir.join('main.c').size(),
+        'functions': 1,
+        'requirement': 'memory safety',
+        # The option depending on the memory limit is not a feature of the task
+        'verifier options': ['-setprop=output.disable=true', '-ldv=']
+    }
+
+    # Resource limits are substituted into options of the verifier
+    benchmark = ElementTree.parse(str(tmpdir.join('benchmark.xml'))).getroot()
+    options = [(opt.get('name'), opt.text) for opt in benchmark.iter('option')]
+    assert ('-heap', '800m') in options
+    assert tmpdir.join('safe-prps.prp').read() == 'CHECK( init(main()), LTL(G ! call(__VERIFIER_error())) )\n'
+
+    with zipfile.ZipFile(str(tmpdir.join('task files.zip'))) as zfp:
+        names = zfp.namelist()
+    assert 'benchmark.xml' in names and 'safe-prps.prp' in names
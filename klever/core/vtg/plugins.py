@@ -15,32 +15,59 @@
 # limitations under the License.
 #
 
-import json
 import os
 
 import klever.core.components
-import klever.core.utils
+import klever.core.serialization
 
 
 class Plugin(klever.core.components.Component):
     depend_on_requirement = True
 
     def run(self):
+        self.__load_abstract_task_desc()
+
+        self.logger.info('Start processing of abstract verification task "{0}"'.format(self.abstract_task_desc['id']))
+        klever.core.components.Component.run(self)
+
+        self.__dump_abstract_task_desc()
+
+        self.logger.info('Finish processing of abstract verification task "{0}"'.format(self.abstract_task_desc['id']))
+
+    def run_in_process(self, abstract_task_desc=None):
+        """
+        Run the plugin within the current process. The given abstract verification task description is modified in
+        place, so one object can be passed from plugin to plugin without reading and parsing files.
+
+        :param abstract_task_desc: Abstract verification task description. It is read from the input file if omitted.
+        :return: Modified abstract verification task description or None if the plugin failed.
+        """
+        if abstract_task_desc is None:
+            self.__load_abstract_task_desc()
+        else:
+            self.abstract_task_desc = abstract_task_desc
+
+        self.logger.info('Start processing of abstract verification task "{0}"'.format(self.abstract_task_desc['id']))
+        if not klever.core.components.Component.run_in_process(self):
+            return None
+
+        # Other workers and plugins can reuse the output file.
+        self.__dump_abstract_task_desc()
+
+        self.logger.info('Finish processing of abstract verification task "{0}"'.format(self.abstract_task_desc['id']))
+
+        return self.abstract_task_desc
+
+    def __load_abstract_task_desc(self):
         in_abstract_task_desc_file = os.path.relpath(
             os.path.join(self.conf['main working directory'], self.conf['in abstract task desc file']))
         self.logger.info(
             'Get abstract verification task description from file "{0}"'.format(in_abstract_task_desc_file))
-        with open(in_abstract_task_desc_file, encoding='utf8') as fp:
-            self.abstract_task_desc = json.load(fp)
-
-        self.logger.info('Start processing of abstract verification task "{0}"'.format(self.abstract_task_desc['id']))
-        klever.core.components.Component.run(self)
+        self.abstract_task_desc = klever.core.serialization.load(in_abstract_task_desc_file)
 
+    def __dump_abstract_task_desc(self):
         out_abstract_task_desc_file = os.path.relpath(
             os.path.join(self.conf['main working directory'], self.conf['out abstract task desc file']))
         self.logger.info(
             'Put modified abstract verification task description to file "{0}"'.format(out_abstract_task_desc_file))
-        with open(out_abstract_task_desc_file, 'w', encoding='utf8') as fp:
-            klever.core.utils.json_dump(self.abstract_task_desc, fp, self.conf['keep intermediate files'])
-
-        self.logger.info('Finish processing of abstract verification task "{0}"'.format(self.abstract_task_desc['id']))
+        klever.core.serialization.dump(self.abstract_task_desc, out_abstract_task_desc_file, self.conf)
@@ -23,6 +23,7 @@ import shutil
 
 from clade import Clade
 
+import klever.core.cache
 import klever.core.utils
 import klever.core.vtg.utils
 import klever.core.vtg.plugins
@@ -36,6 +37,8 @@ class Weaver(klever.core.vtg.plugins.Plugin):
         super(Weaver, self).__init__(conf, logger, parent_id, callbacks, mqs, vals, id, work_dir, attrs,
                                      separate_from_parent, include_child_resources)
         self.search_dirs = klever.core.utils.get_search_dirs(self.conf['main working directory'], abs_paths=True)
+        # Resources consumed by CIF invocations.
+        self.executed_tools = dict()
 
     def weave(self):
         self.abstract_task_desc.setdefault('extra C files', dict())
@@ -54,6 +57,20 @@ class Weaver(klever.core.vtg.plugins.Plugin):
         # Print stubs instead of inline Assembler since verifiers do not interpret it and even can fail.
         env['LDV_INLINE_ASM_STUB'] = ''
 
+        # Results of weaving in original sources can be reused between jobs when everything CIF depends on is the same.
+        persistent_cache = klever.core.cache.get_persistent_cache(self.logger, self.conf, 'weaver')
+        if persistent_cache:
+            # Headers of specifications are included into all woven in files, so their content matters rather than
+            # just a path.
+            specs_include_dir = os.path.join(os.path.dirname(self.conf['specifications base']), 'include')
+            persistent_cache_common_key_items = [clade.get_uuid(),
+                                                 klever.core.cache.get_klever_version(),
+                                                 klever.core.cache.get_tools_fingerprint(('cif', 'aspectator')),
+                                                 self.conf['specifications base'],
+                                                 klever.core.cache.get_directory_checksum(specs_include_dir),
+                                                 self.conf.get('aspect preprocessing options'),
+                                                 self.conf['working source trees'], aspectator_search_dir]
+
         for grp in self.abstract_task_desc['grps']:
             self.logger.info('Weave in C files of group "{0}"'.format(grp['id']))
 
@@ -134,8 +151,24 @@ class Weaver(klever.core.vtg.plugins.Plugin):
                 # Original sources should be woven in and we do not need to get cross references for them since this
                 # was already done before.
                 if not is_model:
-                    self.__weave(storage_path, cc['opts'], aspect, outfile_unique, clade, env, cwd,
-                                 aspectator_search_dir, is_model)
+                    if persistent_cache:
+                        key = persistent_cache.get_key(
+                            persistent_cache_common_key_items, klever.core.utils.get_file_checksum(storage_path),
+                            klever.core.utils.get_file_checksum(aspect) if aspect else None,
+                            klever.core.vtg.utils.prepare_cif_opts(cc['opts'], clade, is_model), cwd)
+                        with persistent_cache.lock(key):
+                            if persistent_cache.get(key, {'woven.c': outfile_unique}):
+                                self.logger.info('Get woven in C file from persistent cache')
+                                self.abstract_task_desc['extra C files'].append(
+                                    {'C file': os.path.relpath(outfile_unique, self.conf['main working directory'])})
+                            else:
+                                self.__weave(storage_path, cc['opts'], aspect, outfile_unique, clade, env, cwd,
+                                             aspectator_search_dir, is_model)
+                                self.logger.info('Store woven in C file to persistent cache')
+                                persistent_cache.put(key, {'woven.c': outfile_unique})
+                    else:
+                        self.__weave(storage_path, cc['opts'], aspect, outfile_unique, clade, env, cwd,
+                                     aspectator_search_dir, is_model)
                 # For generated models we need to weave them in (actually, just pass through C Back-end) and to get
                 # cross references always since most likely they all are different.
                 elif 'generated' in extra_cc:
@@ -219,6 +252,12 @@ class Weaver(klever.core.vtg.plugins.Plugin):
         del (self.abstract_task_desc['grps'])
         del (self.abstract_task_desc['deps'])
 
+        if self.executed_tools:
+            klever.core.utils.report(self.logger, 'patch',
+                                     {'identifier': self.id, 'data': {'Executed tools': self.executed_tools}},
+                                     self.mqs['report files'], self.vals['report id'],
+                                     self.conf['main working directory'])
+
     def __weave(self, storage_path, opts, aspect, outfile, clade, env, cwd, aspectator_search_dir, is_model):
         klever.core.utils.execute(
             self.logger,
@@ -245,7 +284,8 @@ class Weaver(klever.core.vtg.plugins.Plugin):
             env=env,
             cwd=cwd,
             timeout=0.01,
-            filter_func=klever.core.vtg.utils.CIFErrorFilter())
+            filter_func=klever.core.vtg.utils.CIFErrorFilter(),
+            resources=self.executed_tools)
 
         self.abstract_task_desc['extra C files'].append(
             {'C file': os.path.relpath(outfile, self.conf['main working directory'])})
@@ -0,0 +1,138 @@
+#
+# Copyright (c) 2020 ISP RAS (http://www.ispras.ru)
+# Ivannikov Institute for System Programming of the Russian Academy of Sciences
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import base64
+import http.server
+import importlib
+import json
+import threading
+import urllib.parse
+
+import pytest
+
+# The scheduler package requires these libraries to communicate with RabbitMQ and Consul, so its tests can not be even
+# imported without them
+for library in ('pika', 'consulate'):
+    try:
+        importlib.import_module(library)
+    except ImportError:
+        collect_ignore_glob = ['test_*.py']
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'benchmark: measure performance of the scheduler (run them by "-m benchmark")')
+
+
+def pytest_collection_modifyitems(config, items):
+    # Benchmarks take long, so run them just on demand
+    if 'benchmark' in config.getoption('markexpr', ''):
+        return
+
+    skip = pytest.mark.skip(reason='Benchmarks are run by "-m benchmark"')
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
+
+
+class MockConsul(http.server.ThreadingHTTPServer):
+    """Serve catalog nodes and KV storage like Consul including blocking queries."""
+
+    # Do not keep tests waiting for long
+    MAX_WAIT = 0.5
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), MockConsulHandler)
+        self.daemon_threads = True
+        self.index = 1
+        self.nodes = {}
+        self.kv = {}
+        self.requests = 0
+        self.changed = threading.Condition()
+
+    @property
+    def address(self):
+        return 'http://{}:{}'.format(*self.server_address)
+
+    @staticmethod
+    def node_state(name, cpus=8, available_cpus=None, memory=16 * 10 ** 9, disk=100 * 10 ** 9):
+        return {
+            'node name': name,
+            'CPU model': 'model',
+            'CPU number': cpus,
+            'available CPU number': cpus if available_cpus is None else available_cpus,
+            'available RAM memory': memory,
+            'available disk memory': disk,
+            'available for jobs': True,
+            'available for tasks': True
+        }
+
+    def set_node(self, node, state):
+        with self.changed:
+            self.index += 1
+            self.nodes[node] = self.index
+            self.kv['states/' + node] = (self.index, json.dumps(state, sort_keys=True, indent=4))
+            self.changed.notify_all()
+
+    def remove_node(self, node):
+        with self.changed:
+            self.index += 1
+            del self.nodes[node]
+            self.changed.notify_all()
+
+
+class MockConsulHandler(http.server.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        server = self.server
+        url = urllib.parse.urlparse(self.path)
+        query = urllib.parse.parse_qs(url.query)
+
+        with server.changed:
+            server.requests += 1
+            if 'index' in query:
+                server.changed.wait_for(lambda: server.index > int(query['index'][0]), timeout=server.MAX_WAIT)
+
+            if url.path == '/v1/catalog/nodes':
+                data = [{'Node': n, 'ModifyIndex': i} for n, i in sorted(server.nodes.items())]
+            elif url.path.startswith('/v1/kv/') and 'recurse' in query:
+                prefix = url.path[len('/v1/kv/'):]
+                data = [{'Key': k, 'ModifyIndex': i, 'Value': base64.b64encode(v.encode('utf8')).decode('ascii')}
+                        for k, (i, v) in sorted(server.kv.items()) if k.startswith(prefix)]
+            else:
+                data = None
+            index = server.index
+
+        body = json.dumps(data).encode('utf8')
+        self.send_response(200 if data else 404)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-Consul-Index', str(index))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def consul():
+    server = MockConsul()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
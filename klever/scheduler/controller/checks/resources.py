@@ -14,16 +14,14 @@
 # limitations under the License.
 
 import os
-import time
 import json
 import consulate
 import logging
 
 
-def set_data(session, conf):
+def set_data(session, key, data):
     try:
-        session.kv["states/{}".format(conf["node configuration"]["node name"])] = \
-            json.dumps(conf["node configuration"], ensure_ascii=False, sort_keys=True, indent=4)
+        session.kv[key] = data
     except (AttributeError, KeyError):
         print("Key-value storage is inaccessible")
         exit(2)
@@ -37,16 +35,12 @@ def main():
     with open(expect_file, encoding="utf8") as fh:
         node_conf = json.load(fh)
 
-    # Check content
+    # Update the state only if it has changed since the scheduler watches it and processes each modification
     session = consulate.Consul()
-    if "states/{}".format(node_conf["node configuration"]["node name"]) in session.kv:
-        # Check last modification data
-        secs_since_diff = int(time.time() - os.path.getmtime(expect_file))
-
-        if secs_since_diff < 30:
-            set_data(session, node_conf)
-    else:
-        set_data(session, node_conf)
+    key = "states/{}".format(node_conf["node configuration"]["node name"])
+    data = json.dumps(node_conf["node configuration"], ensure_ascii=False, sort_keys=True, indent=4)
+    if session.kv.get(key) != data:
+        set_data(session, key, data)
 
     exit(0)
 
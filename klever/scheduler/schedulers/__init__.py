@@ -24,6 +24,7 @@ import traceback
 import threading
 
 from klever.scheduler.server import Server
+from klever.scheduler.schedulers.pending import PendingQueue
 from klever.scheduler.utils.bridge import BridgeError
 from klever.scheduler.utils import sort_priority, time_units_converter, memory_units_converter
 
@@ -37,7 +38,7 @@ class ListeningThread(threading.Thread):
 
     conf = None
 
-    def __init__(self, local_queue, accept_jobs, accept_tag, cnf=None):
+    def __init__(self, local_queue, accept_jobs, accept_tag, cnf=None, events=None):
         super(ListeningThread, self).__init__()
         self._is_interrupted = False
         self.accept_jobs = accept_jobs
@@ -45,6 +46,7 @@ class ListeningThread(threading.Thread):
         if cnf:
             self.conf = cnf
         self._queue = local_queue
+        self._events = events
 
     def stop(self):
         self._is_interrupted = True
@@ -69,6 +71,9 @@ class ListeningThread(threading.Thread):
                 if (data[0] == 'job' and self.accept_jobs) or (data[0] == 'task' and data[-1] == self.accept_tag):
                     channel.basic_ack(method.delivery_tag)
                     self._queue.put(body)
+                    # Wake up the scheduler loop
+                    if self._events:
+                        self._events.set()
                 else:
                     channel.basic_nack(method.delivery_tag, requeue=True)
             else:
@@ -80,6 +85,13 @@ class ListeningThread(threading.Thread):
 class Scheduler:
     """Class provide general scheduler API."""
 
+    # Periods in seconds of actions that are not driven by events
+    NODES_UPDATE_PERIOD = 1
+    JOBS_PROGRESS_PERIOD = 5
+    JOBS_CHECK_PERIOD = 50
+    # Delay in seconds to process events that arrive in bursts together
+    COALESCING_DELAY = 0.05
+
     def __init__(self, conf, logger, work_dir, runner_class):
         """
         Get configuration and prepare working directory.
@@ -96,12 +108,10 @@ class Scheduler:
         self.runner = None
         self.server = None
         self._runner_class = runner_class
-        self._tasks = {}
-        self._jobs = {}
-        self._nodes = None
-        self._tools = None
-        self._iteration_period = 0.5
-        self._server_queue = None
+        self._events = threading.Event()
+        self._clean_state()
+        self._nodes_update_period = self.conf["scheduler"].get("nodes update period", self.NODES_UPDATE_PERIOD)
+        self._coalescing_delay = self.conf["scheduler"].get("coalescing delay", self.COALESCING_DELAY)
         self._channel = None
         self._listening_thread = None
         self._loop_thread = None
@@ -115,11 +125,7 @@ class Scheduler:
         Initialize scheduler completely. This method should be called both at constructing stage and scheduler
         reinitialization. Thus, all object attribute should be cleaned up and set as it is a newly created object.
         """
-        self._tasks = {}
-        self._jobs = {}
-        self._nodes = None
-        self._tools = None
-        self._server_queue = queue.Queue()
+        self._clean_state()
         self.server = Server(self.logger, self.conf["Klever Bridge"], os.path.join(self.work_dir, "requests"))
 
         _old_tasks_status = None
@@ -140,7 +146,7 @@ class Scheduler:
             self._listening_thread.join()
         self._listening_thread = ListeningThread(self._server_queue, self._runner_class.accept_jobs,
                                                  self._runner_class.accept_tag,
-                                                 self.conf["Klever jobs and tasks queue"])
+                                                 self.conf["Klever jobs and tasks queue"], self._events)
         self._listening_thread.start()
 
         # Before we proceed lets check all existing jobs
@@ -148,6 +154,29 @@ class Scheduler:
 
         self.logger.info("Scheduler base initialization has been successful")
 
+    def _clean_state(self):
+        """Forget all jobs and tasks."""
+        self._tasks = {}
+        self._jobs = {}
+        self._nodes = None
+        self._tools = None
+        self._events.clear()
+        self._server_queue = queue.Queue()
+        # Solutions of jobs and tasks are added to this queue by callbacks of their future objects
+        self._finished_solutions = queue.Queue()
+        # Pending tasks are consumed by runners incrementally in the order of priorities and ages
+        self._pending_tasks = PendingQueue()
+        self._solving_tasks = set()
+        self._pending_jobs = set()
+        self._solving_jobs = set()
+        self._job_tasks = {}
+        # Resource limitations of pending tasks are updated lazily when jobs get new solutions. These dictionaries
+        # hold numbers of updates of jobs and ones that were taken into account when preparing tasks.
+        self._job_updates = {}
+        self._prepared_tasks = {}
+        self._schedule_required = False
+        self._nodes_ok = False
+
     def launch(self):
         """
         Start scheduler loop. This is an infinite loop that exchange data with Bridge to fetch new jobs and tasks and
@@ -155,233 +184,47 @@ class Scheduler:
         new jobs and tasks, updates statuses of running jobs and tasks and schedule for solution pending ones.
         This is just an algorythm, and all particular logic and resource management should be implemented in classes
         that inherits this one.
-        """
-
-        def nth_iteration(n):
-            return True if iteration_number % n == 0 else False
 
+        The loop sleeps until something happens: a message from Bridge arrives, a solution of a job or a task finishes,
+        or it is time to update nodes. Each iteration processes just jobs and tasks related to these events.
+        """
         self.logger.info("Start scheduler loop")
-        iteration_number = 0
+        now = time.time()
+        nodes_update_time = now
+        jobs_progress_time = now + self.JOBS_PROGRESS_PERIOD
+        jobs_check_time = now + self.JOBS_CHECK_PERIOD
         while True:
             try:
-                if iteration_number == 10000:
-                    iteration_number = 0
-                else:
-                    iteration_number += 1
-
                 if not self._listening_thread.is_alive():
                     raise ValueError("Listening thread is not alive, terminating")
 
-                while True:
-                    msg = self._server_queue.get_nowait()
-                    kind, identifier, status, _ = msg.decode('utf-8').split(' ')
-                    if kind == 'job':
-                        self.logger.debug("New status of job {!r} is {!r}".format(identifier, status))
-                        sch_status = self._jobs.get(identifier, dict()).get('status', None)
-                        status = self._job_status(status)
-
-                        if status == 'PENDING':
-                            if identifier in self._jobs and sch_status not in ('PROCESSING', 'PENDING'):
-                                self.logger.warning('Job {!r} is still tracking and has status {!r}'.
-                                                    format(identifier, sch_status))
-                                del self._jobs[identifier]
-                            self.add_new_pending_job(identifier)
-                        elif status == 'PROCESSING':
-                            if sch_status in ('PENDING', 'PROCESSING'):
-                                self._jobs[identifier]['status'] = 'PROCESSING'
-                            elif identifier not in self._jobs:
-                                self.server.submit_job_error(identifier, 'Job {!r} is not traching by the scheduler'.
-                                                             format(identifier))
-                            else:
-                                self.logger.warning('Job {!r} alrady has status {!r}'.format(identifier, sch_status))
-                        elif status in ('FAILED', 'CORRUPTED', 'CANCELLED'):
-                            if identifier in self._jobs and self.runner.is_solving(self._jobs[identifier]):
-                                self.logger.warning('Job {!r} is running but got status '.format(identifier))
-                                self.runner.cancel_job(identifier, self._jobs[identifier],
-                                                       self.relevant_tasks(identifier))
-                            if identifier in self._jobs:
-                                del self._jobs[identifier]
-                        elif status == 'CORRUPTED':
-                            # CORRUPTED
-                            if identifier in self._jobs and self.runner.is_solving(self._jobs[identifier]):
-                                self.logger.info('Job {!r} was corrupted'.format(identifier))
-                                self.runner.cancel_job(identifier, self._jobs[identifier],
-                                                       self.relevant_tasks(identifier))
-                            if identifier in self._jobs:
-                                del self._jobs[identifier]
-                        elif status == 'CANCELLING':
-                            # CANCELLING
-                            if identifier in self._jobs and self.runner.is_solving(self._jobs[identifier]):
-                                self.runner.cancel_job(identifier, self._jobs[identifier],
-                                                       self.relevant_tasks(identifier))
-                            self.server.submit_job_status(identifier, self._job_status('CANCELLED'))
-                            for task_id, status in self.server.get_job_tasks(identifier):
-                                if status in ('PENDING', 'PROCESSING'):
-                                    self.server.submit_task_status(task_id, 'CANCELLED')
-                            if identifier in self._jobs:
-                                del self._jobs[identifier]
-                        else:
-                            raise NotImplementedError('Unknown job status {!r}'.format(status))
-                    else:
-                        sch_status = self._tasks.get(identifier, dict()).get('status', None)
-
-                        if status == 'PENDING':
-                            if identifier in self._tasks and sch_status not in ('PROCESSING', 'PENDING'):
-                                self.logger.warning('The task {!r} is still tracking and has status {!r}'.
-                                                    format(identifier, sch_status))
-                                del self._jobs[identifier]
-                            self.add_new_pending_task(identifier)
-                        elif status == 'PROCESSING':
-                            # PROCESSING
-                            if identifier not in self._tasks:
-                                self.logger.warning("There is running task {!r}".format(identifier))
-                                self.server.submit_task_error(identifier, 'Unknown task')
-                            elif identifier in self._tasks and not self.runner.is_solving(self._tasks[identifier]) \
-                                    and sch_status != 'PROCESSING':
-                                self.logger.warning("Task {!r} already has status {!r} and is not PROCESSING".
-                                                    format(identifier, sch_status))
-                        elif status in ('FINISHED', 'ERROR', 'CANCELLED'):
-                            # CANCELLED
-                            if identifier in self._tasks and self.runner.is_solving(self._tasks[identifier]):
-                                self.runner.cancel_task(identifier, self._tasks[identifier])
-                            if identifier in self._tasks:
-                                del self._tasks[identifier]
-                        else:
-                            raise NotImplementedError('Unknown task status {!r}'.format(status))
-            except queue.Empty:
-                pass
+                timeout = min(nodes_update_time, jobs_progress_time, jobs_check_time) - time.time()
+                if self._events.wait(max(timeout, 0)):
+                    time.sleep(self._coalescing_delay)
+                # Events that are set after this point will be processed at the next iteration
+                self._events.clear()
 
-            try:
-                for job_id, desc in list(self._jobs.items()):
-                    if self.runner.is_solving(desc) and desc["status"] == "PENDING":
-                        desc["status"] = "PROCESSING"
-                    elif desc['status'] == 'PROCESSING' and \
-                        self.runner.process_job_result(
-                            job_id, desc, [tid for tid in self._tasks if desc["status"] in ["PENDING", "PROCESSING"]
-                                                                         and self._tasks[tid]["description"]["job id"] == job_id]):
-                        if desc['status'] == 'FINISHED' and not desc.get('error'):
-                            self.server.submit_job_status(job_id, self._job_status('SOLVED'))
-                        elif desc.get('error'):
-                            # Sometimes job can be rescheduled, lets check this doing the following
-                            if not desc.get('rescheduled'):
-                                server_status = self._job_status(self.server.get_job_status(job_id))
-                                if server_status == 'PENDING':
-                                    desc['rescheduled'] = True
-                                    desc['status'] = 'PENDING'
-                                    continue
-                            self.server.submit_job_error(job_id, desc['error'])
-                        else:
-                            raise NotImplementedError("Cannot determine status of the job {!r}".format(job_id))
-                        if job_id in self._jobs:
-                            del self._jobs[job_id]
-                    elif desc['status'] == 'PROCESSING':
-                        # Request progress if it is available
-                        if nth_iteration(10) and self.relevant_tasks(job_id):
-                            progress = self.server.get_job_progress(job_id)
-                            if progress:
-                                self.runner.add_job_progress(job_id, self._jobs[job_id], progress)
-
-                for task_id, desc in list(self._tasks.items()):
-                    if self.runner.is_solving(desc) and desc["status"] == "PENDING":
-                        desc["status"] = "PROCESSING"
-                    elif desc["status"] == "PROCESSING" and self.runner.process_task_result(task_id, desc):
-                        if desc['status'] == 'FINISHED' and not desc.get('error'):
-                            self.server.submit_task_status(task_id, 'FINISHED')
-                        elif desc["status"] == 'PENDING':
-                            # This case is for rescheduling
-                            continue
-                        elif desc.get('error'):
-                            self.server.submit_task_error(task_id, desc['error'])
-                        else:
-                            raise NotImplementedError("Cannot determine status of the task {!r}: {!r}".
-                                                      format(task_id, desc["status"]))
-                        if task_id in self._tasks:
-                            del self._tasks[task_id]
-
-                # Submit tools
-                try:
-                    self.runner.update_tools()
-                except Exception as err:
-                    self.logger.warning('Cannot submit verification tools information: {}'.format(err))
+                self._process_messages()
+                self._process_finished_solutions()
 
-                # Get actual information about connected nodes
-                submit = True
-                try:
-                    self.runner.update_nodes()
-                except Exception as err:
-                    self.logger.error("Cannot obtain information about connected nodes: {}".format(err))
-                    submit = False
-                    self.logger.warning("Do not run tasks until actual information about the nodes will be obtained")
-
-                if submit:
-                    # Update resource limitations before scheduling
-                    messages = dict()
-                    for i, desc in ((i, self._tasks[i]) for i in self._tasks
-                                    if self._tasks[i]["status"] == "PENDING"):
-                        messages[i] = self.runner.prepare_task(i, desc)
-                        if not messages[i]:
-                            self.server.submit_task_error(i, desc['error'])
-                            del self._tasks[i]
-
-                    # Schedule new tasks
-                    pending_tasks = [desc for task_id, desc in self._tasks.items() if desc["status"] == "PENDING"]
-                    pending_jobs = [desc for job_id, desc in self._jobs.items() if desc["status"] == "PENDING"
-                                    and not self.runner.is_solving(desc)]
-                    pending_jobs = sorted(pending_jobs, key=lambda i: sort_priority(i['configuration']['priority']))
-                    pending_tasks = sorted(pending_tasks, key=lambda i: sort_priority(i['description']['priority']))
-
-                    tasks_to_start, jobs_to_start = self.runner.schedule(pending_tasks, pending_jobs)
-                    if len(tasks_to_start) > 0 or len(jobs_to_start) > 0:
-                        self.logger.info("Going to start {} new tasks and {} jobs".
-                                         format(len(tasks_to_start), len(jobs_to_start)))
-                        self.logger.info("There are {} pending and {} solving jobs".format(
-                            len(pending_jobs),
-                            len({j for j in self._jobs if self._jobs[j]['status'] == 'PROCESSING'})))
-                        self.logger.info("There are {} pending and {} solving tasks".format(
-                            len(pending_tasks),
-                            len({t for t in self._tasks if self._tasks[t]['status'] == 'PROCESSING'})))
-
-                        for job_id in jobs_to_start:
-                            started = self.runner.solve_job(job_id, self._jobs[job_id])
-                            if started and self._jobs[job_id]['status'] not in ('PENDING', 'PROCESSING'):
-                                raise RuntimeError('Expect that status of started job {!r} is solving but it has status'
-                                                   ' {!r}'.format(self._jobs[job_id]['status'], job_id))
-                            elif not started and self._jobs[job_id]['status'] == 'ERROR':
-                                self.server.submit_job_error(job_id, self._jobs[job_id]['error'])
-                                if job_id in self._jobs:
-                                    del self._jobs[job_id]
-
-                        for task_id in tasks_to_start:
-                            # This check is very helpful for debugging
-                            msg = messages.get(task_id)
-                            if msg and isinstance(msg, str):
-                                self.logger.info(msg)
-                            started = self.runner.solve_task(task_id, self._tasks[task_id])
-                            if started and self._tasks[task_id]['status'] != 'PROCESSING':
-                                raise RuntimeError('Expect that status of started task is PROCESSING but it is {!r} '
-                                                   'for {!r}'.format(self._tasks[task_id]['status'], task_id))
-                            elif started and self._tasks[task_id]['status'] == 'PROCESSING':
-                                if not self._tasks[task_id].get("rescheduled"):
-                                    self.server.submit_task_status(task_id, 'PROCESSING')
-                            elif not started and self._tasks[task_id]['status'] == 'PROCESSING':
-                                raise RuntimeError('In case of error task cannot be \'PROCESSING\' but it is for '
-                                                   '{!r}'.format(task_id))
-                            elif not started and self._tasks[task_id]['status'] == 'ERROR':
-                                self.server.submit_task_error(task_id, self._tasks[task_id]['error'])
-                                if task_id in self._tasks:
-                                    del self._tasks[task_id]
-
-                    # Flushing tasks
-                    if len(tasks_to_start) > 0 or \
-                            len([True for i in self._tasks if self._tasks[i]["status"] == "PROCESSING"]) > 0:
-                        self.runner.flush()
+                now = time.time()
+                if now >= nodes_update_time:
+                    nodes_update_time = now + self._nodes_update_period
+                    self._update_nodes()
+
+                if self._schedule_required and self._nodes_ok:
+                    self._schedule()
+
+                # Request progress if it is available
+                if now >= jobs_progress_time:
+                    jobs_progress_time = now + self.JOBS_PROGRESS_PERIOD
+                    self._update_jobs_progress()
 
                 # Periodically check for jobs and task that have an unexpected status. This should help notice bugs
                 # related to interaction with Bridge through RabbitMQ
-                if nth_iteration(100):
+                if now >= jobs_check_time:
+                    jobs_check_time = now + self.JOBS_CHECK_PERIOD
                     self._check_jobs_status()
-
-                time.sleep(self._iteration_period)
             except KeyboardInterrupt:
                 self.logger.error("Scheduler execution is interrupted, cancel all running threads")
                 self.terminate()
@@ -400,9 +243,352 @@ class Scheduler:
                     self.logger.info("Reinitialize scheduler and try to proceed execution in 30 seconds...")
                     time.sleep(30)
                     self.init_scheduler()
+                    now = time.time()
+                    nodes_update_time = now
+                    jobs_progress_time = now + self.JOBS_PROGRESS_PERIOD
+                    jobs_check_time = now + self.JOBS_CHECK_PERIOD
                 else:
                     exit(1)
 
+    def _process_messages(self):
+        """Process all messages about new statuses of jobs and tasks received from Bridge."""
+        while True:
+            try:
+                msg = self._server_queue.get_nowait()
+            except queue.Empty:
+                return
+
+            kind, identifier, status, _ = msg.decode('utf-8').split(' ')
+            if kind == 'job':
+                self.logger.debug("New status of job {!r} is {!r}".format(identifier, status))
+                sch_status = self._jobs.get(identifier, dict()).get('status', None)
+                status = self._job_status(status)
+
+                if status == 'PENDING':
+                    if identifier in self._jobs and sch_status not in ('PROCESSING', 'PENDING'):
+                        self.logger.warning('Job {!r} is still tracking and has status {!r}'.
+                                            format(identifier, sch_status))
+                        self._del_job(identifier)
+                    self.add_new_pending_job(identifier)
+                elif status == 'PROCESSING':
+                    if sch_status in ('PENDING', 'PROCESSING'):
+                        self._jobs[identifier]['status'] = 'PROCESSING'
+                        self._index_job(identifier)
+                    elif identifier not in self._jobs:
+                        self.server.submit_job_error(identifier, 'Job {!r} is not traching by the scheduler'.
+                                                     format(identifier))
+                    else:
+                        self.logger.warning('Job {!r} alrady has status {!r}'.format(identifier, sch_status))
+                elif status in ('FAILED', 'CORRUPTED', 'CANCELLED'):
+                    if identifier in self._jobs and self.runner.is_solving(self._jobs[identifier]):
+                        self.logger.warning('Job {!r} is running but got status '.format(identifier))
+                        self._cancel_job(identifier)
+                    if identifier in self._jobs:
+                        self._del_job(identifier)
+                elif status == 'CANCELLING':
+                    # CANCELLING
+                    if identifier in self._jobs and self.runner.is_solving(self._jobs[identifier]):
+                        self._cancel_job(identifier)
+                    self.server.submit_job_status(identifier, self._job_status('CANCELLED'))
+                    for task_id, status in self.server.get_job_tasks(identifier):
+                        if status in ('PENDING', 'PROCESSING'):
+                            self.server.submit_task_status(task_id, 'CANCELLED')
+                    if identifier in self._jobs:
+                        self._del_job(identifier)
+                else:
+                    raise NotImplementedError('Unknown job status {!r}'.format(status))
+            else:
+                sch_status = self._tasks.get(identifier, dict()).get('status', None)
+
+                if status == 'PENDING':
+                    if identifier in self._tasks and sch_status not in ('PROCESSING', 'PENDING'):
+                        self.logger.warning('The task {!r} is still tracking and has status {!r}'.
+                                            format(identifier, sch_status))
+                        self._del_task(identifier)
+                    self.add_new_pending_task(identifier)
+                elif status == 'PROCESSING':
+                    # PROCESSING
+                    if identifier not in self._tasks:
+                        self.logger.warning("There is running task {!r}".format(identifier))
+                        self.server.submit_task_error(identifier, 'Unknown task')
+                    elif identifier in self._tasks and not self.runner.is_solving(self._tasks[identifier]) \
+                            and sch_status != 'PROCESSING':
+                        self.logger.warning("Task {!r} already has status {!r} and is not PROCESSING".
+                                            format(identifier, sch_status))
+                elif status in ('FINISHED', 'ERROR', 'CANCELLED'):
+                    # CANCELLED
+                    if identifier in self._tasks and self.runner.is_solving(self._tasks[identifier]):
+                        self.runner.cancel_task(identifier, self._tasks[identifier])
+                        # Resources of the task are released
+                        self._schedule_required = True
+                    if identifier in self._tasks:
+                        self._del_task(identifier)
+                else:
+                    raise NotImplementedError('Unknown task status {!r}'.format(status))
+
+    def _process_finished_solutions(self):
+        """Process results of jobs and tasks which solutions have finished."""
+        while True:
+            try:
+                kind, identifier, future = self._finished_solutions.get_nowait()
+            except queue.Empty:
+                return
+
+            if kind == 'job':
+                desc = self._jobs.get(identifier)
+                # The job could be cancelled or started once again in the meantime
+                if not desc or desc.get('future') is not future:
+                    continue
+                self._process_job_result(identifier, desc)
+            else:
+                desc = self._tasks.get(identifier)
+                if not desc or desc.get('future') is not future:
+                    continue
+                self._process_task_result(identifier, desc)
+
+            # Resources are released
+            self._schedule_required = True
+
+    def _process_job_result(self, job_id, desc):
+        if desc['status'] == 'PROCESSING' and \
+                self.runner.process_job_result(job_id, desc, self.relevant_tasks(job_id)):
+            self._index_job_tasks(job_id)
+            if desc['status'] == 'FINISHED' and not desc.get('error'):
+                self.server.submit_job_status(job_id, self._job_status('SOLVED'))
+            elif desc.get('error'):
+                # Sometimes job can be rescheduled, lets check this doing the following
+                if not desc.get('rescheduled'):
+                    server_status = self._job_status(self.server.get_job_status(job_id))
+                    if server_status == 'PENDING':
+                        desc['rescheduled'] = True
+                        desc['status'] = 'PENDING'
+                        self._index_job(job_id)
+                        return
+                self.server.submit_job_error(job_id, desc['error'])
+            else:
+                raise NotImplementedError("Cannot determine status of the job {!r}".format(job_id))
+            if job_id in self._jobs:
+                self._del_job(job_id)
+
+    def _process_task_result(self, task_id, desc):
+        if desc["status"] == "PROCESSING" and self.runner.process_task_result(task_id, desc):
+            # Resource limitations of pending tasks of the job can be adjusted according to the new solution
+            self._update_job(desc["description"]["job id"])
+            if desc['status'] == 'FINISHED' and not desc.get('error'):
+                self.server.submit_task_status(task_id, 'FINISHED')
+            elif desc["status"] == 'PENDING':
+                # This case is for rescheduling
+                self._index_task(task_id)
+                return
+            elif desc.get('error'):
+                self.server.submit_task_error(task_id, desc['error'])
+            else:
+                raise NotImplementedError("Cannot determine status of the task {!r}: {!r}".
+                                          format(task_id, desc["status"]))
+            if task_id in self._tasks:
+                self._del_task(task_id)
+
+    def _update_nodes(self):
+        """Submit tools and get actual information about connected nodes."""
+        # Submit tools
+        try:
+            self.runner.update_tools()
+        except Exception as err:
+            self.logger.warning('Cannot submit verification tools information: {}'.format(err))
+
+        # Get actual information about connected nodes
+        try:
+            if self.runner.update_nodes():
+                # Available resources could change
+                self._schedule_required = True
+            self._nodes_ok = True
+        except Exception as err:
+            self.logger.error("Cannot obtain information about connected nodes: {}".format(err))
+            self._nodes_ok = False
+            self.logger.warning("Do not run tasks until actual information about the nodes will be obtained")
+
+    def _schedule(self):
+        """Schedule pending jobs and tasks and start solution of selected ones."""
+        self._schedule_required = False
+
+        messages = dict()
+        unprepared = []
+
+        def get_pending_tasks():
+            for i, desc in self._pending_tasks:
+                # Update resource limitations before scheduling. This is necessary just for new tasks and tasks of jobs
+                # which other tasks were solved since the previous preparation. Runners consume pending tasks
+                # incrementally, so do not prepare tasks that will not be considered at all.
+                job_updates = self._job_updates.get(desc['description']['job id'], 0)
+                if self._prepared_tasks.get(i) != job_updates:
+                    self._prepared_tasks[i] = job_updates
+                    messages[i] = self.runner.prepare_task(i, desc)
+                    if not messages[i]:
+                        unprepared.append(i)
+                        continue
+                yield desc
+
+        # Schedule new tasks
+        pending_tasks = get_pending_tasks()
+        pending_jobs = sorted((self._jobs[i] for i in self._pending_jobs),
+                              key=lambda i: sort_priority(i['configuration']['priority']))
+        if not self._pending_tasks and not pending_jobs:
+            return
+
+        tasks_to_start, jobs_to_start = self.runner.schedule(pending_tasks, pending_jobs)
+        for task_id in unprepared:
+            self.server.submit_task_error(task_id, self._tasks[task_id]['error'])
+            self._del_task(task_id)
+
+        if len(tasks_to_start) > 0 or len(jobs_to_start) > 0:
+            self.logger.info("Going to start {} new tasks and {} jobs".
+                             format(len(tasks_to_start), len(jobs_to_start)))
+            self.logger.info("There are {} pending and {} solving jobs".format(
+                len(pending_jobs), len(self._solving_jobs)))
+            self.logger.info("There are {} pending and {} solving tasks".format(
+                len(self._pending_tasks), len(self._solving_tasks)))
+
+            for job_id in jobs_to_start:
+                started = self.runner.solve_job(job_id, self._jobs[job_id])
+                if started and self._jobs[job_id]['status'] not in ('PENDING', 'PROCESSING'):
+                    raise RuntimeError('Expect that status of started job {!r} is solving but it has status'
+                                       ' {!r}'.format(self._jobs[job_id]['status'], job_id))
+                elif started:
+                    self._jobs[job_id]['status'] = 'PROCESSING'
+                    self._watch_solution('job', job_id, self._jobs[job_id]['future'])
+                    self._index_job(job_id)
+                elif not started and self._jobs[job_id]['status'] == 'ERROR':
+                    self.server.submit_job_error(job_id, self._jobs[job_id]['error'])
+                    if job_id in self._jobs:
+                        self._del_job(job_id)
+                else:
+                    # Try again later
+                    self._schedule_required = True
+
+            for task_id in tasks_to_start:
+                # This check is very helpful for debugging
+                msg = messages.get(task_id)
+                if msg and isinstance(msg, str):
+                    self.logger.info(msg)
+                started = self.runner.solve_task(task_id, self._tasks[task_id])
+                if started and self._tasks[task_id]['status'] != 'PROCESSING':
+                    raise RuntimeError('Expect that status of started task is PROCESSING but it is {!r} '
+                                       'for {!r}'.format(self._tasks[task_id]['status'], task_id))
+                elif started and self._tasks[task_id]['status'] == 'PROCESSING':
+                    self._watch_solution('task', task_id, self._tasks[task_id]['future'])
+                    self._index_task(task_id)
+                    if not self._tasks[task_id].get("rescheduled"):
+                        self.server.submit_task_status(task_id, 'PROCESSING')
+                elif not started and self._tasks[task_id]['status'] == 'PROCESSING':
+                    raise RuntimeError('In case of error task cannot be \'PROCESSING\' but it is for '
+                                       '{!r}'.format(task_id))
+                elif not started and self._tasks[task_id]['status'] == 'ERROR':
+                    self.server.submit_task_error(task_id, self._tasks[task_id]['error'])
+                    if task_id in self._tasks:
+                        self._del_task(task_id)
+                else:
+                    # Try again later
+                    self._schedule_required = True
+
+            # Flushing tasks
+            if len(tasks_to_start) > 0:
+                self.runner.flush()
+
+    def _update_jobs_progress(self):
+        """Request progress of solving jobs."""
+        for job_id in list(self._solving_jobs):
+            if self.relevant_tasks(job_id):
+                progress = self.server.get_job_progress(job_id)
+                if progress:
+                    self.runner.add_job_progress(job_id, self._jobs[job_id], progress)
+                    self._update_job(job_id)
+
+    def _watch_solution(self, kind, identifier, future):
+        """
+        Wake up the scheduler loop when the solution of the job or the task finishes.
+
+        :param kind: 'job' or 'task'.
+        :param identifier: Job or task identifier.
+        :param future: Future object.
+        """
+        def callback(done_future):
+            self._finished_solutions.put((kind, identifier, done_future))
+            self._events.set()
+
+        future.add_done_callback(callback)
+
+    def _update_job(self, identifier):
+        self._job_updates[identifier] = self._job_updates.get(identifier, 0) + 1
+
+    def _cancel_job(self, identifier):
+        self.runner.cancel_job(identifier, self._jobs[identifier], self.relevant_tasks(identifier))
+        self._pending_tasks.remove_group(identifier)
+        self._index_job_tasks(identifier)
+        self._schedule_required = True
+
+    def _index_job(self, identifier):
+        """
+        Update indexes of jobs after the job was added or its status was changed.
+
+        :param identifier: Job identifier.
+        """
+        desc = self._jobs.get(identifier)
+        self._pending_jobs.discard(identifier)
+        self._solving_jobs.discard(identifier)
+        if not desc:
+            return
+
+        if desc['status'] == 'PENDING' and not self.runner.is_solving(desc):
+            self._pending_jobs.add(identifier)
+            self._schedule_required = True
+        elif desc['status'] == 'PROCESSING':
+            self._solving_jobs.add(identifier)
+
+    def _del_job(self, identifier):
+        del self._jobs[identifier]
+        self._job_updates.pop(identifier, None)
+        self._index_job(identifier)
+
+    def _index_task(self, identifier):
+        """
+        Update indexes of tasks after the task was added or its status was changed.
+
+        :param identifier: Task identifier.
+        """
+        desc = self._tasks.get(identifier)
+        if desc and desc['status'] == 'PENDING' and not self.runner.is_solving(desc):
+            if identifier not in self._pending_tasks:
+                # Rescheduled tasks keep their places in the queue
+                desc['sequence number'] = self._pending_tasks.push(
+                    identifier, desc, desc['description']['priority'], desc['description']['job id'],
+                    desc.get('sequence number'))
+                self._schedule_required = True
+        else:
+            self._pending_tasks.remove(identifier)
+
+        if desc and desc['status'] == 'PROCESSING':
+            self._solving_tasks.add(identifier)
+        else:
+            self._solving_tasks.discard(identifier)
+
+        if desc:
+            self._job_tasks.setdefault(desc['description']['job id'], set()).add(identifier)
+
+    def _index_job_tasks(self, job_id):
+        for task_id in list(self._job_tasks.get(job_id, ())):
+            self._index_task(task_id)
+
+    def _del_task(self, identifier):
+        desc = self._tasks.pop(identifier)
+        self._pending_tasks.remove(identifier)
+        self._solving_tasks.discard(identifier)
+        self._prepared_tasks.pop(identifier, None)
+        job_tasks = self._job_tasks.get(desc['description']['job id'])
+        if job_tasks is not None:
+            job_tasks.discard(identifier)
+            if not job_tasks:
+                del self._job_tasks[desc['description']['job id']]
+
     @staticmethod
     def __add_missing_restrictions(collection):
         """
@@ -497,6 +683,8 @@ class Scheduler:
             if not prepared:
                 self.server.submit_job_error(identifier, self._jobs[identifier]['error'])
                 del self._jobs[identifier]
+            else:
+                self._index_job(identifier)
         else:
             self.logger.warning('Attempt to schedule job {} second time but it already has status {}'.
                                 format(identifier, self._jobs[identifier]['status']))
@@ -527,16 +715,19 @@ class Scheduler:
                 self.__add_missing_restrictions(
                     self._tasks[identifier]["description"]["resource limits"])
             except SchedulerException as err:
-                self._jobs[identifier] = {
-                    "id": identifier,
-                    "status": "ERROR",
-                    "error": str(err)
-                }
-            else:
-                prepared = self.runner.prepare_task(identifier, self._tasks[identifier])
-                if not prepared:
-                    self.server.submit_task_error(identifier, self._tasks[identifier]['error'])
-                    del self._tasks[identifier]
+                # The task is forgotten when Bridge reports its ERROR status back
+                self._tasks[identifier]["status"] = "ERROR"
+                self._tasks[identifier]["error"] = str(err)
+                self.server.submit_task_error(identifier, self._tasks[identifier]['error'])
+                return
+
+            prepared = self.runner.prepare_task(identifier, self._tasks[identifier])
+            if not prepared:
+                self.server.submit_task_error(identifier, self._tasks[identifier]['error'])
+                del self._tasks[identifier]
+                return
+
+            self._index_task(identifier)
         else:
             self.logger.warning('Attempt to schedule job {} second time but it already has status {}'.
                                 format(identifier, self._tasks[identifier]['status']))
@@ -548,9 +739,8 @@ class Scheduler:
         :param job_id: Relevant job identifier.
         :return: List of dictionaries.
         """
-        return [self._tasks[tid] for tid in self._tasks
-                if self._tasks[tid]["status"] in ["PENDING", "PROCESSING"]
-                and self._tasks[tid]["description"]["job id"] == job_id]
+        return [self._tasks[tid] for tid in self._job_tasks.get(job_id, ())
+                if self._tasks[tid]["status"] in ["PENDING", "PROCESSING"]]
 
     def cancel_all_tasks(self):
         """Cancel and delete all jobs and tasks before terminating or restarting scheduler."""
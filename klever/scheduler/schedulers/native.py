@@ -93,7 +93,10 @@ class Native(runners.Speculative):
             concurrent_jobs = self.conf["scheduler"]["concurrent jobs"]
         else:
             concurrent_jobs = 1
-        self._manager = resource_scheduler.ResourceManager(self.logger, concurrent_jobs)
+        if self._manager:
+            self._manager.stop_watching()
+        self._manager = resource_scheduler.ResourceManager(self.logger, concurrent_jobs,
+                                                           self.conf["scheduler"].get("task placement", "first fit"))
 
         if "wait controller initialization" in self.conf["scheduler"]:
             wc = self.conf["scheduler"]["wait controller initialization"]
@@ -139,11 +142,12 @@ class Native(runners.Speculative):
 
     def schedule(self, pending_tasks, pending_jobs):
         """
-        Get a list of new tasks which can be launched during current scheduler iteration. All pending jobs and tasks
-        should be sorted reducing the priority to the end. Each task and job in arguments are dictionaries with full
-        configuration or description.
+        Get a list of new tasks which can be launched during current scheduler iteration. Pending tasks are provided
+        from the highest priority to the lowest one and from older tasks to newer ones, so it is enough to consume them
+        until there are no resources. Pending jobs should be sorted reducing the priority to the end. Each task and job
+        in arguments are dictionaries with full configuration or description.
 
-        :param pending_tasks: List with all pending tasks.
+        :param pending_tasks: Iterable over all pending tasks.
         :param pending_jobs: List with all pending jobs.
         :return: List with identifiers of pending tasks to launch and list woth identifiers of jobs to launch.
         """
@@ -166,6 +170,10 @@ class Native(runners.Speculative):
         # Be sure that workers are killed
         self._pool.shutdown(wait=False)
 
+        # Stop tracking nodes
+        if self._manager:
+            self._manager.stop_watching()
+
     def update_nodes(self, wait_controller=False):
         """
         Update statuses and configurations of available nodes and push them to the server.
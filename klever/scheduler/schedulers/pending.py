@@ -0,0 +1,131 @@
+#
+# Copyright (c) 2020 ISP RAS (http://www.ispras.ru)
+# Ivannikov Institute for System Programming of the Russian Academy of Sciences
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import heapq
+import itertools
+
+from klever.scheduler.utils import sort_priority
+
+
+class PendingQueue:
+    """
+    Queue of pending jobs or tasks ordered by decreasing priorities and then by their sequence numbers, i.e. by ages.
+    Items of each priority are kept in separate heaps for groups like jobs of tasks. Removed items are not deleted from
+    heaps immediately but they are skipped and heaps are rebuilt when there are too many such items.
+    """
+
+    # Rebuild heaps when the number of removed items exceeds both this number and the number of actual items
+    MIN_STALE_ITEMS = 1000
+
+    def __init__(self):
+        # {identifier: [sequence number, token, group, priority, item]}
+        self.__entries = {}
+        # {priority: {group: heap of [sequence number, token, identifier]}}
+        self.__heaps = {}
+        self.__sequence_numbers = itertools.count()
+        self.__tokens = itertools.count()
+        self.__stale = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, identifier):
+        return identifier in self.__entries
+
+    def __iter__(self):
+        """
+        Iterate over identifiers and items from the highest priority to the lowest one and from the oldest items to the
+        newest ones. Items are not removed, and the queue should not be modified until the iteration is finished. The
+        iteration is lazy, so the first k items cost O(k log n) rather than sorting the whole queue.
+        """
+        for priority in sorted(self.__heaps, reverse=True):
+            groups = self.__heaps[priority]
+
+            # Traverse heaps of all groups together in the sorted order without modifying them. The frontier holds
+            # the smallest not yet visited element of each subtree.
+            frontier = [(heap[0][0], heap[0][1], group, 0) for group, heap in groups.items() if heap]
+            heapq.heapify(frontier)
+            while frontier:
+                _, token, group, index = heapq.heappop(frontier)
+                heap = groups[group]
+                for child in (2 * index + 1, 2 * index + 2):
+                    if child < len(heap):
+                        heapq.heappush(frontier, (heap[child][0], heap[child][1], group, child))
+
+                identifier = heap[index][2]
+                entry = self.__entries.get(identifier)
+                if entry and entry[1] == token:
+                    yield identifier, entry[4]
+
+    def push(self, identifier, item, priority, group=None, sequence_number=None):
+        """
+        Add the item to the queue or replace the existing one.
+
+        :param identifier: Job or task identifier.
+        :param item: Job or task description.
+        :param priority: 'IDLE', 'LOW', 'HIGH' or 'URGENT'.
+        :param group: Group of the item like a job identifier.
+        :param sequence_number: Sequence number to keep the age of the item that returns to the queue.
+        :return: Sequence number.
+        """
+        if identifier in self.__entries:
+            self.remove(identifier)
+
+        if sequence_number is None:
+            sequence_number = next(self.__sequence_numbers)
+        token = next(self.__tokens)
+        priority = sort_priority(priority)
+
+        self.__entries[identifier] = [sequence_number, token, group, priority, item]
+        heapq.heappush(self.__heaps.setdefault(priority, {}).setdefault(group, []),
+                       [sequence_number, token, identifier])
+
+        return sequence_number
+
+    def remove(self, identifier):
+        """
+        Remove the item from the queue if it is there.
+
+        :param identifier: Job or task identifier.
+        """
+        if self.__entries.pop(identifier, None):
+            self.__stale += 1
+            if self.__stale > self.MIN_STALE_ITEMS and self.__stale > len(self.__entries):
+                self.__rebuild()
+
+    def remove_group(self, group):
+        """
+        Remove all items of the group.
+
+        :param group: Group of items like a job identifier.
+        """
+        for groups in self.__heaps.values():
+            heap = groups.pop(group, None)
+            if heap:
+                for _, token, identifier in heap:
+                    entry = self.__entries.get(identifier)
+                    if entry and entry[1] == token:
+                        del self.__entries[identifier]
+
+    def __rebuild(self):
+        self.__heaps = {}
+        for identifier, (sequence_number, token, group, priority, _) in self.__entries.items():
+            self.__heaps.setdefault(priority, {}).setdefault(group, []).append([sequence_number, token, identifier])
+        for groups in self.__heaps.values():
+            for heap in groups.values():
+                heapq.heapify(heap)
+        self.__stale = 0
@@ -0,0 +1,143 @@
+#
+# Copyright (c) 2020 ISP RAS (http://www.ispras.ru)
+# Ivannikov Institute for System Programming of the Russian Academy of Sciences
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import bisect
+
+
+class Placement:
+    """
+    Choose nodes for tasks considering CPU cores, memory and disk as a vector of resources. Nodes with the same CPU model
+    are kept sorted by their free resources, thus nodes that have not enough CPU cores are skipped by a binary search
+    and the index is updated in logarithmic time when resources are reserved.
+
+    Strategies:
+     * "first fit" - the node with the least free CPU cores, memory and disk in the lexicographic order is chosen. This
+                     is the policy that was used before strategies were introduced. The search stops at the first
+                     suitable node.
+     * "best fit" - the node which has the least sum of resources left after the reservation is chosen. Resources are
+                    normalized to capacities of nodes.
+     * "worst fit" - the node which has the largest sum of resources left after the reservation is chosen, so the load
+                     is spread over nodes.
+     * "dominant resource" - the node which has the least share of its dominant resource, i.e. the resource with the
+                             largest normalized amount, left after the reservation is chosen. Thus nodes are filled
+                             evenly in all dimensions and tasks of different shapes complement each other.
+    Other strategies than "first fit" consider all nodes that have enough CPU cores.
+    """
+
+    STRATEGIES = ('first fit', 'best fit', 'worst fit', 'dominant resource')
+
+    def __init__(self, strategy='first fit'):
+        """
+        Create an empty index.
+
+        :param strategy: Name of the strategy.
+        :raise ValueError: The strategy is unknown.
+        """
+        if strategy not in self.STRATEGIES:
+            raise ValueError("Unknown task placement strategy {!r}, choose one of: {}".
+                             format(strategy, ', '.join(self.STRATEGIES)))
+        self.__strategy = strategy
+        # {node: [CPU model, capacity vector, free resources vector]}
+        self.__nodes = {}
+        # {CPU model: sorted list of [free resources vector, node]}
+        self.__groups = {}
+
+    def add(self, node, cpu_model, capacity, free):
+        """
+        Add the node to the index.
+
+        :param node: Node name.
+        :param cpu_model: CPU model of the node.
+        :param capacity: (CPU cores, memory, disk) - total resources of the node.
+        :param free: (CPU cores, memory, disk) - free resources of the node.
+        """
+        free = tuple(free)
+        self.__nodes[node] = [cpu_model, tuple(capacity), free]
+        bisect.insort(self.__groups.setdefault(cpu_model, []), (free, node))
+
+    def place(self, cpu_model, demand):
+        """
+        Choose the node for the task. Resources are not reserved.
+
+        :param cpu_model: Required CPU model or None.
+        :param demand: (CPU cores, memory, disk) - resources required by the task.
+        :return: Node name or None if the task does not fit any node.
+        """
+        if cpu_model:
+            groups = [self.__groups.get(cpu_model, [])]
+        else:
+            groups = self.__groups.values()
+
+        best = None
+        for group in groups:
+            # Skip nodes that do not have enough CPU cores
+            for i in range(bisect.bisect_left(group, ((demand[0],),)), len(group)):
+                free, node = group[i]
+                if free[1] < demand[1] or free[2] < demand[2]:
+                    continue
+
+                score = (self.__score(self.__nodes[node][1], free, demand), node)
+                if best is None or score < best:
+                    best = score
+                # Groups are sorted in the lexicographic order of free resources
+                if self.__strategy == 'first fit':
+                    break
+
+        return best[1] if best else None
+
+    def fits(self, demand):
+        """
+        Check whether there is a node of any CPU model that has enough free resources for the task.
+
+        :param demand: (CPU cores, memory, disk) - resources required by the task.
+        :return: True or False.
+        """
+        for group in self.__groups.values():
+            for i in range(bisect.bisect_left(group, ((demand[0],),)), len(group)):
+                free = group[i][0]
+                if free[1] >= demand[1] and free[2] >= demand[2]:
+                    return True
+
+        return False
+
+    def reserve(self, node, demand):
+        """
+        Reserve resources at the node.
+
+        :param node: Node name.
+        :param demand: (CPU cores, memory, disk) - resources to reserve.
+        """
+        cpu_model, capacity, free = self.__nodes[node]
+        group = self.__groups[cpu_model]
+        del group[bisect.bisect_left(group, (free, node))]
+
+        free = tuple(max(f - d, 0) for f, d in zip(free, demand))
+        self.__nodes[node][2] = free
+        bisect.insort(group, (free, node))
+
+    def __score(self, capacity, free, demand):
+        # The less score the better node
+        if self.__strategy == 'first fit':
+            return free
+
+        left = [(f - d) / c for f, d, c in zip(free, demand, capacity) if c]
+        if self.__strategy == 'best fit':
+            return sum(left)
+        elif self.__strategy == 'worst fit':
+            return -sum(left)
+        else:
+            return max(left, default=0)
@@ -0,0 +1,282 @@
+#
+# Copyright (c) 2020 ISP RAS (http://www.ispras.ru)
+# Ivannikov Institute for System Programming of the Russian Academy of Sciences
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import json
+import math
+import os
+
+
+def get_predictor(logger, conf):
+    """
+    Create a predictor of memory required for solving verification tasks according to the scheduler configuration
+    option "resource predictor", e.g.:
+    {
+        "type": "quantile regression",
+        "quantile": 0.95,
+        "model file": "/abs/path/to/resource-predictor.json"
+    }
+    The model file keeps the trained model across scheduler restarts. It should be placed outside the working directory
+    since the latter is removed at start.
+
+    :param logger: Logger object.
+    :param conf: Predictor configuration or None.
+    :return: Predictor object or None if the predictor is not configured.
+    """
+    if not conf:
+        return None
+
+    predictor_type = conf.get("type", "quantile regression")
+    if predictor_type not in PREDICTORS:
+        raise KeyError("Unknown resource predictor {!r}, choose one of: {}".
+                       format(predictor_type, ', '.join(PREDICTORS)))
+
+    return PREDICTORS[predictor_type](logger, conf)
+
+
+class Predictor:
+    """
+    Base class of predictors of memory required for solving verification tasks. Predictors are trained on solutions of
+    tasks. Tasks are described by features collected by Klever Core (see klever.core.vtg.fvtp.basic). The base class
+    keeps statistics of predictions and saves models.
+    """
+
+    # Save the model after this number of new solutions
+    SAVE_PERIOD = 100
+
+    def __init__(self, logger, conf):
+        """
+        Load the model if it was saved before.
+
+        :param logger: Logger object.
+        :param conf: Predictor configuration.
+        """
+        self.logger = logger
+        self.conf = conf
+        self._model_file = conf.get("model file")
+        # Number of solutions used for training
+        self._samples = 0
+        # Solutions for which the prediction was enough or not and the amount of memory that would be reserved in excess
+        self.statistics = {"hits": 0, "misses": 0, "over-reservation": 0, "reservation": 0}
+        self.__unsaved = 0
+
+        if self._model_file and os.path.isfile(self._model_file):
+            try:
+                with open(self._model_file, encoding="utf8") as fp:
+                    state = json.load(fp)
+            except (OSError, ValueError) as err:
+                self.logger.warning("Cannot load resource predictor from {!r}: {}".format(self._model_file, err))
+                state = {}
+
+            if state.get("type") == self.__class__.__name__:
+                self._samples = state["samples"]
+                self.statistics = state["statistics"]
+                self._set_state(state["model"])
+                self.logger.info("Load resource predictor trained on {} solutions from {!r}".
+                                 format(self._samples, self._model_file))
+            elif state:
+                self.logger.warning("Ignore resource predictor of another type at {!r}".format(self._model_file))
+
+    @property
+    def ready(self):
+        """Whether the model was trained on enough solutions to predict anything."""
+        return self._samples >= self.conf.get("min samples", 50)
+
+    def predict(self, description):
+        """
+        Predict the memory size required for solving the task.
+
+        :param description: Task description.
+        :return: Memory size in bytes or None if it cannot be predicted.
+        """
+        features = description.get("features")
+        if not self.ready or not features:
+            return None
+
+        return int(self._predict(self._get_features(description)))
+
+    def add_solution(self, description, resources, exceeded=False):
+        """
+        Train the model on the solution of the task.
+
+        :param description: Task description.
+        :param resources: Dictionary with resource consumption data.
+        :param exceeded: The task exceeded given limitations, so actual requirements are at least the same.
+        """
+        if not description.get("features") or not resources.get("memory size"):
+            return
+
+        features = self._get_features(description)
+        memory = resources["memory size"]
+        if not exceeded:
+            if self.ready:
+                prediction = self._predict(features)
+                if prediction >= memory:
+                    self.statistics["hits"] += 1
+                    self.statistics["over-reservation"] += int(prediction - memory)
+                    self.statistics["reservation"] += int(prediction)
+                else:
+                    self.statistics["misses"] += 1
+            self._samples += 1
+
+        self._learn(features, memory, exceeded)
+
+        self.__unsaved += 1
+        if self.__unsaved >= self.SAVE_PERIOD:
+            self.save()
+
+    def log_statistics(self):
+        """Print the quality of predictions."""
+        hits = self.statistics["hits"]
+        misses = self.statistics["misses"]
+        if hits + misses:
+            self.logger.info(
+                "Resource predictor statistics:\n\ttrained on solutions: {}\n\thits: {}\n\tmisses: {} ({:.1%})\n\t"
+                "over-reservation: {:.1%} of predicted memory".
+                format(self._samples, hits, misses, misses / (hits + misses),
+                       self.statistics["over-reservation"] / self.statistics["reservation"]
+                       if self.statistics["reservation"] else 0))
+
+    def save(self):
+        """Save the model to the model file if it is configured."""
+        self.__unsaved = 0
+        if not self._model_file:
+            return
+
+        state = {
+            "type": self.__class__.__name__,
+            "samples": self._samples,
+            "statistics": self.statistics,
+            "model": self._get_state()
+        }
+        # Do not corrupt the model if the scheduler is killed while saving it
+        try:
+            with open(self._model_file + ".tmp", "w", encoding="utf8") as fp:
+                json.dump(state, fp, ensure_ascii=False, sort_keys=True)
+            os.replace(self._model_file + ".tmp", self._model_file)
+        except OSError as err:
+            self.logger.warning("Cannot save resource predictor to {!r}: {}".format(self._model_file, err))
+
+    @staticmethod
+    def _get_features(description):
+        """
+        Convert the task description into a sparse vector of features.
+
+        :param description: Task description.
+        :return: {feature name: value}.
+        """
+        features = description["features"]
+        # Logarithms are shifted by typical values (1 MB of CIL code and 1000 functions), otherwise their weights are
+        # hardly distinguished from the bias by the gradient descent
+        vector = {
+            "bias": 1.0,
+            "CIL file size": math.log2(1 + features.get("CIL file size", 0)) - 20,
+            "functions": math.log2(1 + features.get("functions", 0)) - 10,
+            "requirement " + str(features.get("requirement")): 1.0
+        }
+        if description.get("verifier"):
+            vector["verifier {} {}".format(description["verifier"].get("name"),
+                                           description["verifier"].get("version"))] = 1.0
+        for opt in features.get("verifier options", ()):
+            vector["option " + opt] = 1.0
+
+        return vector
+
+    def _predict(self, features):
+        """
+        Predict the memory size.
+
+        :param features: {feature name: value}.
+        :return: Memory size in bytes.
+        """
+        raise NotImplementedError
+
+    def _learn(self, features, memory, exceeded):
+        """
+        Update the model.
+
+        :param features: {feature name: value}.
+        :param memory: Consumed memory size in bytes.
+        :param exceeded: The memory size is a lower bound of the actual requirement.
+        """
+        raise NotImplementedError
+
+    def _get_state(self):
+        """Return JSON serializable model."""
+        raise NotImplementedError
+
+    def _set_state(self, state):
+        """Restore the model returned by _get_state()."""
+        raise NotImplementedError
+
+
+class QuantileRegression(Predictor):
+    """
+    Linear quantile regression of the logarithm of the memory size. The model is trained online by the stochastic
+    gradient descent with AdaGrad step sizes on the pinball loss, so the given quantile of the memory size is predicted.
+    Solutions that exceeded limitations can only increase predictions.
+    """
+
+    def __init__(self, logger, conf):
+        self.__quantile = conf.get("quantile", 0.95)
+        self.__learning_rate = conf.get("learning rate", 0.1)
+        # {feature name: weight}
+        self.__weights = {}
+        # {feature name: sum of squared gradients}
+        self.__gradients = {}
+        super(QuantileRegression, self).__init__(logger, conf)
+
+    def _predict(self, features):
+        return 2 ** self.__predict_log(features)
+
+    def _learn(self, features, memory, exceeded):
+        target = math.log2(memory)
+        if not self.__weights:
+            # Start from the first solution rather than from zero to converge faster
+            self.__weights["bias"] = target
+        if exceeded:
+            # Solutions that exceeded limitations consumed all available memory while they need more
+            target += math.log2(1.1)
+        prediction = self.__predict_log(features)
+        if target > prediction:
+            gradient = -self.__quantile
+        elif exceeded:
+            return
+        else:
+            gradient = 1 - self.__quantile
+
+        for name, value in features.items():
+            g = gradient * value
+            if not g:
+                continue
+            self.__gradients[name] = self.__gradients.get(name, 0) + g * g
+            self.__weights[name] = self.__weights.get(name, 0) - \
+                self.__learning_rate * g / math.sqrt(self.__gradients[name])
+
+    def _get_state(self):
+        return {"weights": self.__weights, "gradients": self.__gradients}
+
+    def _set_state(self, state):
+        self.__weights = state["weights"]
+        self.__gradients = state["gradients"]
+
+    def __predict_log(self, features):
+        return sum(self.__weights.get(name, 0) * value for name, value in features.items())
+
+
+PREDICTORS = {
+    "quantile regression": QuantileRegression
+}
@@ -14,13 +14,90 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import base64
 import requests
-import consulate
 import json
 import copy
+import threading
 import time
 from klever.scheduler.utils import higher_priority, sort_priority
 from klever.scheduler.schedulers import SchedulerException
+from klever.scheduler.schedulers.placement import Placement
+
+
+class ConsulWatch(threading.Thread):
+    """
+    Track a Consul HTTP API endpoint with blocking queries. Consul answers such a query only when the index of the data
+    exceeds the given one or when the wait time expires, so the watch does not poll the endpoint and the data is
+    downloaded and decoded only when it changes.
+    """
+
+    # The maximum time for which Consul blocks a query
+    WAIT_TIME = 60
+    # Time to wait before retrying a failed query
+    RETRY_DELAY = 5
+
+    def __init__(self, logger, url, **params):
+        """
+        Prepare the watch. Call fetch() to get the initial data and then start the thread to track changes.
+
+        :param logger: Logger object.
+        :param url: Endpoint URL.
+        :param params: Additional query parameters like recurse.
+        """
+        super(ConsulWatch, self).__init__(daemon=True)
+        self.__logger = logger
+        self.__url = url
+        self.__params = params
+        self.__index = 0
+        self.__stop = threading.Event()
+        # The version is increased each time the data changes. Both are replaced at once to let readers get them
+        # without locks.
+        self.state = (0, None)
+        # The last error if the most recent query failed
+        self.error = None
+
+    def fetch(self, block=False):
+        """
+        Query the endpoint and update the data if it has changed.
+
+        :param block: Wait until the data changes or the wait time expires.
+        :raise ValueError: The request failed.
+        """
+        params = dict(self.__params)
+        timeout = None
+        if block:
+            params['index'] = self.__index
+            params['wait'] = '{}s'.format(self.WAIT_TIME)
+            # Consul adds a random jitter up to 1/16 of the wait time
+            timeout = self.WAIT_TIME * 1.1 + self.RETRY_DELAY
+
+        r = requests.get(self.__url, params=params, timeout=timeout)
+        # Consul responses 404 on reading absent keys of KV storage
+        if not r.ok and r.status_code != 404:
+            raise ValueError("Cannot request {} (got status code: {} due to: {})".
+                             format(self.__url, r.status_code, r.reason))
+
+        index = int(r.headers.get('X-Consul-Index', 0))
+        if index != self.__index or self.state[1] is None:
+            # Indexes can go backwards after restarts of Consul, then they should be reset
+            self.__index = index if index > self.__index else 0
+            self.state = (self.state[0] + 1, r.json() if r.ok else [])
+
+    def run(self):
+        while not self.__stop.is_set():
+            try:
+                self.fetch(block=True)
+                self.error = None
+            except (requests.exceptions.RequestException, ValueError) as err:
+                if not self.__stop.is_set():
+                    self.__logger.warning("Cannot watch {}: {}".format(self.__url, err))
+                self.error = err
+                self.__stop.wait(self.RETRY_DELAY)
+
+    def stop(self):
+        """Stop tracking changes. The pending query is abandoned."""
+        self.__stop.set()
 
 
 class ResourceManager:
@@ -32,18 +109,33 @@ class ResourceManager:
     any specific actions to prepare, start or cancel jobs or tasks.
     """
 
-    def __init__(self, logger, max_jobs=1):
+    STATES_PREFIX = "states/"
+    # The number of pending tasks that are examined after the first task that can not be started. Smaller tasks from
+    # the rest of the queue can fill resources that are left, but the whole backlog is not examined at each scheduling.
+    BACKFILL_LOOKAHEAD = 1000
+
+    def __init__(self, logger, max_jobs=1, placement='first fit'):
         """
         Initiaize the manager of resources.
 
         :param max_jobs: The maximum number of running jobs with the same or higher priority.
+        :param placement: Strategy of choosing nodes for tasks (see Placement).
         """
         self.__logger = logger
         self.__max_running_jobs = max_jobs
+        # Check the strategy at once rather than at scheduling
+        Placement(placement)
+        self.__placement = placement
         self.__system_status = {}
         self.__cached_system_status = None
         self.__jobs_config = {}
         self.__tasks_config = {}
+        # Watches of connected nodes and their states and versions of their data that were processed last time
+        self.__nodes_watch = None
+        self.__states_watch = None
+        self.__versions = None
+        # {node: [modify index, state]} - the last states of nodes as they were stored by the controller
+        self.__node_states = {}
 
         self.__logger.info("Resource manager is live now with max running jobs limitation is {}".format(max_jobs))
 
@@ -51,46 +143,127 @@ class ResourceManager:
         """
         Get an information about connected nodes from a scheduler controller. If a user reduces an amount of available
         resources the method checks the invariant and reports jobs and tasks to cancel to prevent scheduling deadlocks.
+        Nodes and their states are tracked by blocking queries in background, so only changed states are processed.
 
         :param address: Controllers address to make the request.
         :param wait_controller: Wait until controller intializes its KV storage.
         :raise ValueError: If the request to controller fails then raise the exception.
         :return: [list of identifiers of jobs to cancel], [list of identifiers of tasks to cancel].
         """
-        def request(kv_url):
-            r = requests.get(kv_url)
-            if not r.ok:
-                raise ValueError("Cannot get list of connected nodes requesting {} (got status code: {} due to: {})".
-                                 format(kv_url, r.status_code, r.reason))
-            nds = r.json()
-            nds = [data["Node"] for data in nds]
-            sess = consulate.Consul()
-            # test
-            if len(nds) == 0:
-                raise KeyError("Expect at least one working node to operate")
-            sess.kv["states/" + nds[0]]
-            return nds, sess
-
-        url = address + "/v1/catalog/nodes"
-        if wait_controller:
-            done = False
-            while not done:
-                try:
-                    nodes, session = request(url)
-                    done = True
-                except (requests.exceptions.ConnectionError, KeyError, ValueError):
-                    time.sleep(10)
-        else:
-            nodes, session = request(url)
+        if not self.__states_watch:
+            self.__start_watching(address, wait_controller)
+
+        for watch in (self.__nodes_watch, self.__states_watch):
+            if watch.error:
+                raise ValueError("Cannot get actual information about connected nodes: {}".format(watch.error))
 
         cancel_jobs = []
         cancel_tasks = []
+        nodes_version, nodes = self.__nodes_watch.state
+        states_version, states = self.__states_watch.state
+        if self.__versions != (nodes_version, states_version):
+            self.__versions = (nodes_version, states_version)
+            nodes = [data["Node"] for data in nodes]
+            changed = self.__update_node_states(states)
+            self.__update_nodes(nodes, changed, cancel_jobs, cancel_tasks)
+
+        # Check ailing status
+        for name, node in [[n, self.__system_status[n]] for n in self.__system_status
+                           if self.__system_status[n]["status"] != "DISCONNECTED"]:
+            if node["reserved CPU number"] > node["available CPU number"] or \
+                    node["reserved RAM memory"] > node["available RAM memory"] or \
+                    node["reserved disk memory"] > node["available disk memory"]:
+                self.__logger.warning("Node {!r} is ailing since too many resources reserved!".format(name))
+                node["status"] = "AILING"
+            else:
+                node["status"] = "HEALTHY"
+
+        return cancel_jobs, cancel_tasks
+
+    def stop_watching(self):
+        """Stop tracking nodes."""
+        for watch in (self.__nodes_watch, self.__states_watch):
+            if watch:
+                watch.stop()
+        self.__nodes_watch = None
+        self.__states_watch = None
+        self.__versions = None
+
+    def __start_watching(self, address, wait_controller):
+        """
+        Get initial lists of nodes and their states and start tracking them.
+
+        :param address: Controllers address to make the request.
+        :param wait_controller: Wait until controller intializes its KV storage.
+        """
+        nodes_watch = ConsulWatch(self.__logger, address + "/v1/catalog/nodes")
+        states_watch = ConsulWatch(self.__logger, address + "/v1/kv/" + self.STATES_PREFIX, recurse=True)
+        while True:
+            try:
+                nodes_watch.fetch()
+                states_watch.fetch()
+                nodes = nodes_watch.state[1]
+                if len(nodes) == 0:
+                    raise KeyError("Expect at least one working node to operate")
+                if not any(entry["Key"] == self.STATES_PREFIX + nodes[0]["Node"] for entry in states_watch.state[1]):
+                    raise KeyError("There is no state of node {!r}".format(nodes[0]["Node"]))
+                break
+            except (requests.exceptions.ConnectionError, KeyError, ValueError):
+                if not wait_controller:
+                    raise
+                time.sleep(10)
+
+        nodes_watch.start()
+        states_watch.start()
+        self.__nodes_watch = nodes_watch
+        self.__states_watch = states_watch
+
+    def __update_node_states(self, states):
+        """
+        Decode states of nodes that were modified since the previous update.
+
+        :param states: Entries of KV storage.
+        :return: {node: state} - changed states.
+        """
+        changed = {}
+        keys = set()
+        for entry in states:
+            node = entry["Key"][len(self.STATES_PREFIX):]
+            keys.add(node)
+            if not entry.get("Value"):
+                continue
+            if node not in self.__node_states or self.__node_states[node][0] != entry["ModifyIndex"]:
+                self.__logger.debug("State of node {!r} has changed".format(node))
+                state = json.loads(base64.b64decode(entry["Value"]).decode("utf8"))
+                self.__node_states[node] = [entry["ModifyIndex"], state]
+                changed[node] = state
+
+        for node in [n for n in self.__node_states if n not in keys]:
+            del self.__node_states[node]
+
+        return changed
+
+    def __update_nodes(self, nodes, changed, cancel_jobs, cancel_tasks):
+        """
+        Apply changes of nodes and their states to the system status.
+
+        :param nodes: Names of connected nodes.
+        :param changed: {node: state} - changed states.
+        :param cancel_jobs: List to add identifiers of jobs to cancel.
+        :param cancel_tasks: List to add identifiers of tasks to cancel.
+        """
         for node in nodes:
-            string = session.kv["states/" + node]
-            node_status = json.loads(string)
+            if node not in self.__node_states:
+                self.__logger.warning("Node {!r} is connected but the controller has not stored its state yet".
+                                      format(node))
+                continue
 
             # Get dictionary and compare it with existing one
             if node in self.__system_status and self.__system_status[node]["status"] != "DISCONNECTED":
+                if node not in changed:
+                    continue
+                node_status = changed[node]
+
                 if self.__system_status[node]["available for jobs"] and not node_status["available for jobs"]:
                     self.__logger.warning("Cancel jobs: {}".
                                           format(str(self.__system_status[node]["running verification jobs"])))
@@ -115,7 +288,7 @@ class ResourceManager:
                 self.__system_status[node]["available RAM memory"] = node_status["available RAM memory"]
                 self.__system_status[node]["available disk memory"] = node_status["available disk memory"]
             else:
-                self.__system_status[node] = node_status
+                self.__system_status[node] = dict(self.__node_states[node][1])
                 self.__system_status[node]["status"] = "HEALTHY"
                 self.__system_status[node]["reserved CPU number"] = 0
                 self.__system_status[node]["reserved RAM memory"] = 0
@@ -124,7 +297,8 @@ class ResourceManager:
                 self.__system_status[node]["running verification tasks"] = []
 
         # Check disconnected nodes
-        for missing in (n for n in self.__system_status if n not in nodes):
+        for missing in (n for n in self.__system_status
+                        if n not in nodes and self.__system_status[n]["status"] != "DISCONNECTED"):
             self.__logger.warning("Seems that node {!r} is disconnected, cancel all running tasks and jobs there"
                                   .format(missing))
             self.__logger.warning('Node {!r} is disconnected. Cancel tasks and jobs: {} and {}'.
@@ -134,19 +308,6 @@ class ResourceManager:
             cancel_tasks.extend(self.__system_status[missing]["running verification tasks"])
             self.__system_status[missing]["status"] = "DISCONNECTED"
 
-        # Check ailing status
-        for name, node in [[n, self.__system_status[n]] for n in self.__system_status
-                           if self.__system_status[n]["status"] != "DISCONNECTED"]:
-            if node["reserved CPU number"] > node["available CPU number"] or \
-                    node["reserved RAM memory"] > node["available RAM memory"] or \
-                    node["reserved disk memory"] > node["available disk memory"]:
-                self.__logger.warning("Node {!r} is ailing since too many resources reserved!".format(name))
-                node["status"] = "AILING"
-            else:
-                node["status"] = "HEALTHY"
-
-        return cancel_jobs, cancel_tasks
-
     def submit_status(self, server):
         """
         Caclulate an available configuration of all nodes, nodes with particular configuration and the current workload,
@@ -208,8 +369,8 @@ class ResourceManager:
         Get two sorted by priorities lists of pending tasks and jobs and determine which can be started now and at which
         nodes.
 
-        :param pending_tasks: A list of dictionaries with the description for pending tasks sorted increasing the
-                              priority.
+        :param pending_tasks: An iterable over dictionaries with the description for pending tasks sorted reducing the
+                              priority. It is consumed just once.
         :param pending_jobs: A list of dictionaries with configuration for pending jobs sorted increasing the priority.
         :return: [{task desc}, "node name"], [{job desc}, "node name"] - lists of runnable pending tasks and jobs.
         """
@@ -242,13 +403,40 @@ class ResourceManager:
                                                                     True)]
         schedule_jobs(filtered_jobs)
 
-        # Schedule all posible tasks
-        for task in reversed(pending_tasks):
-            node = self.__schedule_task(task, status=status)
+        # Schedule all posible tasks. Resources only decrease here, so tasks that require at least as much as tasks
+        # that could not be scheduled are skipped without ranking nodes. Pending tasks are not consumed further when
+        # there is no node for the smallest task met so far or when enough tasks were examined after the first one that
+        # could not be scheduled. This is important for large backlogs where most tasks wait for resources, since
+        # preparing each consumed task is not for free as well.
+        placement = self.__create_placement(status)
+        unsatisfied = []
+        smallest = None
+        lookahead = None
+        for task in pending_tasks:
+            if lookahead is not None:
+                if lookahead == 0:
+                    break
+                lookahead -= 1
+
+            restriction = task['description']['resource limits']
+            if any(self.__covers(restriction, r) for r in unsatisfied):
+                continue
+
+            demand = self.__demand(restriction)
+            smallest = demand if smallest is None else tuple(min(s, d) for s, d in zip(smallest, demand))
+            node = placement.place(restriction['CPU model'], demand)
             if node:
                 tasks_to_run.append([task, node])
                 # Remove these resources from status
-                self.__reserve_resources(status, task['description']['resource limits'], node)
+                self.__reserve_resources(status, restriction, node)
+                placement.reserve(node, demand)
+            else:
+                unsatisfied.append(restriction)
+                if lookahead is None:
+                    lookahead = self.BACKFILL_LOOKAHEAD
+
+            if not placement.fits(smallest):
+                break
 
         # Filter jobs that have the same or a higher priority than the current highest priority
         filtered_jobs = [j for j in pending_jobs if higher_priority(j['configuration']['priority'], highest_priority)]
@@ -450,25 +638,6 @@ class ResourceManager:
 
         return None
 
-    def __schedule_task(self, task, status=None):
-        """
-        Check whether provided task can be started in the system.
-
-        :param task: A task description dictionary.
-        :param status: A custom status dictionary and if it the manager's system status should not be used.
-        :return: A node name where the task can be started or None if there is no such node.
-        """
-        # Available resources
-        if not status:
-            status = self.__system_status
-
-        # Ranking of available resources
-        nodes = self.__nodes_ranking(status, task['description']['resource limits'])
-        if len(nodes) > 0:
-            return nodes[0]
-        else:
-            return None
-
     def __check_invariant(self, job=None):
         """
         Check that the invariant is preserved in the system and no deadlocks will happen. If a job is provided check
@@ -621,6 +790,33 @@ class ResourceManager:
 
         return status
 
+    def __create_placement(self, system_status):
+        """
+        Index nodes that are available for tasks to choose nodes for them.
+
+        :param system_status: A dictionary with system status.
+        :return: Placement object.
+        """
+        placement = Placement(self.__placement)
+        for name, node in system_status.items():
+            if node['status'] != 'DISCONNECTED' and node['available for tasks']:
+                placement.add(name, node['CPU model'],
+                              (node["available CPU number"], node["available RAM memory"],
+                               node["available disk memory"]),
+                              self.__free_resources(node))
+
+        return placement
+
+    @staticmethod
+    def __demand(restriction):
+        """
+        Get a vector of resources required by a task.
+
+        :param restriction: A dictionary with the resource restrictions.
+        :return: (CPU cores, memory, disk).
+        """
+        return restriction["number of CPU cores"], restriction["memory size"], restriction["disk memory size"]
+
     def __nodes_ranking(self, system_status, restriction, job=True):
         """
         Get restrictions and return list of nodes where such amount of resources can be reserved. Nodes are sorted
@@ -663,6 +859,20 @@ class ResourceManager:
         else:
             return False
 
+    @staticmethod
+    def __covers(restriction, other):
+        """
+        Check that given restrictions require at least the same resources as other ones.
+
+        :param restriction: A dictionary with the resource restrictions.
+        :param other: A dictionary with other resource restrictions.
+        :return: True or False.
+        """
+        return (not other['CPU model'] or other['CPU model'] == restriction['CPU model']) and \
+            restriction['number of CPU cores'] >= other['number of CPU cores'] and \
+            restriction['memory size'] >= other['memory size'] and \
+            restriction['disk memory size'] >= other['disk memory size']
+
     @staticmethod
     def __reserve_resources(system_status, amount, node=None):
         """
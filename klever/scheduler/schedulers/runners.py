@@ -18,6 +18,7 @@
 import math
 import klever.scheduler.utils as utils
 from klever.scheduler.schedulers import SchedulerException
+from klever.scheduler.schedulers.predictors import get_predictor
 
 
 def incmean(prevmean, n, x):
@@ -82,11 +83,12 @@ class Runner:
 
     def schedule(self, pending_tasks, pending_jobs):
         """
-        Get a list of new tasks which can be launched during current scheduler iteration. All pending jobs and tasks
-        should be sorted reducing the priority to the end. Each task and job in arguments are dictionaries with full
-        configuration or description.
+        Get a list of new tasks which can be launched during current scheduler iteration. Pending tasks are provided
+        from the highest priority to the lowest one and from older tasks to newer ones, so it is enough to consume them
+        until there are no resources. Pending jobs should be sorted reducing the priority to the end. Each task and job
+        in arguments are dictionaries with full configuration or description.
 
-        :param pending_tasks: List with all pending tasks.
+        :param pending_tasks: Iterable over all pending tasks.
         :param pending_jobs: List with all pending jobs.
         :return: List with identifiers of pending tasks to launch and list woth identifiers of jobs to launch.
         """
@@ -425,6 +427,8 @@ class SpeculativeSimple(Runner):
         self._problematic = dict()
         # Data about job tasks
         self._jdata = dict()
+        # Predictor of memory required by tasks that is trained on solutions of all jobs
+        self._predictor = get_predictor(self.logger, self.conf["scheduler"].get("resource predictor"))
 
     def prepare_task(self, identifier, item):
         """
@@ -471,6 +475,9 @@ class SpeculativeSimple(Runner):
             solution = False
         status = super(SpeculativeSimple, self).process_task_result(identifier, item)
         if status and solution:
+            if self._predictor and solution.get("resources"):
+                self._predictor.add_solution(item["description"], solution["resources"],
+                                             exceeded=not solution["uploaded"])
             solved = self._add_solution(item["description"]["job id"], item["description"]["solution class"],
                                         identifier, solution)
             if not solved:
@@ -512,6 +519,10 @@ class SpeculativeSimple(Runner):
                                attd["statistics"].get("memdev", 0), int(attd["statistics"].get("mean time", 0) / 1000),
                                int(attd["statistics"].get("timedev", 0)) / 1000))
 
+            if self._predictor:
+                self._predictor.log_statistics()
+                self._predictor.save()
+
             self.del_job(identifier)
         return status
 
@@ -543,6 +554,8 @@ class SpeculativeSimple(Runner):
         # Clean data
         self._problematic = dict()
         self._jdata = dict()
+        if self._predictor:
+            self._predictor.save()
 
     def add_job_progress(self, identifier, item, progress):
         """
@@ -654,6 +667,8 @@ class SpeculativeSimple(Runner):
 
         # Check do we have some statistics already
         speculative = False
+        estimation = None
+        prediction = self._predictor.predict(item["description"]) if self._predictor else None
 
         if limits.get('memory size', 0) <= 0:
             message += 'There is no memory size limitation at solving task {}.'
@@ -662,6 +677,9 @@ class SpeculativeSimple(Runner):
         elif self._is_there(job_identifier, attribute, identifier):
             limits = dict(qos)
             message = 'Set QoS limit for the task {}'.format(identifier)
+        elif prediction:
+            # The predictor is trained on previous jobs as well, so it does not wait for solutions of this job
+            estimation = prediction
         elif not job.get("total tasks", None) or job.get("solved", 0) <= (0.05 * job.get("total tasks", 0)):
             message += 'We have not enough solved tasks (5%) to yield speculative limit'
         elif not job["limits"][attribute]["statistics"] or job["limits"][attribute]["statistics"]["number"] <= 5:
@@ -672,7 +690,10 @@ class SpeculativeSimple(Runner):
                 raise ValueError('Mean memory is negative: {}'.format(int(statistics['mean mem'])))
             if int(statistics['memdev']) < 0:
                 raise ValueError('Memory deviation is negative: {}'.format(int(statistics['memdev'])))
-            limits['memory size'] = int(statistics['mean mem']) + 2 * int(statistics['memdev'])
+            estimation = int(statistics['mean mem']) + 2 * int(statistics['memdev'])
+
+        if estimation is not None:
+            limits['memory size'] = estimation
             if limits['memory size'] < qos['memory size']:
                 message = "Try running task {} with a speculative limitation {}B".\
                           format(identifier, limits['memory size'])
@@ -172,11 +172,12 @@ class VerifierCloud(runners.Runner):
 
     def schedule(self, pending_tasks, pending_jobs):
         """
-        Get a list of new tasks which can be launched during current scheduler iteration. All pending jobs and tasks
-        should be sorted reducing the priority to the end. Each task and job in arguments are dictionaries with full
-        configuration or description.
+        Get a list of new tasks which can be launched during current scheduler iteration. Pending tasks are provided
+        from the highest priority to the lowest one and from older tasks to newer ones, so it is enough to consume them
+        until there are no resources. Pending jobs should be sorted reducing the priority to the end. Each task and job
+        in arguments are dictionaries with full configuration or description.
 
-        :param pending_tasks: List with all pending tasks.
+        :param pending_tasks: Iterable over all pending tasks.
         :param pending_jobs: List with all pending jobs.
         :return: List with identifiers of pending tasks to launch and list woth identifiers of jobs to launch.
         """
@@ -0,0 +1,220 @@
+#
+# Copyright (c) 2020 ISP RAS (http://www.ispras.ru)
+# Ivannikov Institute for System Programming of the Russian Academy of Sciences
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import concurrent.futures
+import logging
+import threading
+import time
+
+import pytest
+
+from klever.scheduler.schedulers import Scheduler
+from klever.scheduler.schedulers.pending import PendingQueue
+from klever.scheduler.schedulers.resource_scheduler import ResourceManager
+from klever.scheduler.schedulers.runners import Runner
+
+PRIORITIES = ('IDLE', 'LOW', 'HIGH', 'URGENT')
+
+
+def test_order():
+    queue = PendingQueue()
+    for i in range(100):
+        queue.push(i, 'item {}'.format(i), PRIORITIES[i % 4], group=i % 7)
+
+    identifiers = [identifier for identifier, _ in queue]
+    assert identifiers == sorted(range(100), key=lambda i: (-(i % 4), i))
+    assert list(queue)[0] == (3, 'item 3')
+
+    # The queue is not consumed by iteration
+    assert len(queue) == 100
+    assert [identifier for identifier, _ in queue] == identifiers
+
+
+def test_removal():
+    queue = PendingQueue()
+    sequence_numbers = {i: queue.push(i, i, 'LOW', group=i % 3) for i in range(10)}
+
+    queue.remove(4)
+    queue.remove(4)
+    queue.remove_group(0)
+    assert [i for i, _ in queue] == [1, 2, 5, 7, 8]
+    assert 4 not in queue and 3 not in queue and 2 in queue
+
+    # Rescheduled items keep their places
+    queue.remove(1)
+    queue.push(1, 1, 'LOW', group=1, sequence_number=sequence_numbers[1])
+    queue.push(1, 1, 'LOW', group=1, sequence_number=sequence_numbers[1])
+    assert [i for i, _ in queue] == [1, 2, 5, 7, 8]
+
+    # Heaps are rebuilt when there are many removed items
+    for i in range(10, 5000):
+        queue.push(i, i, 'HIGH')
+    for i in range(10, 5000):
+        queue.remove(i)
+    assert [i for i, _ in queue] == [1, 2, 5, 7, 8]
+
+
+class FakeServer:
+
+    def __init__(self):
+        self.finished = []
+
+    def submit_task_status(self, identifier, status):
+        if status == 'FINISHED':
+            self.finished.append(identifier)
+
+    def submit_task_error(self, identifier, error):
+        raise AssertionError('Task {} failed: {}'.format(identifier, error))
+
+
+class FakeRunner(Runner):
+    """Runner that can solve a limited number of tasks at once and never solves anything by itself."""
+
+    def __init__(self, logger, slots):
+        self.logger = logger
+        self.slots = slots
+        self.futures = {}
+        self.scheduled = 0
+
+    @staticmethod
+    def scheduler_type():
+        return 'Klever'
+
+    def schedule(self, pending_tasks, pending_jobs):
+        tasks = []
+        for task in pending_tasks:
+            if len(tasks) + len(self.futures) >= self.slots:
+                break
+            tasks.append(task['id'])
+        self.scheduled += len(tasks)
+        return tasks, []
+
+    def _solve_task(self, identifier, description, user, password):
+        self.futures[identifier] = concurrent.futures.Future()
+        return self.futures[identifier]
+
+    def process_task_result(self, identifier, item):
+        del self.futures[identifier]
+        del item['future']
+        item['status'] = 'FINISHED'
+        return True
+
+
+class ManagedRunner(FakeRunner):
+    """Runner that chooses nodes for tasks by the resource manager like the native scheduler does."""
+
+    def __init__(self, logger, manager):
+        super(ManagedRunner, self).__init__(logger, slots=None)
+        self.manager = manager
+        self.nodes = {}
+
+    def schedule(self, pending_tasks, pending_jobs):
+        tasks, _ = self.manager.schedule(pending_tasks, pending_jobs)
+        for task, node in tasks:
+            self.manager.claim_resources(task['id'], task['description'], node)
+            self.nodes[task['id']] = node
+        self.scheduled += len(tasks)
+        return [task['id'] for task, _ in tasks], []
+
+    def process_task_result(self, identifier, item):
+        self.manager.release_resources(identifier, self.nodes.pop(identifier))
+        return super(ManagedRunner, self).process_task_result(identifier, item)
+
+
+def get_scheduler(runner):
+    # Do not connect to Bridge and RabbitMQ
+    scheduler = Scheduler.__new__(Scheduler)
+    scheduler.logger = runner.logger
+    scheduler.runner = runner
+    scheduler.server = FakeServer()
+    scheduler._events = threading.Event()
+    scheduler._clean_state()
+    return scheduler
+
+
+def add_tasks(scheduler, tasks_num, jobs_num, cpus=1):
+    for i in range(tasks_num):
+        identifier = 'task {}'.format(i)
+        scheduler._tasks[identifier] = {
+            'id': identifier,
+            'status': 'PENDING',
+            'description': {
+                'job id': 'job {}'.format(i % jobs_num),
+                'priority': PRIORITIES[i % 4],
+                'resource limits': {'number of CPU cores': cpus, 'memory size': 10 ** 9,
+                                    'disk memory size': 10 ** 9, 'CPU model': None}
+            }
+        }
+        scheduler._index_task(identifier)
+
+
+def solve(scheduler, runner, rounds, finishing):
+    for _ in range(rounds):
+        scheduler._schedule()
+        # Solutions of some running tasks finish before the next scheduling
+        for identifier in list(runner.futures)[:finishing]:
+            runner.futures[identifier].set_result(0)
+        scheduler._process_finished_solutions()
+
+
+def test_backlog():
+    tasks_num = 2000
+    rounds = 20
+    logger = logging.getLogger('test')
+    logger.setLevel(logging.WARNING)
+    runner = FakeRunner(logger, slots=16)
+    scheduler = get_scheduler(runner)
+    add_tasks(scheduler, tasks_num, jobs_num=10)
+    solve(scheduler, runner, rounds, runner.slots // 2)
+
+    # The most urgent and oldest tasks are solved first
+    finished = scheduler.server.finished
+    assert len(finished) == runner.slots // 2 * rounds
+    assert [int(t.split()[1]) for t in finished[:8]] == [3, 7, 11, 15, 19, 23, 27, 31]
+    assert all(PRIORITIES[int(t.split()[1]) % 4] == 'URGENT' for t in finished)
+    assert len(scheduler._pending_tasks) + len(runner.futures) + len(finished) == tasks_num
+
+
+@pytest.mark.benchmark
+def test_backlog_benchmark(consul):
+    tasks_num = 100000
+    rounds = 200
+    logger = logging.getLogger('test')
+    logger.setLevel(logging.WARNING)
+    manager = ResourceManager(logger)
+    for i in range(4):
+        consul.set_node('node {}'.format(i), consul.node_state('node {}'.format(i)))
+    runner = ManagedRunner(logger, manager)
+    scheduler = get_scheduler(runner)
+
+    try:
+        manager.update_system_status(consul.address)
+        # Tasks require 2 CPU cores, so 16 tasks are solved at once
+        add_tasks(scheduler, tasks_num, jobs_num=100, cpus=2)
+
+        start = time.time()
+        solve(scheduler, runner, rounds, 8)
+        schedule_time = time.time() - start
+    finally:
+        manager.stop_watching()
+
+    finished = scheduler.server.finished
+    assert len(finished) == 8 * rounds
+    assert all(PRIORITIES[int(t.split()[1]) % 4] == 'URGENT' for t in finished)
+
+    # Scheduling does not depend on the whole backlog, so it should take much less than examining it each time
+    assert schedule_time < 5
@@ -0,0 +1,105 @@
+#
+# Copyright (c) 2020 ISP RAS (http://www.ispras.ru)
+# Ivannikov Institute for System Programming of the Russian Academy of Sciences
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import random
+import time
+
+import pytest
+
+from klever.scheduler.schedulers.placement import Placement
+
+GB = 10 ** 9
+
+# Node configurations and shapes of tasks: many small ones, memory hungry ones and ones requiring many CPU cores
+NODES = ((8, 32 * GB, 200 * GB), (16, 64 * GB, 400 * GB), (32, 64 * GB, 400 * GB), (8, 128 * GB, 200 * GB))
+TASKS = ((1, 3 * GB, 10 * GB), (2, 15 * GB, 10 * GB), (4, 4 * GB, 20 * GB), (1, 30 * GB, 50 * GB))
+
+
+def get_workload(seed, nodes_num, tasks_num):
+    rnd = random.Random(seed)
+    return [rnd.choice(NODES) for _ in range(nodes_num)], [rnd.choice(TASKS) for _ in range(tasks_num)]
+
+
+def place(strategy, nodes, tasks):
+    placement = Placement(strategy)
+    for i, capacity in enumerate(nodes):
+        placement.add(i, 'model', capacity, capacity)
+
+    placed = []
+    for demand in tasks:
+        node = placement.place(None, demand)
+        if node is not None:
+            placement.reserve(node, demand)
+        placed.append(node)
+
+    return placed
+
+
+def test_first_fit():
+    nodes, tasks = get_workload(0, 30, 3000)
+    free = [list(capacity) for capacity in nodes]
+
+    # The same nodes are chosen as by ranking all suitable nodes by their free resources
+    for demand, node in zip(tasks, place('first fit', nodes, tasks)):
+        suitable = [i for i, f in enumerate(free) if all(r >= d for r, d in zip(f, demand))]
+        if suitable:
+            assert node == min(suitable, key=lambda i: (free[i], i))
+            free[node] = [r - d for r, d in zip(free[node], demand)]
+        else:
+            assert node is None
+
+
+def test_strategies():
+    for seed in range(3):
+        nodes, tasks = get_workload(seed, 30, 3000)
+        placed = {}
+        for strategy in Placement.STRATEGIES:
+            chosen = place(strategy, nodes, tasks)
+            placed[strategy] = len([n for n in chosen if n is not None])
+
+            # Nodes are never overcommitted
+            for i, capacity in enumerate(nodes):
+                for k in range(3):
+                    assert sum(d[k] for d, n in zip(tasks, chosen) if n == i) <= capacity[k]
+
+        assert placed['dominant resource'] >= placed['first fit']
+
+    with pytest.raises(ValueError):
+        Placement('next fit')
+
+
+def test_cpu_model():
+    placement = Placement('best fit')
+    placement.add('first', 'old', (4, 8 * GB, 10 * GB), (4, 8 * GB, 10 * GB))
+    placement.add('second', 'new', (16, 8 * GB, 10 * GB), (16, 8 * GB, 10 * GB))
+
+    assert placement.place('old', (8, GB, GB)) is None
+    assert placement.place('new', (8, GB, GB)) == 'second'
+    assert placement.place(None, (2, GB, GB)) == 'first'
+    assert placement.place('unknown', (1, GB, GB)) is None
+
+
+@pytest.mark.benchmark
+def test_many_nodes():
+    nodes, tasks = get_workload(0, 1000, 10000)
+
+    start = time.time()
+    placed = place('first fit', nodes, tasks)
+    placement_time = time.time() - start
+
+    assert all(n is not None for n in placed[:1000])
+    assert placement_time < 5
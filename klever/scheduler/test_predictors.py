@@ -0,0 +1,104 @@
+#
+# Copyright (c) 2020 ISP RAS (http://www.ispras.ru)
+# Ivannikov Institute for System Programming of the Russian Academy of Sciences
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import logging
+import math
+import random
+
+import pytest
+
+from klever.scheduler.schedulers.predictors import get_predictor
+
+# Relative memory consumption for requirement specifications
+REQUIREMENTS = {'memory safety': 1.5, 'locking': 0.8, 'races': 2.5}
+
+
+def get_tasks(seed, number):
+    """Generate tasks which memory consumption depends on sizes of CIL files and requirements."""
+    rnd = random.Random(seed)
+    for _ in range(number):
+        size = int(2 ** rnd.uniform(17, 24))
+        requirement = rnd.choice(list(REQUIREMENTS))
+        memory = int(2 ** 28 * (size / 2 ** 17) ** 0.6 * REQUIREMENTS[requirement] * math.exp(rnd.gauss(0, 0.3)))
+        description = {
+            'verifier': {'name': 'CPAchecker', 'version': 'trunk'},
+            'features': {
+                'CIL file size': size,
+                'functions': int(size / 2000 * rnd.uniform(0.5, 1.5)),
+                'requirement': requirement,
+                'verifier options': ['-heap=10000m']
+            }
+        }
+        yield description, memory
+
+
+def evaluate(predict, tasks):
+    hits = 0
+    over_reservation = 0
+    reservation = 0
+    for description, memory in tasks:
+        prediction = predict(description)
+        if prediction >= memory:
+            hits += 1
+            over_reservation += prediction - memory
+            reservation += prediction
+
+    return hits / len(tasks), over_reservation / reservation
+
+
+def test_quantile_regression(tmpdir):
+    conf = {'type': 'quantile regression', 'quantile': 0.95, 'model file': str(tmpdir.join('model.json'))}
+    predictor = get_predictor(logging.getLogger('test'), conf)
+    assert predictor.predict(next(get_tasks(0, 1))[0]) is None
+
+    for description, memory in get_tasks(0, 2000):
+        predictor.add_solution(description, {'memory size': memory, 'CPU time': 1000})
+    predictor.save()
+
+    # Compare with limits that are the mean plus two deviations of memory consumption per requirement
+    consumption = {}
+    for description, memory in get_tasks(1, 2000):
+        consumption.setdefault(description['features']['requirement'], []).append(memory)
+    limits = {}
+    for requirement, values in consumption.items():
+        mean = sum(values) / len(values)
+        limits[requirement] = mean + 2 * math.sqrt(sum((v - mean) ** 2 for v in values) / len(values))
+
+    tasks = list(get_tasks(2, 2000))
+    hits, over_reservation = evaluate(predictor.predict, tasks)
+    base_hits, base_over_reservation = evaluate(lambda d: limits[d['features']['requirement']], tasks)
+    assert hits >= 0.9
+    assert hits >= base_hits and over_reservation < base_over_reservation
+
+    # The model survives restarts
+    restored = get_predictor(logging.getLogger('test'), conf)
+    assert restored.predict(tasks[0][0]) == predictor.predict(tasks[0][0])
+    assert restored.statistics['hits'] > 0
+
+    # Exceeded limits never decrease predictions
+    description, memory = tasks[0]
+    prediction = restored.predict(description)
+    restored.add_solution(description, {'memory size': prediction // 2}, exceeded=True)
+    assert restored.predict(description) == prediction
+    restored.add_solution(description, {'memory size': prediction}, exceeded=True)
+    assert restored.predict(description) > prediction
+
+
+def test_no_predictor():
+    assert get_predictor(logging.getLogger('test'), None) is None
+    with pytest.raises(KeyError):
+        get_predictor(logging.getLogger('test'), {'type': 'oracle'})
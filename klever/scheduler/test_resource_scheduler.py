@@ -0,0 +1,66 @@
+#
+# Copyright (c) 2020 ISP RAS (http://www.ispras.ru)
+# Ivannikov Institute for System Programming of the Russian Academy of Sciences
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import logging
+import time
+
+from klever.scheduler.schedulers.resource_scheduler import ResourceManager
+
+
+def wait(condition):
+    deadline = time.time() + 5
+    while not condition():
+        assert time.time() < deadline, 'Changes were not noticed'
+        time.sleep(0.01)
+
+
+def test_node_watch(consul, caplog):
+    caplog.set_level(logging.DEBUG, logger='resources')
+    manager = ResourceManager(logging.getLogger('resources'))
+    consul.set_node('first', consul.node_state('first'))
+    consul.set_node('second', consul.node_state('second'))
+
+    try:
+        assert manager.update_system_status(consul.address) == ([], [])
+        assert manager.active_nodes == ['first', 'second']
+
+        # Nothing is requested again until nodes change
+        requests = consul.requests
+        for _ in range(100):
+            manager.update_system_status(consul.address)
+        assert consul.requests - requests <= 4
+
+        # Only the changed state is decoded
+        caplog.clear()
+        consul.set_node('second', consul.node_state('second', available_cpus=4))
+        wait(lambda: manager.update_system_status(consul.address) and
+             manager.node_info('second')['available CPU number'] == 4)
+        assert [r.getMessage() for r in caplog.records
+                if 'has changed' in r.getMessage()] == ["State of node 'second' has changed"]
+        assert manager.node_info('first')['available CPU number'] == 8
+
+        # Tasks running on disconnected nodes are cancelled
+        manager.claim_resources('task', {'resource limits': {'number of CPU cores': 1, 'memory size': 10 ** 9,
+                                                             'disk memory size': 10 ** 9, 'CPU model': None}},
+                                'first')
+        consul.remove_node('first')
+        cancelled = []
+        wait(lambda: cancelled.extend(manager.update_system_status(consul.address)[1]) or
+             manager.active_nodes == ['second'])
+        assert cancelled == ['task']
+    finally:
+        manager.stop_watching()
@@ -0,0 +1,214 @@
+#
+# Copyright (c) 2020 ISP RAS (http://www.ispras.ru)
+# Ivannikov Institute for System Programming of the Russian Academy of Sciences
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import concurrent.futures
+import logging
+import threading
+
+from klever.scheduler.schedulers import Scheduler
+from klever.scheduler.schedulers.runners import Runner
+
+
+class FakeServer:
+    """Bridge that keeps statuses of jobs and tasks in memory."""
+
+    def __init__(self):
+        self.jobs = {}
+        self.tasks = {}
+        self.task_statuses = {}
+        self.errors = []
+
+    def add_job(self, identifier):
+        self.jobs[identifier] = 'PENDING'
+
+    def add_task(self, identifier, job_id):
+        self.tasks[identifier] = {
+            'job id': job_id,
+            'priority': 'LOW',
+            'resource limits': {'number of CPU cores': 1, 'memory size': '1GB', 'disk memory size': '1GB'}
+        }
+        self.task_statuses[identifier] = 'PENDING'
+
+    def pull_job_conf(self, identifier):
+        return {
+            'configuration': {'priority': 'LOW', 'resource limits': {'memory size': '1GB'}},
+            'tasks': {'memory size': '1GB'}
+        }
+
+    def pull_task_conf(self, identifier):
+        return {'description': dict(self.tasks[identifier])}
+
+    def get_job_status(self, identifier):
+        return '1' if self.jobs[identifier] == 'PENDING' else '2'
+
+    def get_job_tasks(self, identifier):
+        return [(i, self.task_statuses[i]) for i, desc in self.tasks.items() if desc['job id'] == identifier]
+
+    def submit_job_status(self, identifier, status):
+        self.jobs[identifier] = status
+
+    def submit_job_error(self, identifier, error):
+        self.errors.append((identifier, error))
+
+    def submit_task_status(self, identifier, status):
+        self.task_statuses[identifier] = status
+
+    def submit_task_error(self, identifier, error):
+        self.errors.append((identifier, error))
+        self.task_statuses[identifier] = 'ERROR'
+
+
+class FakeRunner(Runner):
+    """Runner that solves a limited number of tasks at once and finishes them when tests set results of futures."""
+
+    def __init__(self, logger, server, slots):
+        super(FakeRunner, self).__init__({}, logger, None, server)
+        self.slots = slots
+        self.futures = {}
+
+    @staticmethod
+    def scheduler_type():
+        return 'Klever'
+
+    def schedule(self, pending_tasks, pending_jobs):
+        tasks = []
+        for task in pending_tasks:
+            if len(tasks) + len(self.futures) >= self.slots:
+                break
+            tasks.append(task['id'])
+        return tasks, [job['id'] for job in pending_jobs]
+
+    def _solve_task(self, identifier, description, user, password):
+        self.futures[identifier] = concurrent.futures.Future()
+        return self.futures[identifier]
+
+    def _solve_job(self, identifier, configuration):
+        return concurrent.futures.Future()
+
+    def cancel_task(self, identifier, item):
+        self.futures.pop(identifier, None)
+        super(FakeRunner, self).cancel_task(identifier, item)
+
+    def process_task_result(self, identifier, item):
+        # Futures are resolved with new statuses of tasks, e.g. PENDING means that the task is rescheduled
+        del self.futures[identifier]
+        item['status'] = item.pop('future').result()
+        return True
+
+
+def get_scheduler(slots=1):
+    # Do not connect to Bridge and RabbitMQ
+    scheduler = Scheduler.__new__(Scheduler)
+    scheduler.logger = logging.getLogger('test')
+    scheduler.server = FakeServer()
+    scheduler.runner = FakeRunner(scheduler.logger, scheduler.server, slots)
+    scheduler._events = threading.Event()
+    scheduler._clean_state()
+    return scheduler
+
+
+def send(scheduler, *messages):
+    """Deliver messages from Bridge like the listening thread does and process them."""
+    for kind, identifier, status in messages:
+        scheduler._server_queue.put('{} {} {} Klever'.format(kind, identifier, status).encode('utf-8'))
+    scheduler._process_messages()
+
+
+def add_job(scheduler, job_id, tasks_num):
+    scheduler.server.add_job(job_id)
+    send(scheduler, ('job', job_id, '1'))
+    scheduler._schedule()
+    send(scheduler, ('job', job_id, '2'))
+
+    tasks = ['{}-task-{}'.format(job_id, i) for i in range(tasks_num)]
+    for task_id in tasks:
+        scheduler.server.add_task(task_id, job_id)
+        send(scheduler, ('task', task_id, 'PENDING'))
+    return tasks
+
+
+def finish(scheduler, task_id, status):
+    scheduler.runner.futures[task_id].set_result(status)
+    scheduler._process_finished_solutions()
+
+
+def test_task_lifecycle():
+    scheduler = get_scheduler()
+    task_id, = add_job(scheduler, 'job', 1)
+    assert task_id in scheduler._pending_tasks
+    assert scheduler._job_tasks == {'job': {task_id}}
+
+    scheduler._schedule()
+    assert scheduler.server.task_statuses[task_id] == 'PROCESSING'
+    assert task_id not in scheduler._pending_tasks
+    assert scheduler._solving_tasks == {task_id}
+    send(scheduler, ('task', task_id, 'PROCESSING'))
+
+    # The callback of the finished solution wakes up the scheduler loop
+    scheduler._events.clear()
+    scheduler.runner.futures[task_id].set_result('FINISHED')
+    assert scheduler._events.is_set()
+    scheduler._process_finished_solutions()
+    assert scheduler.server.task_statuses[task_id] == 'FINISHED'
+
+    # The task is forgotten at all
+    send(scheduler, ('task', task_id, 'FINISHED'))
+    assert task_id not in scheduler._tasks
+    assert task_id not in scheduler._pending_tasks
+    assert not scheduler._solving_tasks
+    assert not scheduler._job_tasks
+    assert not scheduler.server.errors
+
+
+def test_rescheduling():
+    scheduler = get_scheduler()
+    tasks = add_job(scheduler, 'job', 3)
+    sequence_number = scheduler._tasks[tasks[0]]['sequence number']
+
+    scheduler._schedule()
+    assert scheduler._solving_tasks == {tasks[0]}
+    finish(scheduler, tasks[0], 'PENDING')
+
+    # The rescheduled task keeps its place in the queue before tasks that were added later
+    assert scheduler._tasks[tasks[0]]['sequence number'] == sequence_number
+    assert [identifier for identifier, _ in scheduler._pending_tasks] == tasks
+    assert not scheduler._solving_tasks
+
+    scheduler._schedule()
+    assert scheduler._solving_tasks == {tasks[0]}
+
+
+def test_cancelled_job():
+    scheduler = get_scheduler(slots=2)
+    tasks = add_job(scheduler, 'job', 5)
+    other_task, = add_job(scheduler, 'other-job', 1)
+    scheduler._schedule()
+    assert scheduler._solving_tasks == set(tasks[:2])
+
+    send(scheduler, ('job', 'job', '6'))
+    assert scheduler.server.jobs['job'] == '7'
+    assert all(scheduler.server.task_statuses[task_id] == 'CANCELLED' for task_id in tasks)
+
+    # Queued tasks of the cancelled job are not considered anymore
+    assert [identifier for identifier, _ in scheduler._pending_tasks] == [other_task]
+    assert not scheduler._solving_tasks
+    scheduler._schedule()
+    assert scheduler._solving_tasks == {other_task}
+
+    send(scheduler, *(('task', task_id, 'CANCELLED') for task_id in tasks))
+    assert set(scheduler._tasks) == {other_task}
+    assert scheduler._job_tasks == {'other-job': {other_task}}